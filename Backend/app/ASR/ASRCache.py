@@ -0,0 +1,166 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS asr_cache (
+    key TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_asr_cache_last_used ON asr_cache(last_used_at);
+"""
+
+
+class ASRCache:
+    """ASR responses keyed by engine and audio, stored zlib-compressed in a
+    SQLite file.
+
+    Every call opens its own connection, and SQLite's file locking (WAL
+    mode, with a busy timeout) keeps readers and writers in several worker
+    processes consistent.  Entries older than *max_age* seconds, and the
+    least recently used ones once the compressed total passes *max_bytes*,
+    are evicted after each write.
+    """
+
+    # Lookups refresh last_used_at at most this often, so hot keys do not
+    # turn every read into a write.
+    TOUCH_INTERVAL = 60.0
+
+    # Version of the key scheme (stored as the file's user_version).  Rows
+    # written under an older one can never be hit again, so they are dropped
+    # when the store is opened; 1 is BaseASR's BLAKE2b keys, which replaced
+    # CRC32 keys.
+    KEY_VERSION = 1
+
+    def __init__(self, path: str, max_bytes: int, max_age: Optional[float] = None, legacy_json: Optional[str] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._drop_stale_keys(conn)
+        if legacy_json:
+            self._remove_legacy(legacy_json)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT data, last_used_at FROM asr_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.max_age is not None and row[1] < now - self.max_age:
+                conn.execute("DELETE FROM asr_cache WHERE key = ?", (key,))
+                return None
+            try:
+                data = json.loads(zlib.decompress(row[0]).decode("utf-8"))
+            except (zlib.error, ValueError):
+                logging.warning(f"Dropping unreadable ASR cache entry {key}")
+                conn.execute("DELETE FROM asr_cache WHERE key = ?", (key,))
+                return None
+            if now - row[1] >= self.TOUCH_INTERVAL:
+                conn.execute("UPDATE asr_cache SET last_used_at = ? WHERE key = ?", (now, key))
+        return data
+
+    def put(self, key: str, data: dict) -> None:
+        self._store({key: data})
+
+    def _store(self, entries: Dict[str, dict]) -> None:
+        now = time.time()
+        rows = []
+        for key, data in entries.items():
+            blob = zlib.compress(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+            rows.append((key, blob, len(blob), now, now))
+        with self._connect() as conn:
+            # BEGIN IMMEDIATE takes the write lock up front, so two processes
+            # evicting at once do not both delete down past the limit.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO asr_cache (key, data, size, created_at, last_used_at) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._evict(conn, now)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        if self.max_age is not None:
+            conn.execute("DELETE FROM asr_cache WHERE last_used_at < ?", (now - self.max_age,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM asr_cache").fetchone()[0]
+        if total > self.max_bytes:
+            doomed = []
+            for key, size in conn.execute("SELECT key, size FROM asr_cache ORDER BY last_used_at"):
+                if total <= self.max_bytes:
+                    break
+                doomed.append((key,))
+                total -= size
+            conn.executemany("DELETE FROM asr_cache WHERE key = ?", doomed)
+
+    def stats(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM asr_cache").fetchone()
+        return {"entries": entries, "bytes": size, "max_bytes": self.max_bytes}
+
+    def _drop_stale_keys(self, conn: sqlite3.Connection) -> None:
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= self.KEY_VERSION:
+            return
+        # Re-checked under the write lock, so a process that already upgraded
+        # the file and stored new entries does not lose them.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] < self.KEY_VERSION:
+                dropped = conn.execute("DELETE FROM asr_cache").rowcount
+                conn.execute(f"PRAGMA user_version = {int(self.KEY_VERSION)}")
+                if dropped:
+                    logging.info(f"Dropped {dropped} ASR cache entries stored under an old key scheme")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _remove_legacy(legacy_json: str) -> None:
+        """Delete the old single-file JSON cache.  Its entries are keyed on a
+        CRC32 of audio that is no longer available, so they cannot be moved
+        to the current keys and are not imported."""
+        try:
+            os.remove(legacy_json)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.warning(f"Could not remove legacy ASR cache {legacy_json}: {e}")
+
+
+_shared: Dict[str, ASRCache] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_cache(path: str, max_bytes: int, max_age: Optional[float] = None, legacy_json: Optional[str] = None) -> ASRCache:
+    """One :class:`ASRCache` per path for the whole process, so the schema
+    and legacy import run once rather than per transcription."""
+    with _shared_lock:
+        cache = _shared.get(path)
+        if cache is None:
+            cache = _shared[path] = ASRCache(path, max_bytes, max_age, legacy_json)
+        return cache
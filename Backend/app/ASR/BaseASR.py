@@ -1,83 +1,120 @@
+import hashlib
 import json
 import logging
 import os
-import zlib
+import sqlite3
 import tempfile
-import threading
+from typing import Any, Dict, Optional, Union
 
+from .ASRCache import ASRCache, shared_cache
 from .ASRData import ASRDataSeg, ASRData
 
 
 class BaseASR:
     SUPPORTED_SOUND_FORMAT = ["flac", "m4a", "mp3", "wav"]
-    CACHE_FILE = os.path.join(tempfile.gettempdir(), "bk_asr", "asr_cache.json")
-    _lock = threading.Lock()
-
-    def __init__(self, audio_path: [str, bytes], use_cache: bool = False):
+    CACHE_DIR = os.environ.get("ASR_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "bk_asr")
+    CACHE_FILE = os.path.join(CACHE_DIR, "asr_cache.sqlite3")
+    # Single-file JSON cache used before the SQLite store.  Its entries are
+    # keyed on CRC32s that can never be hit again, so it is deleted unread.
+    LEGACY_CACHE_FILE = os.path.join(CACHE_DIR, "asr_cache.json")
+    CACHE_MAX_BYTES = int(float(os.environ.get("ASR_CACHE_MAX_MB") or 256) * 1024 * 1024)
+    CACHE_MAX_AGE = float(os.environ.get("ASR_CACHE_MAX_AGE_DAYS") or 90) * 24 * 3600
+
+    # Cache keys are BLAKE2b over the audio, read this many bytes at a time.
+    HASH_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, audio_path: Union[str, bytes], use_cache: bool = False, content_hash: Optional[str] = None):
+        """*content_hash* is a stable digest of the audio the caller already
+        has (e.g. the file store's sha256); without it the audio is hashed
+        here."""
         self.audio_path = audio_path
-        self.file_binary = None
+        self._file_binary = None
 
-        self.crc32_hex = None
+        self.audio_hash = None
         self.use_cache = use_cache
 
-        self._set_data()
+        self._set_data(content_hash)
 
         self.cache = self._load_cache()
 
-    def _load_cache(self):
-        if not self.use_cache:
-            return {}
-        os.makedirs(os.path.dirname(self.CACHE_FILE), exist_ok=True)
-        with self._lock:
-            if os.path.exists(self.CACHE_FILE):
-                try:
-                    with open(self.CACHE_FILE, 'r', encoding='utf-8') as f:
-                        cache = json.load(f)
-                        if isinstance(cache, dict):
-                            return cache
-                except (json.JSONDecodeError, IOError):
-                    return {}
-            return {}
-
-    def _save_cache(self):
+    def _load_cache(self) -> Optional[ASRCache]:
         if not self.use_cache:
-            return
-        with self._lock:
-            try:
-                with open(self.CACHE_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(self.cache, f, ensure_ascii=False, indent=2)
-                if os.path.exists(self.CACHE_FILE) and os.path.getsize(self.CACHE_FILE) > 10 * 1024 * 1024:
-                    os.remove(self.CACHE_FILE)
-            except IOError as e:
-                logging.error(f"Failed to save cache: {e}")
-
-    def _set_data(self):
+            return None
+        try:
+            return shared_cache(self.CACHE_FILE, self.CACHE_MAX_BYTES, self.CACHE_MAX_AGE, self.LEGACY_CACHE_FILE)
+        except sqlite3.Error as e:
+            logging.error(f"Failed to open ASR cache: {e}")
+            return None
+
+    def _set_data(self, content_hash: Optional[str] = None):
         if isinstance(self.audio_path, bytes):
-            self.file_binary = self.audio_path
+            self._file_binary = self.audio_path
         else:
             ext = self.audio_path.split(".")[-1].lower()
             assert ext in self.SUPPORTED_SOUND_FORMAT, f"Unsupported sound format: {ext}"
             assert os.path.exists(self.audio_path), f"File not found: {self.audio_path}"
+        if content_hash:
+            self.audio_hash = content_hash
+        elif self.use_cache:
+            self.audio_hash = "blake2b:" + self._hash_audio()
+
+    def _hash_audio(self) -> str:
+        hasher = hashlib.blake2b(digest_size=32)
+        if self._file_binary is not None:
+            view = memoryview(self._file_binary)
+            for offset in range(0, len(view), self.HASH_CHUNK_SIZE):
+                hasher.update(view[offset : offset + self.HASH_CHUNK_SIZE])
+        else:
+            with open(self.audio_path, "rb") as f:
+                for chunk in iter(lambda: f.read(self.HASH_CHUNK_SIZE), b""):
+                    hasher.update(chunk)
+        return hasher.hexdigest()
+
+    @property
+    def file_binary(self) -> bytes:
+        """The audio bytes, read from disk on first use so cache hits never
+        load the file."""
+        if self._file_binary is None:
             with open(self.audio_path, "rb") as f:
-                self.file_binary = f.read()
-        crc32_value = zlib.crc32(self.file_binary) & 0xFFFFFFFF
-        self.crc32_hex = format(crc32_value, '08x')
+                self._file_binary = f.read()
+        return self._file_binary
+
+    def _cache_params(self) -> Dict[str, Any]:
+        """Engine settings that change the result for the same audio;
+        subclasses add their model and options."""
+        return {}
 
     def _get_key(self):
-        return f"{self.__class__.__name__}-{self.crc32_hex}"
+        params = json.dumps({"audio": self.audio_hash, **self._cache_params()}, sort_keys=True)
+        digest = hashlib.blake2b(params.encode("utf-8"), digest_size=32).hexdigest()
+        return f"{self.__class__.__name__}-{digest}"
 
     def run(self):
         k = self._get_key()
-        if k in self.cache and self.use_cache:
-            resp_data = self.cache[k]
-        else:
+        resp_data = self._cache_get(k)
+        if resp_data is None:
             resp_data = self._run()
-            # Cache the result
-            self.cache[k] = resp_data
-            self._save_cache()
+            self._cache_put(k, resp_data)
         segments = self._make_segments(resp_data)
         return ASRData(segments)
 
+    def _cache_get(self, key: str) -> Optional[dict]:
+        if self.cache is None:
+            return None
+        try:
+            return self.cache.get(key)
+        except sqlite3.Error as e:
+            logging.error(f"Failed to read ASR cache: {e}")
+            return None
+
+    def _cache_put(self, key: str, resp_data: dict) -> None:
+        if self.cache is None:
+            return
+        try:
+            self.cache.put(key, resp_data)
+        except sqlite3.Error as e:
+            logging.error(f"Failed to save cache: {e}")
+
     def _make_segments(self, resp_data: dict) -> list[ASRDataSeg]:
         raise NotImplementedError("_make_segments method must be implemented in subclass")
 
@@ -1,10 +1,13 @@
 import json
 import logging
+import random
 import time
+from concurrent.futures import ThreadPoolExecutor
 from os import PathLike
-from typing import Optional
+from typing import Callable, Optional
 
 import requests
+import requests.adapters
 
 from .ASRData import ASRData, ASRDataSeg
 from .BaseASR import BaseASR
@@ -26,6 +29,9 @@ API_CREATE_TASK = API_BASE_URL + "/task"
 # 查询结果
 API_QUERY_RESULT = API_BASE_URL + "/task/result"
 
+# 识别模型
+MODEL_ID = "8"
+
 
 class BcutASR(BaseASR):
     """必剪 语音识别接口"""
@@ -33,10 +39,31 @@ class BcutASR(BaseASR):
         'User-Agent': 'Bilibili/1.0.0 (https://www.bilibili.com)',
         'Content-Type': 'application/json'
     }
-
-    def __init__(self, audio_path: [str, bytes], use_cache: bool = False):
-        super().__init__(audio_path, use_cache=use_cache)
+    # (connect, read) seconds for every request
+    REQUEST_TIMEOUT = (5, 60)
+    # 分片并发上传数 and attempts per part
+    UPLOAD_WORKERS = 4
+    UPLOAD_ATTEMPTS = 3
+    # 结果轮询: first interval, growth factor, cap and overall deadline (seconds)
+    POLL_INTERVAL = 1.0
+    POLL_BACKOFF = 1.5
+    POLL_MAX_INTERVAL = 10.0
+    POLL_TIMEOUT = 900.0
+
+    def __init__(
+        self,
+        audio_path: [str, bytes],
+        use_cache: bool = False,
+        content_hash: Optional[str] = None,
+        cancel_check: Optional[Callable[[], None]] = None,
+    ):
+        """*cancel_check* is called before every upload part, the task
+        creation and every poll; it aborts the run by raising."""
+        super().__init__(audio_path, use_cache=use_cache, content_hash=content_hash)
+        self.cancel_check = cancel_check or (lambda: None)
         self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=self.UPLOAD_WORKERS))
         self.task_id = None
         self.__etags = []
 
@@ -61,14 +88,10 @@ class BcutASR(BaseASR):
             "name": "audio.mp3",
             "size": len(self.file_binary),
             "ResourceFileType": "mp3",
-            "model_id": "8",
+            "model_id": MODEL_ID,
         })
 
-        resp = requests.post(
-            API_REQ_UPLOAD,
-            data=payload,
-            headers=self.headers
-        )
+        resp = self.session.post(API_REQ_UPLOAD, data=payload, timeout=self.REQUEST_TIMEOUT)
         resp.raise_for_status()
         resp = resp.json()
         resp_data = resp["data"]
@@ -87,20 +110,31 @@ class BcutASR(BaseASR):
         self.__commit_upload()
 
     def __upload_part(self) -> None:
-        """上传音频数据"""
-        for clip in range(self.__clips):
-            start_range = clip * self.__per_size
-            end_range = (clip + 1) * self.__per_size
+        """上传音频数据, 分片并发, 每片失败重试"""
+        workers = max(1, min(self.UPLOAD_WORKERS, self.__clips))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcut-upload") as pool:
+            # map keeps the etags in part order, as the commit expects.
+            self.__etags = list(pool.map(self.__put_clip, range(self.__clips)))
+
+    def __put_clip(self, clip: int) -> str:
+        start_range = clip * self.__per_size
+        end_range = (clip + 1) * self.__per_size
+        data = self.file_binary[start_range:end_range]
+        for attempt in range(self.UPLOAD_ATTEMPTS):
+            self.cancel_check()
             logging.info(f"开始上传分片{clip}: {start_range}-{end_range}")
-            resp = requests.put(
-                self.__upload_urls[clip],
-                data=self.file_binary[start_range:end_range],
-                headers=self.headers
-            )
-            resp.raise_for_status()
+            try:
+                resp = self.session.put(self.__upload_urls[clip], data=data, timeout=self.REQUEST_TIMEOUT)
+                resp.raise_for_status()
+            except requests.RequestException as e:
+                if attempt + 1 == self.UPLOAD_ATTEMPTS:
+                    raise
+                logging.warning(f"分片{clip}上传失败, 重试: {e}")
+                time.sleep(random.uniform(0, 2 ** attempt))
+                continue
             etag = resp.headers.get("Etag")
-            self.__etags.append(etag)
             logging.info(f"分片{clip}上传成功: {etag}")
+            return etag
 
     def __commit_upload(self) -> None:
         """提交上传数据"""
@@ -109,13 +143,9 @@ class BcutASR(BaseASR):
             "ResourceId": self.__resource_id,
             "Etags": ",".join(self.__etags),
             "UploadId": self.__upload_id,
-            "model_id": "8",
+            "model_id": MODEL_ID,
         })
-        resp = requests.post(
-            API_COMMIT_UPLOAD,
-            data=data,
-            headers=self.headers
-        )
+        resp = self.session.post(API_COMMIT_UPLOAD, data=data, timeout=self.REQUEST_TIMEOUT)
         resp.raise_for_status()
         resp = resp.json()
         self.__download_url = resp["data"]["download_url"]
@@ -123,8 +153,8 @@ class BcutASR(BaseASR):
 
     def create_task(self) -> str:
         """开始创建转换任务"""
-        resp = requests.post(
-            API_CREATE_TASK, json={"resource": self.__download_url, "model_id": "8"}, headers=self.headers
+        resp = self.session.post(
+            API_CREATE_TASK, json={"resource": self.__download_url, "model_id": MODEL_ID}, timeout=self.REQUEST_TIMEOUT
         )
         resp.raise_for_status()
         resp = resp.json()
@@ -134,23 +164,39 @@ class BcutASR(BaseASR):
 
     def result(self, task_id: Optional[str] = None):
         """查询转换结果"""
-        resp = requests.get(API_QUERY_RESULT, params={"model_id": 7, "task_id": task_id or self.task_id}, headers=self.headers)
+        resp = self.session.get(
+            API_QUERY_RESULT, params={"model_id": 7, "task_id": task_id or self.task_id}, timeout=self.REQUEST_TIMEOUT
+        )
         resp.raise_for_status()
         resp = resp.json()
         return resp["data"]
 
     def _run(self):
+        self.cancel_check()
         self.upload()
+        self.cancel_check()
         self.create_task()
-        # 轮询检查任务状态
-        for _ in range(500):
+        # 轮询检查任务状态, 间隔指数增长, 超过总时限则放弃
+        deadline = time.monotonic() + self.POLL_TIMEOUT
+        interval = self.POLL_INTERVAL
+        while True:
+            self.cancel_check()
             task_resp = self.result()
             if task_resp["state"] == 4:
                 break
-            time.sleep(1)
+            if task_resp["state"] == 3:
+                raise RuntimeError(f"Bcut 任务失败: {task_resp.get('remark') or self.task_id}")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"Bcut 任务超时: {self.task_id}")
+            time.sleep(min(interval, remaining))
+            interval = min(interval * self.POLL_BACKOFF, self.POLL_MAX_INTERVAL)
         logging.info(f"转换成功")
         return json.loads(task_resp["result"])
 
+    def _cache_params(self) -> dict:
+        return {"model_id": MODEL_ID, "version": __version__}
+
     def _make_segments(self, resp_data: dict) -> list[ASRDataSeg]:
         return [ASRDataSeg(u['transcript'], u['start_time'], u['end_time']) for u in resp_data['utterances']]
 
@@ -1,71 +1,239 @@
 
-import requests, base64, random, os, re, textwrap, shutil, tempfile
+import requests, requests.adapters, base64, random, os, re, textwrap, threading, time
 try:
     import playsound as _playsound  # optional, only used when play=True
 except Exception:
     _playsound = None
-try:
-    from mutagen.mp3 import MP3
-    from mutagen import MutagenError
-except ImportError:
-    MP3 = None
-    MutagenError = None
-from typing import List, Optional
-from .constants import voices
+from typing import Dict, List, Optional, Tuple
+from .constants import sessionid, voices
 
 API_BASE_URL = "https://api16-normal-v6.tiktokv.com/media/api/text/speech/invoke/"
 USER_AGENT = "com.zhiliaoapp.musically/2022600030 (Linux; U; Android 7.1.2; es_ES; SM-G988N; Build/NRD90M;tt-ok/3.12.13.1)"
 
 
-def tts(session_id: str,
+class RateLimiter:
+    """Spaces out requests per session id to at most `rate` per second.
+
+    Shared by all threads of a batch, so parallel workers using the same
+    session id queue up instead of hammering the API.  rate <= 0 disables it.
+    """
+
+    def __init__(self, rate: float) -> None:
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot: Dict[str, float] = {}
+
+    def wait(self, session_id: str) -> None:
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(session_id, 0.0))
+            self._next_slot[session_id] = slot + self._interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _prepare_text(req_text: str) -> str:
+    # Basic normalization like the original script
+    return (req_text
+            .replace("+", "plus")
+            .replace(" ", "+")
+            .replace("&", "and")
+            .replace("ä", "ae")
+            .replace("ö", "oe")
+            .replace("ü", "ue")
+            .replace("ß", "ss"))
+
+
+class _SessionHealth:
+    """Success/failure record of one sessionid."""
+
+    def __init__(self) -> None:
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.disabled_until = 0.0
+        self.last_error: Optional[str] = None
+
+
+class TikTokTTSClient:
+    """TikTok TTS over one pooled keep-alive HTTP session.
+
+    Requests rotate round-robin over the configured sessionids.  A sessionid
+    TikTok rejects, or one that keeps failing, is benched for a while and
+    the request is retried on the next one after a jittered exponential
+    backoff.  Audio is decoded from base64 in memory.
+    """
+
+    def __init__(self,
+                 session_ids: List[str],
+                 limiter: Optional[RateLimiter] = None,
+                 timeout: Tuple[float, float] = (5.0, 30.0),
+                 max_attempts: int = 4,
+                 backoff_base: float = 0.5,
+                 backoff_max: float = 8.0,
+                 failure_threshold: int = 3,
+                 failure_cooldown: float = 60.0,
+                 invalid_cooldown: float = 600.0,
+                 pool_size: int = 32) -> None:
+        if not session_ids:
+            raise ValueError("At least one TikTok sessionid is required")
+        self._session_ids = list(session_ids)
+        self._limiter = limiter
+        self._timeout = timeout
+        self._max_attempts = max(1, max_attempts)
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._failure_threshold = failure_threshold
+        self._failure_cooldown = failure_cooldown
+        self._invalid_cooldown = invalid_cooldown
+        self._lock = threading.Lock()
+        self._next = 0
+        self._health = {session_id: _SessionHealth() for session_id in self._session_ids}
+        self._http = requests.Session()
+        self._http.headers["User-Agent"] = USER_AGENT
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._http.mount("https://", adapter)
+
+    def _pick_session(self) -> str:
+        """Next sessionid that is not benched (the soonest back if all are)."""
+        with self._lock:
+            now = time.monotonic()
+            count = len(self._session_ids)
+            for offset in range(count):
+                session_id = self._session_ids[(self._next + offset) % count]
+                if self._health[session_id].disabled_until <= now:
+                    self._next = (self._next + offset + 1) % count
+                    return session_id
+            return min(self._session_ids, key=lambda sid: self._health[sid].disabled_until)
+
+    def _record(self, session_id: str, error: Optional[str] = None, invalid: bool = False) -> None:
+        with self._lock:
+            health = self._health.setdefault(session_id, _SessionHealth())
+            if error is None:
+                health.successes += 1
+                health.consecutive_failures = 0
+                health.disabled_until = 0.0
+                return
+            health.failures += 1
+            health.consecutive_failures += 1
+            health.last_error = error
+            if invalid:
+                health.disabled_until = time.monotonic() + self._invalid_cooldown
+            elif health.consecutive_failures >= self._failure_threshold:
+                health.disabled_until = time.monotonic() + self._failure_cooldown
+
+    def _backoff(self, attempt: int) -> None:
+        # "Full jitter": uniform in [0, base * 2^attempt], capped.
+        time.sleep(random.uniform(0, min(self._backoff_max, self._backoff_base * (2 ** attempt))))
+
+    def session_health(self) -> List[dict]:
+        """Per-sessionid counters; ids are shortened so they are safe to show."""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    "session": f"{session_id[:6]}...",
+                    "healthy": health.disabled_until <= now,
+                    "successes": health.successes,
+                    "failures": health.failures,
+                    "consecutive_failures": health.consecutive_failures,
+                    "benched_for_seconds": max(0.0, round(health.disabled_until - now, 1)),
+                    "last_error": health.last_error,
+                }
+                for session_id, health in self._health.items()
+            ]
+
+    def synthesize(self, text: str, text_speaker: str = "en_us_002", session_id: Optional[str] = None) -> dict:
+        """Speak one piece of text (at most ~200 characters).
+
+        Returns the usual status dict plus ``audio`` (MP3 bytes) on success.
+        With *session_id* only that sessionid is used; otherwise requests
+        rotate over the configured ones.
+        """
+        req_text = _prepare_text(text)
+        url = f"{API_BASE_URL}?text_speaker={text_speaker}&req_text={req_text}&speaker_map_type=0&aid=1233"
+        output_data: dict = {"status": "No attempt made", "status_code": -1}
+        for attempt in range(self._max_attempts):
+            if attempt:
+                self._backoff(attempt - 1)
+            current = session_id or self._pick_session()
+            if self._limiter is not None:
+                self._limiter.wait(current)
+            try:
+                r = self._http.post(url, headers={"Cookie": f"sessionid={current}"}, timeout=self._timeout)
+                if r.status_code >= 500 or r.status_code == 429:
+                    raise requests.HTTPError(f"HTTP {r.status_code}")
+                j = r.json()
+            except (requests.RequestException, ValueError) as exc:
+                self._record(current, str(exc))
+                output_data = {"status": f"Request failed: {exc}", "status_code": -1}
+                continue
+
+            if j.get("message") == "Couldn't load speech. Try again.":
+                self._record(current, "Session ID is invalid", invalid=True)
+                output_data = {"status": "Session ID is invalid", "status_code": 5}
+                continue
+
+            if j.get("status_code") != 0:
+                # Rejected request (bad voice, text too long, ...): retrying will not help.
+                self._record(current)
+                return {"status": str(j.get("message") or "Error").capitalize(), "status_code": j.get("status_code")}
+
+            try:
+                audio = base64.b64decode(j["data"]["v_str"])
+            except (KeyError, TypeError, ValueError) as exc:
+                self._record(current, f"Malformed response: {exc}")
+                output_data = {"status": f"Malformed response: {exc}", "status_code": -1}
+                continue
+
+            self._record(current)
+            return {
+                "status": j["message"].capitalize(),
+                "status_code": j["status_code"],
+                "duration": j["data"]["duration"],
+                "speaker": j["data"]["speaker"],
+                "log": j["extra"]["log_id"],
+                "audio": audio,
+            }
+        return output_data
+
+
+_default_client: Optional[TikTokTTSClient] = None
+_default_client_lock = threading.Lock()
+
+
+def configured_session_ids() -> List[str]:
+    """The TIKTOK_SESSIONID env var (comma separated), else constants.sessionid."""
+    configured = [sid.strip() for sid in os.environ.get("TIKTOK_SESSIONID", "").split(",") if sid.strip()]
+    return configured or list(sessionid)
+
+
+def default_client() -> TikTokTTSClient:
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = TikTokTTSClient(configured_session_ids())
+        return _default_client
+
+
+def tts(session_id: Optional[str],
         text_speaker: str = "en_us_002",
         req_text: str = "TikTok Text To Speech",
         filename: str = "voice.mp3",
-        play: bool = False) -> dict:
+        play: bool = False,
+        client: Optional[TikTokTTSClient] = None) -> dict:
     """Call TikTok TTS for a single piece of text and save to filename."""
-    # Basic normalization like the original script
-    req_text = (req_text
-                .replace("+", "plus")
-                .replace(" ", "+")
-                .replace("&", "and")
-                .replace("ä", "ae")
-                .replace("ö", "oe")
-                .replace("ü", "ue")
-                .replace("ß", "ss"))
-
-    r = requests.post(
-        f"{API_BASE_URL}?text_speaker={text_speaker}&req_text={req_text}&speaker_map_type=0&aid=1233",
-        headers={
-            "User-Agent": USER_AGENT,
-            "Cookie": f"sessionid={session_id}"
-        }
-    )
-
-    j = r.json()
-    if j.get("message") == "Couldn't load speech. Try again.":
-        output_data = {"status": "Session ID is invalid", "status_code": 5}
-        print(output_data)
-        return output_data
-
-    vstr = j["data"]["v_str"]
-    msg = j["message"]
-    scode = j["status_code"]
-    log = j["extra"]["log_id"]
-    dur = j["data"]["duration"]
-    spkr = j["data"]["speaker"]
+    result = (client or default_client()).synthesize(req_text, text_speaker, session_id)
+    audio = result.pop("audio", None)
+    if audio is None:
+        print(result)
+        return result
 
-    b64d = base64.b64decode(vstr)
     with open(filename, "wb") as out:
-        out.write(b64d)
-
-    output_data = {
-        "status": msg.capitalize(),
-        "status_code": scode,
-        "duration": dur,
-        "speaker": spkr,
-        "log": log,
-        "file": filename,
-    }
+        out.write(audio)
+    output_data = {**result, "file": filename}
 
     print(output_data)
 
@@ -94,40 +262,119 @@ def concat_mp3_chunks(chunks_dir: str, output_filename: str) -> None:
                 out.write(fh.read())
 
 
-def synthesize_long_text(session_id: str,
+# MPEG audio frame header tables, indexed by the header's bit fields.
+_MPEG_VERSIONS = {0: 2.5, 2: 2, 3: 1}
+_MPEG_LAYERS = {1: 3, 2: 2, 3: 1}
+_BITRATES_KBPS = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {1: (44100, 48000, 32000), 2: (22050, 24000, 16000), 2.5: (11025, 12000, 8000)}
+
+
+def _mp3_frames(data: bytes):
+    """Yield ``(start, end, samples, sample_rate, is_info)`` for each MPEG
+    audio frame in *data*, skipping ID3 tags and junk between frames.
+    ``is_info`` marks Xing/Info/VBRI header frames, which describe one
+    encoder run and carry no audio."""
+    pos = 0
+    size = len(data)
+    if data[:3] == b"ID3" and size >= 10:
+        # ID3v2 size is "syncsafe": 7 bits per byte; a footer adds 10 bytes.
+        tag_size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        pos = 10 + tag_size + (10 if data[5] & 0x10 else 0)
+    while pos + 4 <= size:
+        b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+        if data[pos] != 0xFF or (b1 & 0xE0) != 0xE0:
+            pos += 1
+            continue
+        version = _MPEG_VERSIONS.get((b1 >> 3) & 3)
+        layer = _MPEG_LAYERS.get((b1 >> 1) & 3)
+        bitrate_index = b2 >> 4
+        rate_index = (b2 >> 2) & 3
+        if version is None or layer is None or bitrate_index in (0, 15) or rate_index == 3:
+            pos += 1
+            continue
+        bitrate = _BITRATES_KBPS[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+        sample_rate = _SAMPLE_RATES[version][rate_index]
+        padding = (b2 >> 1) & 1
+        if layer == 1:
+            samples = 384
+            length = (12 * bitrate // sample_rate + padding) * 4
+        else:
+            samples = 1152 if (layer == 2 or version == 1) else 576
+            length = samples // 8 * bitrate // sample_rate + padding
+        if pos + length > size:
+            break
+        mono = (b3 >> 6) == 3
+        side_info = (17 if mono else 32) if version == 1 else (9 if mono else 17)
+        tag = data[pos + 4 + side_info:pos + 8 + side_info]
+        is_info = layer == 3 and (tag in (b"Xing", b"Info") or data[pos + 36:pos + 40] == b"VBRI")
+        yield pos, pos + length, samples, sample_rate, is_info
+        pos += length
+
+
+def join_mp3(chunks: List[bytes]) -> Tuple[bytes, int]:
+    """Concatenate MP3 *chunks* in order and return ``(mp3_bytes, duration_ms)``.
+
+    Only the audio frames are kept, so the ID3 tags and per-chunk Xing/Info
+    headers (whose frame counts would be wrong for the joined stream) are
+    dropped, and the duration is summed from the frame headers in the same
+    pass.  Chunks with no recognisable frames are passed through unchanged.
+    """
+    parts = []
+    seconds = 0.0
+    for chunk in chunks:
+        frames = [frame for frame in _mp3_frames(chunk) if not frame[4]]
+        if not frames:
+            parts.append(chunk)
+            continue
+        # Consecutive frames are copied as one slice.
+        run_start, run_end = frames[0][0], frames[0][0]
+        for start, end, samples, sample_rate, _is_info in frames:
+            if start != run_end:
+                parts.append(chunk[run_start:run_end])
+                run_start = start
+            run_end = end
+            seconds += samples / sample_rate
+        parts.append(chunk[run_start:run_end])
+    return b"".join(parts), int(seconds * 1000)
+
+
+def synthesize_long_text(session_id: Optional[str],
                          text_speaker: str,
                          text: str,
-                         output_filename: str = "voice.mp3",
+                         output_filename: Optional[str] = None,
                          chunk_size: int = 200,
-                         keep_chunks: bool = False,
-                         play: bool = False) -> dict:
-    """Split long text into chunks, synthesize each, concatenate into one MP3."""
+                         play: bool = False,
+                         client: Optional[TikTokTTSClient] = None) -> dict:
+    """Split long text into chunks, synthesize each, concatenate into one MP3.
+
+    The result carries the MP3 as ``audio`` bytes and its ``duration`` in
+    milliseconds; it is also written to output_filename when one is given.
+    """
     # Split text respecting max TikTok length used in the original (200)
     textlist = textwrap.wrap(text, width=chunk_size, break_long_words=True, break_on_hyphens=False)
+    client = client or default_client()
 
-    tmpdir = tempfile.mkdtemp(prefix="tts_chunks_")
-    try:
-        # Generate chunks
-        for i, segment in enumerate(textlist):
-            tts(session_id, text_speaker, segment, os.path.join(tmpdir, f"{i}.mp3"), False)
-
-        # Concatenate
-        concat_mp3_chunks(tmpdir, output_filename)
-
-        # Calculate duration of the final MP3 file
-        duration_ms = 0
-        if MP3 is not None and os.path.exists(output_filename):
-            # Build exception tuple dynamically
-            exceptions_to_catch = (OSError, AttributeError)
-            if MutagenError is not None:
-                exceptions_to_catch = (OSError, AttributeError, MutagenError)
-            
-            try:
-                audio = MP3(output_filename)
-                duration_ms = int(audio.info.length * 1000)  # Convert seconds to milliseconds
-            except exceptions_to_catch as e:
-                print(f"Warning: Could not read MP3 duration: {e}")
-                duration_ms = 0
+    # Generate chunks; one that still fails after retries fails the whole text
+    chunks = []
+    for segment in textlist:
+        chunk = client.synthesize(segment, text_speaker, session_id)
+        if chunk.get("status_code") != 0:
+            print(chunk)
+            return chunk
+        chunks.append(chunk["audio"])
+
+    audio, duration_ms = join_mp3(chunks)
+
+    if output_filename:
+        with open(output_filename, "wb") as out:
+            out.write(audio)
 
         # Optional playback
         if play and _playsound is not None:
@@ -136,19 +383,16 @@ def synthesize_long_text(session_id: str,
             except Exception:
                 pass
 
-        result = {
-            "status": "Ok",
-            "status_code": 0,
-            "chunks": len(textlist),
-            "speaker": text_speaker,
-            "file": output_filename,
-            "duration": duration_ms,  # Add duration in milliseconds
-        }
-        print(result)
-        return result
-    finally:
-        if not keep_chunks and os.path.isdir(tmpdir):
-            shutil.rmtree(tmpdir, ignore_errors=True)
+    result = {
+        "status": "Ok",
+        "status_code": 0,
+        "chunks": len(textlist),
+        "speaker": text_speaker,
+        "file": output_filename,
+        "duration": duration_ms,  # Add duration in milliseconds
+    }
+    print(result)
+    return {**result, "audio": audio}
 
 
 def random_voice() -> str:
@@ -2,17 +2,30 @@ from __future__ import annotations
 
 import shutil
 import subprocess
-import tempfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set, Tuple
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
 
-from fastapi import APIRouter, Body, HTTPException
+from fastapi import APIRouter, Body, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from app.ASR import transcribe
 from app.ASR.ASRData import from_subtitle_file
 from app.asr_utils import SUPPORTED_EXTENSIONS, convert_directory_to_srt
-from app.core import APP_ROOT, DATA_ROOT, db
+from app.core import APP_ROOT, DATA_ROOT, db, media_info
+from app.core.config import (
+    ASR_AUDIO_CACHE_MAX_BYTES,
+    ASR_AUDIO_CACHE_ROOT,
+    ASR_BCUT_WORKERS,
+    ASR_CONVERT_WORKERS,
+    ASR_MAX_CONCURRENCY,
+)
+from app.jobs import Job, JobCancelled, JobManager
+from app.render_cache import RenderCache
 
 
 class AsrExportRequest(BaseModel):
@@ -74,169 +87,255 @@ class AudioPreparationError(RuntimeError):
         self.reason = reason
 
 
-def _ensure_mp3_payload(data: bytes, source_name: str) -> Tuple[bytes, str, Optional[str]]:
-    suffix = Path(source_name).suffix.lower()
-    if suffix == ".mp3":
-        return data, source_name, None
+# Speech recognition only needs narrowband mono; this is a fraction of the
+# size (and upload time) of a default-quality stereo transcode.
+ASR_AUDIO_SAMPLE_RATE = 16000
+ASR_AUDIO_BITRATE = "32k"
+# Part of every cache key for extracted audio, so changing the settings
+# above must change this too.
+ASR_AUDIO_PROFILE = f"mp3-mono-{ASR_AUDIO_SAMPLE_RATE}-{ASR_AUDIO_BITRATE}"
+
+asr_audio_cache = RenderCache(ASR_AUDIO_CACHE_ROOT, ASR_AUDIO_CACHE_MAX_BYTES)
+
+
+def _extract_asr_audio(file_id: str, source_name: str, content_hash: Optional[str]) -> Tuple[bytes, str, Optional[str]]:
+    """``(mp3_bytes, mp3_name, original_name)`` of a stored file, ready for
+    upload.  MP3 sources are sent as they are; anything else is cut down to
+    ASR_AUDIO_PROFILE by ffmpeg, streamed back over a pipe and cached by the
+    source's content hash."""
+    if Path(source_name).suffix.lower() == ".mp3":
+        stored = db.get_file(file_id)
+        if stored is None:
+            raise AudioPreparationError("Không tìm thấy dữ liệu âm thanh", "no-audio-source")
+        return stored[0], source_name, None
+
+    converted_name = f"{Path(source_name).stem}.mp3"
+    cache_key = None
+    if content_hash:
+        cache_key = RenderCache.make_key({"kind": "asr-audio", "source": content_hash, "profile": ASR_AUDIO_PROFILE})
+        cached = asr_audio_cache.lookup(cache_key, ".mp3")
+        if cached is not None:
+            try:
+                return cached.read_bytes(), converted_name, source_name
+            except FileNotFoundError:  # evicted between lookup and read
+                pass
 
     ffmpeg_path = shutil.which("ffmpeg")
     if not ffmpeg_path:
         raise AudioPreparationError("ffmpeg không khả dụng để trích xuất âm thanh", "ffmpeg-missing")
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix or ".bin") as tmp_in:
-        tmp_in.write(data)
-        input_path = Path(tmp_in.name)
-
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_out:
-        output_path = Path(tmp_out.name)
+    # ffmpeg reads the blob in place; only legacy rows without one go
+    # through stdin.
+    located = db.get_file_path(file_id)
+    source_bytes: Optional[bytes] = None
+    if located is None:
+        stored = db.get_file(file_id)
+        if stored is None:
+            raise AudioPreparationError("Không tìm thấy dữ liệu âm thanh", "no-audio-source")
+        source_bytes = stored[0]
+    cmd = [ffmpeg_path, "-v", "error"]
+    cmd.extend(["-i", "pipe:0"] if located is None else ["-nostdin", "-i", str(located[0])])
+    cmd.extend(
+        [
+            "-vn",
+            "-ac",
+            "1",
+            "-ar",
+            str(ASR_AUDIO_SAMPLE_RATE),
+            "-c:a",
+            "libmp3lame",
+            "-b:a",
+            ASR_AUDIO_BITRATE,
+            "-f",
+            "mp3",
+            "pipe:1",
+        ]
+    )
+    result = subprocess.run(
+        cmd,
+        input=source_bytes,
+        stdin=None if source_bytes is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=False,
+    )
+    if result.returncode != 0:
+        stderr = result.stderr.decode("utf-8", errors="ignore").strip()
+        raise AudioPreparationError(
+            f"Không thể chuyển '{source_name}' sang MP3: {stderr or 'ffmpeg trả về lỗi'}",
+            "audio-conversion-failed",
+        )
 
-    try:
-        result = subprocess.run(
-            [
-                ffmpeg_path,
-                "-y",
-                "-i",
-                str(input_path),
-                "-vn",
-                "-acodec",
-                "libmp3lame",
-                str(output_path),
-            ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=False,
+    converted = result.stdout
+    if not converted:
+        raise AudioPreparationError(
+            f"Không tìm thấy track âm thanh trong '{source_name}'",
+            "no-audio-track",
         )
-        if result.returncode != 0:
-            stderr = result.stderr.decode("utf-8", errors="ignore").strip()
-            raise AudioPreparationError(
-                f"Không thể chuyển '{source_name}' sang MP3: {stderr or 'ffmpeg trả về lỗi'}",
-                "audio-conversion-failed",
-            )
 
-        converted = output_path.read_bytes()
-        if not converted:
-            raise AudioPreparationError(
-                f"Không tìm thấy track âm thanh trong '{source_name}'",
-                "no-audio-track",
-            )
-    finally:
+    if cache_key is not None:
+        temp_file = asr_audio_cache.temp_path(".mp3")
         try:
-            input_path.unlink()
-        except FileNotFoundError:
-            pass
-        try:
-            output_path.unlink()
-        except FileNotFoundError:
-            pass
+            temp_file.write_bytes(converted)
+            asr_audio_cache.store(cache_key, ".mp3", temp_file)
+        except OSError:
+            temp_file.unlink(missing_ok=True)
 
-    converted_name = f"{Path(source_name).stem}.mp3"
     return converted, converted_name, source_name
 
 
-def _transcribe_audio_with_bcut(audio_file_id: str, audio_filename: str) -> Tuple[str, str, Optional[str]]:
-    stored = db.get_file(audio_file_id)
-    if stored is None:
+def _prepare_bcut_audio(job: Job, audio_file_id: str, audio_filename: str) -> Dict[str, Any]:
+    """MP3 payload of a stored file for Bcut, with the names and cache hash
+    :func:`_transcribe_prepared_audio` needs.  Stops with JobCancelled before
+    and after the ffmpeg run once *job* is cancelled."""
+    job.raise_if_cancelled()
+    # A cached probe answers "is there any audio?" without reading the file
+    # into memory or running a conversion that would come back empty.
+    info = media_info.get(audio_file_id)
+    if info is not None and not info["has_audio"]:
+        raise AudioPreparationError(
+            f"Không tìm thấy track âm thanh trong '{audio_filename or audio_file_id}'",
+            "no-audio-track",
+        )
+
+    metadata = db.get_file_metadata(audio_file_id)
+    if metadata is None:
         raise AudioPreparationError("Không tìm thấy dữ liệu âm thanh", "no-audio-source")
 
-    data, _content_type, stored_filename = stored
-    resolved_name = audio_filename or stored_filename
+    resolved_name = audio_filename or metadata.get("filename")
     if not resolved_name:
         resolved_name = audio_file_id
 
+    content_hash = metadata.get("content_hash")
+    job.raise_if_cancelled()
     try:
-        payload, mp3_name, original_name = _ensure_mp3_payload(data, resolved_name)
+        payload, mp3_name, original_name = _extract_asr_audio(audio_file_id, resolved_name, content_hash)
     except AudioPreparationError:
         raise
     except Exception as exc:  # pragma: no cover - unexpected conversion errors
         raise AudioPreparationError(str(exc), "audio-conversion-failed") from exc
+    job.raise_if_cancelled()
+
+    # The stored file's sha256 names the audio without hashing the payload
+    # again; extracted payloads also carry how they were produced.
+    if content_hash:
+        content_hash = f"sha256:{content_hash}" + (f"/{ASR_AUDIO_PROFILE}" if original_name else "")
 
+    return {"payload": payload, "mp3_name": mp3_name, "original_name": original_name, "content_hash": content_hash}
+
+
+def _transcribe_prepared_audio(job: Job, prepared: Dict[str, Any]) -> str:
+    """SRT text from Bcut; the upload, task and polling steps stop with
+    JobCancelled once *job* is cancelled."""
+    job.raise_if_cancelled()
     try:
-        asr_data = transcribe(payload, "BcutASR", use_cache=True)
+        asr_data = transcribe(
+            prepared["payload"],
+            "BcutASR",
+            use_cache=True,
+            content_hash=prepared["content_hash"],
+            cancel_check=job.raise_if_cancelled,
+        )
+    except JobCancelled:
+        raise
     except Exception as exc:  # pragma: no cover - depends on remote service
         raise RuntimeError(str(exc)) from exc
 
     srt_text = asr_data.to_srt()
     if not srt_text.strip():
         raise RuntimeError("Bcut trả về dữ liệu rỗng")
-
-    return srt_text, mp3_name, original_name
+    return srt_text
 
 
-@router.post("/projects/{project_id}/asr/generate-missing")
-def generate_missing_project_srts(
-    project_id: str,
-    payload: Optional[ProjectAsrGenerationRequest] = Body(None),
-) -> Dict[str, Any]:
-    project = db.get_project(project_id)
-    if project is None:
-        raise HTTPException(status_code=404, detail=f"Project not found: {project_id}")
+asr_jobs = JobManager("asr", db, ASR_MAX_CONCURRENCY)
+# Shared by every ASR job, so the number of ffmpeg processes and Bcut
+# sessions stays bounded however many projects transcribe at once.
+_convert_pool = ThreadPoolExecutor(max_workers=max(1, ASR_CONVERT_WORKERS), thread_name_prefix="asr-convert")
+_bcut_pool = ThreadPoolExecutor(max_workers=max(1, ASR_BCUT_WORKERS), thread_name_prefix="asr-bcut")
 
-    project_files = project.get("files") or []
+# Result list each outcome of a media file is reported in.
+_RESULT_LISTS = {
+    "generated": "generated",
+    "skipped": "skipped",
+    "missing": "missing_sources",
+    "error": "errors",
+}
 
-    def _is_tts_generated_audio(file_obj: Dict[str, Any]) -> bool:
-        """Detect audio tracks that were produced by the batch TTS generator."""
 
-        if not isinstance(file_obj, dict):
-            return False
-        if file_obj.get("type") != "audio":
-            return False
+def _is_tts_generated_audio(file_obj: Dict[str, Any]) -> bool:
+    """Detect audio tracks that were produced by the batch TTS generator."""
 
-        file_id = str(file_obj.get("id") or "")
-        if file_id.startswith("tts-"):
-            return True
+    if not isinstance(file_obj, dict):
+        return False
+    if file_obj.get("type") != "audio":
+        return False
 
-        raw_name = str(file_obj.get("name") or "")
-        normalized_name = raw_name.lower()
-        if normalized_name.startswith("tts_") and "_subtitle_" in normalized_name:
+    file_id = str(file_obj.get("id") or "")
+    if file_id.startswith("tts-"):
+        return True
+
+    raw_name = str(file_obj.get("name") or "")
+    normalized_name = raw_name.lower()
+    if normalized_name.startswith("tts_") and "_subtitle_" in normalized_name:
+        return True
+
+    storage_path = (
+        file_obj.get("storagePath")
+        or file_obj.get("storage_path")
+        or ""
+    )
+    if storage_path:
+        storage_name = Path(str(storage_path)).name.lower()
+        if storage_name.startswith("tts_") and "_subtitle_" in storage_name:
             return True
 
-        storage_path = (
-            file_obj.get("storagePath")
-            or file_obj.get("storage_path")
-            or ""
-        )
-        if storage_path:
-            storage_name = Path(str(storage_path)).name.lower()
-            if storage_name.startswith("tts_") and "_subtitle_" in storage_name:
-                return True
+    return False
 
-        return False
 
-    media_files = [
-        f
-        for f in project_files
-        if isinstance(f, dict) and f.get("type") in {"video", "audio"}
-    ]
-    existing_srt_stems = {
-        Path(f.get("name", "")).stem.lower()
-        for f in project_files
-        if isinstance(f, dict) and f.get("type") == "srt" and f.get("name")
+def _file_entry(file_obj: Dict[str, Any], **fields: Any) -> Dict[str, Any]:
+    return {
+        "file_id": file_obj.get("id"),
+        "file_name": file_obj.get("name"),
+        "file_type": file_obj.get("type"),
+        **fields,
     }
 
-    if not media_files:
-        return {
-            "status": "ok",
-            "project_id": project_id,
-            "generated": [],
-            "skipped": [],
-            "missing_sources": [],
-            "errors": [],
-            "source_dir": None,
-            "output_dir": None,
-        }
-
-    request_payload = payload or ProjectAsrGenerationRequest()
-    default_source = DATA_ROOT / project_id / "asr"
-    source_dir = _resolve_path(request_payload.source_dir, default=default_source)
-    if source_dir is None:
-        source_dir = default_source
-
-    output_dir = _resolve_path(request_payload.output_dir)
-    if output_dir is None:
-        output_dir = default_source
-
-    output_dir.mkdir(parents=True, exist_ok=True)
 
+def _generated_entry(
+    file_obj: Dict[str, Any],
+    output_path: Path,
+    srt_text: str,
+    *,
+    audio_source: Optional[Dict[str, Any]] = None,
+    source_descriptor: Optional[str] = None,
+    audio_converted_filename: Optional[str] = None,
+) -> Dict[str, Any]:
+    output_path.write_text(srt_text, encoding="utf-8")
+    return _file_entry(
+        file_obj,
+        source=source_descriptor or str(output_path),
+        output=str(output_path),
+        srt_filename=output_path.name,
+        srt_content=srt_text,
+        audio_file_id=audio_source.get("id") if audio_source else None,
+        audio_file_name=audio_source.get("name") if audio_source else None,
+        audio_source_type=audio_source.get("type") if audio_source else None,
+        audio_converted_filename=audio_converted_filename,
+    )
+
+
+def _plan_project_asr(
+    media_files: List[Dict[str, Any]],
+    existing_srt_stems: Set[str],
+    source_dir: Path,
+    output_dir: Path,
+) -> Tuple[List[Tuple[Dict[str, Any], str, Dict[str, Any]]], List[Dict[str, Any]]]:
+    """Decide what to do with each media file without doing any of it.
+
+    Returns ``(outcomes, tasks)``: files settled right away as
+    ``(media, outcome, entry)``, and the ones that need an existing subtitle
+    file converted (``source_file``) or audio transcribed (``audio``).
+    """
     source_index: Dict[str, Path] = {}
     if source_dir.exists():
         for candidate in source_dir.rglob("*"):
@@ -255,69 +354,10 @@ def generate_missing_project_srts(
             continue
         audio_index.setdefault(Path(name).stem.lower(), media)
 
-    generated: List[Dict[str, Any]] = []
-    missing_sources: List[Dict[str, Any]] = []
-    skipped: List[Dict[str, Any]] = []
-    errors: List[Dict[str, Any]] = []
+    outcomes: List[Tuple[Dict[str, Any], str, Dict[str, Any]]] = []
+    tasks: List[Dict[str, Any]] = []
     processed_targets: Set[str] = set()
 
-    def _append_skip(file_obj: Dict[str, Any], reason: str) -> None:
-        skipped.append(
-            {
-                "file_id": file_obj.get("id"),
-                "file_name": file_obj.get("name"),
-                "file_type": file_obj.get("type"),
-                "reason": reason,
-            }
-        )
-
-    def _append_missing(file_obj: Dict[str, Any], reason: str) -> None:
-        missing_sources.append(
-            {
-                "file_id": file_obj.get("id"),
-                "file_name": file_obj.get("name"),
-                "file_type": file_obj.get("type"),
-                "reason": reason,
-            }
-        )
-
-    def _append_error(file_obj: Dict[str, Any], message: str, *, reason: Optional[str] = None) -> None:
-        errors.append(
-            {
-                "file_id": file_obj.get("id"),
-                "file_name": file_obj.get("name"),
-                "file_type": file_obj.get("type"),
-                "error": message,
-                "reason": reason,
-            }
-        )
-
-    def _append_generated(
-        file_obj: Dict[str, Any],
-        output_path: Path,
-        srt_text: str,
-        *,
-        audio_source: Optional[Dict[str, Any]] = None,
-        source_descriptor: Optional[str] = None,
-        audio_converted_filename: Optional[str] = None,
-    ) -> None:
-        output_path.write_text(srt_text, encoding="utf-8")
-        generated.append(
-            {
-                "file_id": file_obj.get("id"),
-                "file_name": file_obj.get("name"),
-                "file_type": file_obj.get("type"),
-                "source": source_descriptor or str(output_path),
-                "output": str(output_path),
-                "srt_filename": output_path.name,
-                "srt_content": srt_text,
-                "audio_file_id": audio_source.get("id") if audio_source else None,
-                "audio_file_name": audio_source.get("name") if audio_source else None,
-                "audio_source_type": audio_source.get("type") if audio_source else None,
-                "audio_converted_filename": audio_converted_filename,
-            }
-        )
-
     for media in media_files:
         media_name = media.get("name")
         media_id = media.get("id")
@@ -328,7 +368,7 @@ def generate_missing_project_srts(
         stem_lower = stem.lower()
 
         if _is_tts_generated_audio(media):
-            _append_skip(media, "tts-generated-audio")
+            outcomes.append((media, "skipped", _file_entry(media, reason="tts-generated-audio")))
             continue
 
         if stem_lower in processed_targets:
@@ -336,22 +376,13 @@ def generate_missing_project_srts(
         processed_targets.add(stem_lower)
 
         if stem_lower in existing_srt_stems:
-            _append_skip(media, "subtitle-already-present")
+            outcomes.append((media, "skipped", _file_entry(media, reason="subtitle-already-present")))
             continue
 
+        output_path = output_dir / f"{stem}.srt"
         source_file = source_index.get(stem_lower)
         if source_file is not None:
-            output_path = output_dir / f"{stem}.srt"
-            try:
-                if not output_path.exists():
-                    asr_data = from_subtitle_file(str(source_file))
-                    asr_data.to_srt(save_path=str(output_path))
-                srt_text = output_path.read_text(encoding="utf-8")
-                if not srt_text.strip():
-                    raise ValueError("Generated SRT is empty")
-                _append_generated(media, output_path, srt_text, source_descriptor=str(source_file))
-            except Exception as exc:  # pragma: no cover
-                _append_error(media, str(exc))
+            tasks.append({"media": media, "output_path": output_path, "source_file": source_file})
             continue
 
         audio_candidate: Optional[Dict[str, Any]]
@@ -363,46 +394,262 @@ def generate_missing_project_srts(
             )
 
         if audio_candidate is None:
-            _append_missing(media, "no-audio-source")
+            outcomes.append((media, "missing", _file_entry(media, reason="no-audio-source")))
             continue
 
-        audio_name = audio_candidate.get("name") or media_name
-        output_path = output_dir / f"{stem}.srt"
-        try:
-            srt_text, converted_name, original_source = _transcribe_audio_with_bcut(
-                audio_candidate.get("id"),
-                audio_name,
-            )
-        except AudioPreparationError as exc:
+        tasks.append(
+            {
+                "media": media,
+                "output_path": output_path,
+                "audio": audio_candidate,
+                "audio_name": audio_candidate.get("name") or media_name,
+            }
+        )
+
+    return outcomes, tasks
+
+
+def _run_asr_tasks(
+    job: Job,
+    project_id: str,
+    media_files: List[Dict[str, Any]],
+    outcomes: List[Tuple[Dict[str, Any], str, Dict[str, Any]]],
+    tasks: List[Dict[str, Any]],
+    source_dir: Path,
+    output_dir: Path,
+) -> Dict[str, Any]:
+    """Run the planned tasks: ffmpeg extraction on the convert pool feeding
+    Bcut on the network pool.  Each file's status and the per-outcome counts
+    are published in the job details as they change; the entries themselves
+    (with their SRT text) only go into the result."""
+    entries: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+    statuses: Dict[str, str] = {}
+    counts: Dict[str, int] = {key: 0 for key in _RESULT_LISTS.values()}
+    total = len(tasks)
+    done = 0
+
+    def set_status(media: Dict[str, Any], status: str) -> None:
+        statuses[str(media.get("id"))] = status
+        job.update(details={"files": dict(statuses)})
+
+    def settle(media: Dict[str, Any], outcome: str, entry: Dict[str, Any], *, counted: bool = True) -> None:
+        nonlocal done
+        entries[str(media.get("id"))] = (outcome, entry)
+        counts[_RESULT_LISTS[outcome]] += 1
+        statuses[str(media.get("id"))] = outcome
+        details = {"files": dict(statuses), "counts": dict(counts)}
+        if not counted:
+            job.update(details=details)
+            return
+        done += 1
+        job.update(progress=0.99 * done / total, message=f"Đã xử lý {done}/{total} tệp", details={**details, "done": done})
+
+    def settle_failure(task: Dict[str, Any], exc: Exception) -> None:
+        media = task["media"]
+        if isinstance(exc, AudioPreparationError):
             if exc.reason in {"no-audio-source", "no-audio-track"}:
-                _append_missing(media, exc.reason)
+                settle(media, "missing", _file_entry(media, reason=exc.reason))
             else:
-                _append_error(media, str(exc), reason=exc.reason)
-            continue
-        except RuntimeError as exc:
-            _append_error(media, f"Bcut lỗi: {exc}", reason="bcut-error")
+                settle(media, "error", _file_entry(media, error=str(exc), reason=exc.reason))
+        elif isinstance(exc, RuntimeError):
+            settle(media, "error", _file_entry(media, error=f"Bcut lỗi: {exc}", reason="bcut-error"))
+        else:
+            settle(media, "error", _file_entry(media, error=str(exc), reason=None))
+
+    for media, outcome, entry in outcomes:
+        settle(media, outcome, entry, counted=False)
+    job.update(message="Đang tạo phụ đề...", details={"total": total, "done": 0})
+
+    waiting: Deque[Dict[str, Any]] = deque()
+    for task in tasks:
+        set_status(task["media"], "queued")
+        if "source_file" not in task:
+            waiting.append(task)
             continue
+        media, output_path, source_file = task["media"], task["output_path"], task["source_file"]
+        try:
+            if not output_path.exists():
+                asr_data = from_subtitle_file(str(source_file))
+                asr_data.to_srt(save_path=str(output_path))
+            srt_text = output_path.read_text(encoding="utf-8")
+            if not srt_text.strip():
+                raise ValueError("Generated SRT is empty")
+            settle(media, "generated", _generated_entry(media, output_path, srt_text, source_descriptor=str(source_file)))
+        except Exception as exc:  # pragma: no cover
+            settle(media, "error", _file_entry(media, error=str(exc), reason=None))
+        job.raise_if_cancelled()
+
+    # Converted MP3s wait in memory for a Bcut worker, so only this many files
+    # are in flight at once.
+    in_flight_limit = max(1, ASR_CONVERT_WORKERS) + max(1, ASR_BCUT_WORKERS)
+    pending: Dict[Future, Tuple[str, Dict[str, Any]]] = {}
+    try:
+        while waiting or pending:
+            while waiting and len(pending) < in_flight_limit:
+                task = waiting.popleft()
+                set_status(task["media"], "converting")
+                future = _convert_pool.submit(_prepare_bcut_audio, job, task["audio"].get("id"), task["audio_name"])
+                pending[future] = ("convert", task)
+
+            ready, _ = wait_futures(list(pending), timeout=0.5, return_when=FIRST_COMPLETED)
+            job.raise_if_cancelled()
+            for future in ready:
+                stage, task = pending.pop(future)
+                try:
+                    value = future.result()
+                except Exception as exc:
+                    settle_failure(task, exc)
+                    continue
+                if stage == "convert":
+                    set_status(task["media"], "transcribing")
+                    task["prepared"] = value
+                    pending[_bcut_pool.submit(_transcribe_prepared_audio, job, value)] = ("bcut", task)
+                    continue
+
+                prepared = task["prepared"]
+                converted_name, original_source = prepared["mp3_name"], prepared["original_name"]
+                descriptor = f"BcutASR({converted_name})"
+                if original_source and original_source != converted_name:
+                    descriptor = f"BcutASR({converted_name} ⇐ {original_source})"
+                settle(
+                    task["media"],
+                    "generated",
+                    _generated_entry(
+                        task["media"],
+                        task["output_path"],
+                        value,
+                        audio_source=task["audio"],
+                        source_descriptor=descriptor,
+                        audio_converted_filename=converted_name if original_source else None,
+                    ),
+                )
+    except JobCancelled:
+        # Queued work is dropped here; running work sees the same cancel
+        # event at its next stage boundary (an ffmpeg run or Bcut request
+        # already under way still finishes first).
+        for future in pending:
+            future.cancel()
+        raise
 
-        descriptor = f"BcutASR({converted_name})"
-        if original_source and original_source != converted_name:
-            descriptor = f"BcutASR({converted_name} ⇐ {original_source})"
-
-        _append_generated(
-            media,
-            output_path,
-            srt_text,
-            audio_source=audio_candidate,
-            source_descriptor=descriptor,
-            audio_converted_filename=converted_name if original_source else None,
-        )
+    # Report in project order, as the sequential endpoint did.
+    results: Dict[str, List[Dict[str, Any]]] = {key: [] for key in _RESULT_LISTS.values()}
+    for media in media_files:
+        settled = entries.get(str(media.get("id")))
+        if settled is not None:
+            results[_RESULT_LISTS[settled[0]]].append(settled[1])
 
     return {
         "status": "ok",
         "project_id": project_id,
         "source_dir": str(source_dir),
         "output_dir": str(output_dir),
-        "generated": generated,
-        "missing_sources": missing_sources,
-        "skipped": skipped,
-        "errors": errors,
+        **results,
+    }
+
+
+def _project_asr_job(
+    job: Job, project_id: str, project: Dict[str, Any], request_payload: ProjectAsrGenerationRequest
+) -> Dict[str, Any]:
+    """Plan the project's media files (which walks the source directory)
+    and transcribe what is missing, all off the event loop."""
+    project_files = project.get("files") or []
+
+    media_files = [
+        f
+        for f in project_files
+        if isinstance(f, dict) and f.get("type") in {"video", "audio"}
+    ]
+    existing_srt_stems = {
+        Path(f.get("name", "")).stem.lower()
+        for f in project_files
+        if isinstance(f, dict) and f.get("type") == "srt" and f.get("name")
     }
+
+    if not media_files:
+        return {
+            "status": "ok",
+            "project_id": project_id,
+            "generated": [],
+            "skipped": [],
+            "missing_sources": [],
+            "errors": [],
+            "source_dir": None,
+            "output_dir": None,
+        }
+
+    default_source = DATA_ROOT / project_id / "asr"
+    source_dir = _resolve_path(request_payload.source_dir, default=default_source)
+    if source_dir is None:
+        source_dir = default_source
+
+    output_dir = _resolve_path(request_payload.output_dir)
+    if output_dir is None:
+        output_dir = default_source
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    job.update(message="Đang tìm tệp cần tạo phụ đề...", details={"media_count": len(media_files)})
+    outcomes, tasks = _plan_project_asr(media_files, existing_srt_stems, source_dir, output_dir)
+    job.raise_if_cancelled()
+    return _run_asr_tasks(job, project_id, media_files, outcomes, tasks, source_dir, output_dir)
+
+
+@router.post("/projects/{project_id}/asr/generate-missing")
+async def generate_missing_project_srts(
+    project_id: str,
+    payload: Optional[ProjectAsrGenerationRequest] = Body(None),
+    wait: bool = Query(True, description="Wait for every file to finish and return the result"),
+) -> Dict[str, Any]:
+    project = await run_in_threadpool(db.get_project, project_id)
+    if project is None:
+        raise HTTPException(status_code=404, detail=f"Project not found: {project_id}")
+
+    request_payload = payload or ProjectAsrGenerationRequest()
+    job = asr_jobs.submit(
+        lambda job: _project_asr_job(job, project_id, project, request_payload),
+        project_id=project_id,
+    )
+
+    if wait:
+        snapshot = await asr_jobs.wait(job.id)
+        if snapshot and snapshot.get("result"):
+            return snapshot["result"]
+        return {
+            "status": "error",
+            "message": (snapshot or {}).get("error") or f"ASR {(snapshot or {}).get('status', 'failed')}",
+            "job_id": job.id,
+        }
+
+    return {"status": "queued", "job_id": job.id, "message": "Tạo phụ đề đã được đưa vào hàng đợi"}
+
+
+@router.get("/asr-jobs")
+def list_asr_jobs(project_id: Optional[str] = None, limit: int = Query(50, ge=1, le=500)) -> List[Dict[str, Any]]:
+    return asr_jobs.list_jobs(project_id=project_id, limit=limit)
+
+
+@router.get("/asr-jobs/{job_id}")
+def get_asr_job(job_id: str) -> Dict[str, Any]:
+    snapshot = asr_jobs.get(job_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail=f"ASR job not found: {job_id}")
+    return snapshot
+
+
+@router.post("/asr-jobs/{job_id}/cancel")
+def cancel_asr_job(job_id: str) -> Dict[str, Any]:
+    if asr_jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"ASR job not found: {job_id}")
+    cancelled = asr_jobs.cancel(job_id)
+    return {"status": "cancelling" if cancelled else "not-running", "job_id": job_id}
+
+
+@router.get("/asr-jobs/{job_id}/events")
+def stream_asr_job(job_id: str) -> StreamingResponse:
+    if asr_jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"ASR job not found: {job_id}")
+    return StreamingResponse(
+        asr_jobs.events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -12,7 +12,7 @@ import requests
 from fastapi import APIRouter, BackgroundTasks, HTTPException
 from pydantic import BaseModel
 
-from app.core import db
+from app.core import db, media_info
 
 router = APIRouter(prefix="/downloads")
 
@@ -497,21 +497,20 @@ async def _download_video_task(download_id: str, data: DownloadRequest) -> None:
         else:
             raise ValueError(f"Invalid download type: {data.type}")
         
-        # Read video file and save to database
-        with open(video_path, "rb") as f:
-            video_data = f.read()
-        
+        # Move the downloaded file into the blob store and register it
         file_id = f"{data.video_id}-{dt.datetime.utcnow().timestamp()}"
         created_at = dt.datetime.utcnow().isoformat()
         
-        storage_path, file_size = db.save_file(
+        storage_path, file_size = db.save_file_from_path(
             file_id=file_id,
             project_id=data.project_id,
             filename=video_path.name,
             content_type="video/mp4",
-            data=video_data,
+            source_path=video_path,
             created_at=created_at,
+            move=True,
         )
+        media_info.prefetch(file_id)
         
         # Update download status to completed
         db.update_download_status(
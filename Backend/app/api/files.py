@@ -1,13 +1,24 @@
 from __future__ import annotations
 
 import datetime as dt
-from typing import Any, Dict, Optional
+import hashlib
+import os
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from fastapi import APIRouter, File, Form, HTTPException, UploadFile
-from fastapi.responses import Response
+from fastapi import APIRouter, File, Form, Header, HTTPException, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 
-from app.core import db
+from app.core import db, media_info
+
+STREAM_CHUNK_SIZE = 256 * 1024
+UPLOAD_READ_SIZE = 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+MAX_PART_SIZE = 64 * 1024 * 1024
 
 
 class FileUploadResponse(BaseModel):
@@ -17,25 +28,46 @@ class FileUploadResponse(BaseModel):
     created_at: Optional[str] = None
 
 
+class UploadInitRequest(BaseModel):
+    file_id: str
+    filename: str
+    size: int
+    project_id: Optional[str] = None
+    content_type: Optional[str] = None
+    part_size: Optional[int] = None
+
+
+class UploadSessionResponse(BaseModel):
+    upload_id: str
+    file_id: str
+    size: int
+    part_size: int
+    part_count: int
+    received_parts: List[int]
+
+
 router = APIRouter(prefix="/files")
 
 
 @router.post("", response_model=FileUploadResponse)
-async def upload_file(
+def upload_file(
     file_id: str = Form(...),
     project_id: Optional[str] = Form(None),
     file: UploadFile = File(...),
 ) -> FileUploadResponse:
-    data = await file.read()
+    # Plain ``def`` so FastAPI runs this in the threadpool: the multipart body
+    # is already spooled to a temp file, and we copy it into the blob store in
+    # fixed-size chunks instead of reading it into memory.
     created_at = dt.datetime.utcnow().isoformat()
-    storage_path, file_size = db.save_file(
+    storage_path, file_size = db.save_file_from_chunks(
         file_id=file_id,
         project_id=project_id,
         filename=file.filename or file_id,
         content_type=file.content_type,
-        data=data,
+        chunks=iter(lambda: file.file.read(UPLOAD_READ_SIZE), b""),
         created_at=created_at,
     )
+    media_info.prefetch(file_id)
     return FileUploadResponse(
         status="saved",
         path=str(storage_path),
@@ -44,16 +76,289 @@ async def upload_file(
     )
 
 
+# --- Resumable uploads -------------------------------------------------------------
+# init -> PUT each part (any order, retries allowed) -> complete.  Parts are kept
+# on disk under data/blobs/uploads/{upload_id}/ so a client that lost its
+# connection can ask which parts arrived and send only the missing ones.
+# Sessions left without activity for UPLOAD_SESSION_TTL_SECONDS are removed,
+# parts included, when the backend starts.
+
+
+def _part_path(upload_id: str, part_number: int) -> Path:
+    return db.upload_parts_dir(upload_id) / f"{part_number:06d}.part"
+
+
+def _expected_part_size(session: Dict[str, Any], part_number: int) -> int:
+    if part_number < session["part_count"] - 1:
+        return session["part_size"]
+    return session["size"] - session["part_size"] * (session["part_count"] - 1)
+
+
+def _received_parts(session: Dict[str, Any]) -> List[int]:
+    received: List[int] = []
+    for part_number in range(session["part_count"]):
+        path = _part_path(session["id"], part_number)
+        if path.is_file() and path.stat().st_size == _expected_part_size(session, part_number):
+            received.append(part_number)
+    return received
+
+
+def _session_response(session: Dict[str, Any]) -> UploadSessionResponse:
+    return UploadSessionResponse(
+        upload_id=session["id"],
+        file_id=session["file_id"],
+        size=session["size"],
+        part_size=session["part_size"],
+        part_count=session["part_count"],
+        received_parts=_received_parts(session),
+    )
+
+
+def _require_session(upload_id: str) -> Dict[str, Any]:
+    session = db.get_upload_session(upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return session
+
+
+@router.post("/uploads", response_model=UploadSessionResponse)
+def init_upload(payload: UploadInitRequest) -> UploadSessionResponse:
+    if payload.size < 0:
+        raise HTTPException(status_code=400, detail="size must not be negative")
+    part_size = payload.part_size or DEFAULT_PART_SIZE
+    if part_size <= 0 or part_size > MAX_PART_SIZE:
+        raise HTTPException(status_code=400, detail=f"part_size must be between 1 and {MAX_PART_SIZE}")
+
+    created_at = dt.datetime.utcnow().isoformat()
+    session = {
+        "id": uuid.uuid4().hex,
+        "file_id": payload.file_id,
+        "project_id": payload.project_id,
+        "filename": payload.filename,
+        "content_type": payload.content_type,
+        "size": payload.size,
+        "part_size": part_size,
+        "part_count": max(1, -(-payload.size // part_size)),
+        "created_at": created_at,
+    }
+    db.upload_parts_dir(session["id"]).mkdir(parents=True, exist_ok=True)
+    db.save_upload_session(session, created_at)
+    return _session_response(session)
+
+
+@router.get("/uploads/{upload_id}", response_model=UploadSessionResponse)
+def get_upload(upload_id: str) -> UploadSessionResponse:
+    return _session_response(_require_session(upload_id))
+
+
+@router.put("/uploads/{upload_id}/parts/{part_number}")
+async def upload_part(upload_id: str, part_number: int, request: Request) -> Dict[str, Any]:
+    # The body can only be streamed on the event loop; the session lookup,
+    # hashing and disk writes run in the threadpool, in UPLOAD_READ_SIZE
+    # batches, so a large part never stalls other requests.
+    session = await run_in_threadpool(_require_session, upload_id)
+    if part_number < 0 or part_number >= session["part_count"]:
+        raise HTTPException(status_code=400, detail=f"part_number must be in [0, {session['part_count']})")
+
+    expected = _expected_part_size(session, part_number)
+    target = _part_path(upload_id, part_number)
+    await run_in_threadpool(target.parent.mkdir, parents=True, exist_ok=True)
+    temp_target = target.with_suffix(f".{uuid.uuid4().hex}.tmp")
+
+    hasher = hashlib.md5()
+    received = 0
+
+    def _write(handle: Any, data: bytes) -> None:
+        hasher.update(data)
+        handle.write(data)
+
+    try:
+        handle = await run_in_threadpool(open, temp_target, "wb")
+        try:
+            pending = bytearray()
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > expected:
+                    raise HTTPException(status_code=400, detail=f"Part {part_number} exceeds {expected} bytes")
+                pending += chunk
+                if len(pending) >= UPLOAD_READ_SIZE:
+                    await run_in_threadpool(_write, handle, bytes(pending))
+                    pending.clear()
+            if pending:
+                await run_in_threadpool(_write, handle, bytes(pending))
+        finally:
+            await run_in_threadpool(handle.close)
+        if received != expected:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Part {part_number} has {received} bytes, expected {expected}",
+            )
+        # Only a fully received part becomes visible, so a dropped connection
+        # never leaves a truncated part that would be mistaken for a good one.
+        await run_in_threadpool(os.replace, temp_target, target)
+    finally:
+        await run_in_threadpool(temp_target.unlink, missing_ok=True)
+
+    return {"status": "received", "part_number": part_number, "size": received, "etag": hasher.hexdigest()}
+
+
+@router.post("/uploads/{upload_id}/complete", response_model=FileUploadResponse)
+def complete_upload(upload_id: str) -> FileUploadResponse:
+    session = _require_session(upload_id)
+    received = _received_parts(session)
+    missing = sorted(set(range(session["part_count"])) - set(received))
+    if missing:
+        raise HTTPException(status_code=409, detail={"message": "Upload is incomplete", "missing_parts": missing})
+
+    def _iter_parts() -> Iterator[bytes]:
+        for part_number in range(session["part_count"]):
+            with open(_part_path(upload_id, part_number), "rb") as handle:
+                yield from iter(lambda: handle.read(UPLOAD_READ_SIZE), b"")
+
+    created_at = dt.datetime.utcnow().isoformat()
+    storage_path, file_size = db.save_file_from_chunks(
+        file_id=session["file_id"],
+        project_id=session["project_id"],
+        filename=session["filename"] or session["file_id"],
+        content_type=session["content_type"],
+        chunks=_iter_parts(),
+        created_at=created_at,
+    )
+    db.delete_upload_session(upload_id)
+    media_info.prefetch(session["file_id"])
+    return FileUploadResponse(
+        status="saved",
+        path=str(storage_path),
+        size=file_size,
+        created_at=created_at,
+    )
+
+
+@router.delete("/uploads/{upload_id}")
+def abort_upload(upload_id: str) -> Dict[str, str]:
+    _require_session(upload_id)
+    db.delete_upload_session(upload_id)
+    return {"status": "aborted"}
+
+
+def _parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single ``bytes=`` range into an inclusive ``(start, end)`` pair.
+
+    Returns ``None`` when the header is absent or describes several ranges (we
+    then serve the whole file); raises 416 when the range is unsatisfiable.
+    """
+    if not range_header:
+        return None
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    start_text, _, end_text = spec.strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            # Suffix range: the last N bytes.
+            suffix = int(end_text)
+            if suffix <= 0:
+                raise ValueError
+            start = max(size - suffix, 0)
+            end = size - 1
+    except ValueError:
+        return None
+
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, min(end, size - 1)
+
+
+def _if_range_matches(if_range: Optional[str], etag: str, last_modified: float) -> bool:
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return if_range == etag
+    try:
+        return parsedate_to_datetime(if_range).timestamp() >= int(last_modified)
+    except (TypeError, ValueError):
+        return False
+
+
+def _iter_file(path: Path, start: int, length: int) -> Iterator[bytes]:
+    with open(path, "rb") as handle:
+        handle.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = handle.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
 @router.get("/{file_id}")
-def download_file(file_id: str) -> Response:
-    stored = db.get_file(file_id)
-    if stored is None:
+def download_file(
+    file_id: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None, alias="If-Range"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+) -> Response:
+    metadata = db.get_file_metadata(file_id)
+    if metadata is None:
         raise HTTPException(status_code=404, detail="File not found")
 
-    data, content_type, filename = stored
-    media_type = content_type or "application/octet-stream"
-    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
-    return Response(content=data, media_type=media_type, headers=headers)
+    media_type = metadata["content_type"] or "application/octet-stream"
+    headers = {
+        "Content-Disposition": f'attachment; filename="{metadata["filename"]}"',
+        "Accept-Ranges": "bytes",
+    }
+
+    storage_path = Path(metadata["storage_path"]) if metadata["storage_path"] else None
+    if storage_path is None or not storage_path.is_file():
+        # Legacy row whose payload only exists in the BLOB column.
+        stored = db.get_file(file_id)
+        if stored is None:
+            raise HTTPException(status_code=404, detail="File not found")
+        data = stored[0]
+        byte_range = _parse_range(range_header, len(data))
+        if byte_range is None:
+            return Response(content=data, media_type=media_type, headers=headers)
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+        return Response(content=data[start : end + 1], status_code=206, media_type=media_type, headers=headers)
+
+    stat = os.stat(storage_path)
+    size = stat.st_size
+    etag = f'"{metadata["content_hash"] or f"{int(stat.st_mtime)}-{size}"}"'
+    headers["ETag"] = etag
+    headers["Last-Modified"] = formatdate(stat.st_mtime, usegmt=True)
+
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    if _if_range_matches(if_range, etag, stat.st_mtime):
+        byte_range = _parse_range(range_header, size)
+
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(_iter_file(storage_path, 0, size), media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    length = end - start + 1
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(
+        _iter_file(storage_path, start, length),
+        status_code=206,
+        media_type=media_type,
+        headers=headers,
+    )
 
 
 @router.delete("/{file_id}")
@@ -68,3 +373,14 @@ def file_info(file_id: str) -> Dict[str, Any]:
     if metadata is None:
         raise HTTPException(status_code=404, detail="File not found")
     return metadata
+
+
+@router.get("/{file_id}/media-info")
+async def file_media_info(file_id: str) -> Dict[str, Any]:
+    """Duration, streams, frame rate, rotation and codecs of a stored media file."""
+    if db.get_file_metadata(file_id) is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    info = await media_info.get_async(file_id)
+    if info is None:
+        raise HTTPException(status_code=422, detail="File could not be probed as media")
+    return info
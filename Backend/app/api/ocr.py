@@ -3,7 +3,6 @@ from __future__ import annotations
 import base64
 import concurrent.futures
 import io
-import subprocess
 import tempfile
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
@@ -15,7 +14,7 @@ from fastapi import APIRouter, HTTPException
 from PIL import Image
 from pydantic import BaseModel
 
-from app.core import db
+from app.core import db, media_info
 
 # Try to import GPU-accelerated OCR libraries
 try:
@@ -84,30 +83,6 @@ def _check_tesseract_installation(language: str = "chi_sim") -> Tuple[bool, str]
         return False, f"Error checking Tesseract: {str(e)}"
 
 
-def _get_video_rotation(video_path: Path) -> int:
-    """
-    Detect video rotation metadata using ffprobe.
-    
-    Returns rotation angle (0, 90, 180, 270) based on video metadata.
-    """
-    try:
-        cmd = [
-            "ffprobe",
-            "-v", "error",
-            "-select_streams", "v:0",
-            "-show_entries", "stream_tags=rotate",
-            "-of", "default=noprint_wrappers=1:nokey=1",
-            str(video_path),
-        ]
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
-        if result.returncode == 0 and result.stdout:
-            rotation = int(result.stdout.decode().strip())
-            return rotation
-    except (ValueError, Exception):
-        pass
-    return 0
-
-
 def _apply_rotation(frame: np.ndarray, rotation: int) -> np.ndarray:
     """
     Apply rotation correction to frame based on metadata.
@@ -129,83 +104,55 @@ def _apply_rotation(frame: np.ndarray, rotation: int) -> np.ndarray:
 
 
 def _extract_video_frames(
-    video_data: bytes,
+    video_path: Path,
     num_samples: int,
     video_duration: Optional[float] = None,
+    rotation: int = 0,
 ) -> tuple[List[np.ndarray], int, int]:
     """
     Extract frames from video at regular intervals for OCR analysis.
-    Handles video rotation metadata to ensure frames are correctly oriented.
+    Frames are turned upright according to the clockwise *rotation* metadata.
     
     Returns:
         Tuple of (frames, video_width, video_height)
     """
-    with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as temp_video:
-        temp_video_path = Path(temp_video.name)
-        temp_video.write(video_data)
-        temp_video.flush()
+    if video_duration is None:
+        video_duration = 60.0  # Default fallback
+
+    # Open video with OpenCV
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise ValueError("Failed to open video file")
+    
+    # Get video properties
+    video_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    video_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    
+    frames = []
+    sample_interval = video_duration / (num_samples + 1)
+    
+    for i in range(1, num_samples + 1):
+        sample_time = i * sample_interval
+        frame_number = int(sample_time * fps)
         
-        try:
-            # Get video rotation metadata
-            rotation = _get_video_rotation(temp_video_path)
-            
-            # Get video duration if not provided
-            if video_duration is None:
-                ffprobe_cmd = [
-                    "ffprobe",
-                    "-v", "error",
-                    "-show_entries", "format=duration",
-                    "-of", "default=noprint_wrappers=1:nokey=1",
-                    str(temp_video_path),
-                ]
-                result = subprocess.run(
-                    ffprobe_cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    check=False,
-                )
-                if result.returncode == 0:
-                    video_duration = float(result.stdout.decode().strip())
-                else:
-                    video_duration = 60.0  # Default fallback
-            
-            # Open video with OpenCV
-            cap = cv2.VideoCapture(str(temp_video_path))
-            if not cap.isOpened():
-                raise ValueError("Failed to open video file")
-            
-            # Get video properties
-            video_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            video_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            
-            frames = []
-            sample_interval = video_duration / (num_samples + 1)
-            
-            for i in range(1, num_samples + 1):
-                sample_time = i * sample_interval
-                frame_number = int(sample_time * fps)
-                
-                # Seek to frame
-                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-                ret, frame = cap.read()
-                
-                if ret:
-                    # Apply rotation correction if needed
-                    if rotation != 0:
-                        frame = _apply_rotation(frame, rotation)
-                    frames.append(frame)
-            
-            cap.release()
-            
-            # Adjust dimensions if video was rotated 90 or 270 degrees
-            if rotation in [90, 270]:
-                video_width, video_height = video_height, video_width
-            
-            return frames, video_width, video_height
-            
-        finally:
-            temp_video_path.unlink(missing_ok=True)
+        # Seek to frame
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+        ret, frame = cap.read()
+        
+        if ret:
+            # Apply rotation correction if needed
+            if rotation != 0:
+                frame = _apply_rotation(frame, rotation)
+            frames.append(frame)
+    
+    cap.release()
+    
+    # Adjust dimensions if video was rotated 90 or 270 degrees
+    if rotation in [90, 270]:
+        video_width, video_height = video_height, video_width
+    
+    return frames, video_width, video_height
 
 
 def _process_single_frame_ocr_gpu(
@@ -463,17 +410,29 @@ async def analyze_hardsubs(
         raise HTTPException(status_code=404, detail=f"Project not found: {project_id}")
     
     # Get video file data
-    video_tuple = db.get_file(video_id)
-    if video_tuple is None:
-        raise HTTPException(status_code=404, detail=f"Video file not found: {video_id}")
-    
-    video_data, content_type, filename = video_tuple
+    # Blob-store files are read in place; only legacy rows are copied out.
+    legacy_copy: Optional[Path] = None
+    stored_path = db.get_file_path(video_id)
+    if stored_path is not None:
+        video_path = stored_path[0]
+    else:
+        video_tuple = db.get_file(video_id)
+        if video_tuple is None:
+            raise HTTPException(status_code=404, detail=f"Video file not found: {video_id}")
+        video_data, content_type, filename = video_tuple
+        with tempfile.NamedTemporaryFile(suffix=Path(filename).suffix or ".mp4", delete=False) as temp_video:
+            temp_video.write(video_data)
+            legacy_copy = Path(temp_video.name)
+        video_path = legacy_copy
     
     try:
-        # Extract frames from video
+        # Duration and rotation come from the cached media probe
+        info = await media_info.get_async(video_id, video_path) or {}
         frames, video_width, video_height = _extract_video_frames(
-            video_data,
+            video_path,
             request.num_samples,
+            info.get("duration"),
+            (info.get("video") or {}).get("rotation", 0),
         )
         
         if not frames:
@@ -555,3 +514,6 @@ async def analyze_hardsubs(
             "message": "Failed to analyze video. Please check server logs for details.",
             "detected": False,
         }
+    finally:
+        if legacy_copy is not None:
+            legacy_copy.unlink(missing_ok=True)
@@ -2,23 +2,43 @@ from __future__ import annotations
 
 import base64
 import datetime as dt
+import json
+import logging
 import math
+import os
 import shutil
 import subprocess
 import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple
 
-from fastapi import APIRouter, Body, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Body, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 
-from app.core import DATA_ROOT, db
+from app.ass_subtitles import REFERENCE_HEIGHT, CueIndex, ass_cache_parts, build_ass_document
+from app.audio_premix import SAMPLE_RATE, PremixError, premix_clips
+from app.blob_store import hash_file
+from app.core import DATA_ROOT, db, media_info
+from app.core.config import (
+    RENDER_CACHE_MAX_BYTES,
+    RENDER_CACHE_ROOT,
+    RENDER_MAX_CONCURRENCY,
+    RENDER_PARALLEL_WORKERS,
+)
+from app.jobs import Job, JobCancelled, JobManager
+from app.media_info import probe_path
+from app.render_cache import RenderCache
+from app.render_plan import Timeline, TimelineSegment, plan_segment_graph, plan_stream_copy, seek_batches
 
+logger = logging.getLogger(__name__)
 
-# ASS format reference resolution for subtitle rendering
-# All subtitle dimensions are specified relative to this resolution
-REFERENCE_HEIGHT = 1080
-REFERENCE_WIDTH = 1920
+RENDER_TIMEOUT_SECONDS = 600
+
+OUTPUT_FPS = 30
 
 
 class VideoRenderRequest(BaseModel):
@@ -27,10 +47,44 @@ class VideoRenderRequest(BaseModel):
     subtitles: List[Dict[str, Any]]
     audio_files: List[Dict[str, Any]]
     subtitle_style: Optional[Dict[str, Any]] = None
+    # Extra ASS styles by name; a subtitle selects one with "style" and can
+    # adjust it with "styleOverrides".  Unset keys inherit subtitle_style.
+    subtitle_styles: Optional[Dict[str, Dict[str, Any]]] = None
     hardsub_cover_box: Optional[Dict[str, Any]] = None
     master_volume_db: float = 0.0
     video_frame_url: Optional[str] = None
     output_filename: Optional[str] = None
+    # "segmented" renders and caches each timeline segment separately so an
+    # edit only re-encodes what changed; "parallel" also cuts segments into
+    # fixed-length chunks encoded concurrently; "single" is one ffmpeg pass.
+    render_mode: Literal["segmented", "parallel", "single"] = "segmented"
+    parallel_workers: Optional[int] = Field(None, ge=1, le=32)
+    # Encoder settings from RENDER_PROFILES: "draft" and "preview" are for
+    # quick checks (e.g. subtitle placement), "final" is the export quality.
+    profile: Literal["final", "preview", "draft"] = "final"
+    # Render only this window of the timeline, in output seconds.
+    preview_start: Optional[float] = Field(None, ge=0)
+    preview_end: Optional[float] = Field(None, gt=0)
+    # Overrides the profile's ``-tune fastdecode`` setting.
+    fast_decode: Optional[bool] = None
+    # Cut-only timelines are stream-copied between keyframes instead of
+    # re-encoded; turn off to force a full encode.
+    stream_copy: bool = True
+
+
+# Named encoder settings for VideoRenderRequest.profile.  All profiles keep
+# OUTPUT_FPS so subtitle timing and segment frame counts do not change.
+RENDER_PROFILES: Dict[str, Dict[str, Any]] = {
+    "final": {
+        "width": 1920, "height": 1080, "preset": "medium", "crf": 23, "fast_decode": False, "audio_bitrate": "192k",
+    },
+    "preview": {
+        "width": 1280, "height": 720, "preset": "veryfast", "crf": 26, "fast_decode": True, "audio_bitrate": "128k",
+    },
+    "draft": {
+        "width": 960, "height": 540, "preset": "ultrafast", "crf": 30, "fast_decode": True, "audio_bitrate": "96k",
+    },
+}
 
 
 router = APIRouter()
@@ -40,158 +94,1279 @@ def _create_ass_subtitle_file(
     subtitles: List[Dict[str, Any]],
     style: Optional[Dict[str, Any]],
     output_path: Path,
+    named_styles: Optional[Dict[str, Dict[str, Any]]] = None,
 ) -> None:
+    """Write an ASS subtitle file with styling that matches the frontend preview."""
+    output_path.write_text(build_ass_document(subtitles, style, named_styles), encoding="utf-8-sig")
+
+
+def _subtitle_file_for(subtitles: List[Dict[str, Any]], payload: VideoRenderRequest) -> Path:
+    """Compiled ASS file for *subtitles* in the payload's styles, from the
+    render cache when the same cues and styles were compiled before."""
+    key = RenderCache.make_key(ass_cache_parts(subtitles, payload.subtitle_style, payload.subtitle_styles))
+    cached = render_cache.lookup(key, ".ass")
+    if cached is not None:
+        return cached
+    temp_file = render_cache.temp_path(".ass")
+    try:
+        _create_ass_subtitle_file(subtitles, payload.subtitle_style, temp_file, payload.subtitle_styles)
+    except BaseException:
+        temp_file.unlink(missing_ok=True)
+        raise
+    return render_cache.store(key, ".ass", temp_file)
+
+
+def _expected_output_duration(payload: VideoRenderRequest) -> Optional[float]:
+    """Length of the rendered timeline in seconds, used to turn ffmpeg's
+    ``out_time`` into a progress fraction."""
+    total = 0.0
+    for segment in payload.video_segments or []:
+        start = float(segment.get("sourceStartTime", 0) or 0)
+        end = float(segment.get("sourceEndTime", 0) or 0)
+        rate = float(segment.get("playbackRate", 1.0) or 1.0)
+        total += max(end - start, 0.0) / rate
+    return total or None
+
+
+def _run_ffmpeg_with_progress(
+    ffmpeg_cmd: List[str],
+    job: Job,
+    stderr_path: Path,
+    on_progress: Callable[[float, Dict[str, str]], None],
+    timeout: float = RENDER_TIMEOUT_SECONDS,
+    abort: Optional[threading.Event] = None,
+) -> Tuple[int, bool]:
+    """Run ffmpeg, passing its ``-progress`` output to *on_progress*.
+
+    ``on_progress`` receives the output position in seconds and ffmpeg's raw
+    progress fields.  stderr goes straight to *stderr_path* so the pipe can
+    never fill up.  Setting *abort* kills ffmpeg without cancelling the job
+    (used when a sibling chunk already failed).
+    Returns ``(returncode, timed_out)``; raises :class:`JobCancelled` when the
+    job is cancelled while ffmpeg runs.
     """
-    Create an ASS subtitle file with styling that matches the frontend preview.
-    
-    ASS Format Parameters (all values documented):
-    - Fontname: Font family name (from style.fontFamily)
-    - Fontsize: Font size in pixels at reference resolution (from style.fontSize)
-    - PrimaryColour: Main text color (from style.primaryColor)
-    - SecondaryColour: Secondary color for karaoke effects (hardcoded, not used in preview)
-    - OutlineColour: Outline/border color (from style.outlineColor)
-    - BackColour: Shadow color (hardcoded with alpha, no shadow in preview)
-    - Bold: -1 for bold, 0 for normal (hardcoded to 0, matches frontend normal weight)
-    - Italic: -1 for italic, 0 for normal (hardcoded to 0, not supported in preview)
-    - Underline: -1 for underline, 0 for none (hardcoded to 0, not supported in preview)
-    - StrikeOut: -1 for strikeout, 0 for none (hardcoded to 0, not supported in preview)
-    - ScaleX: Horizontal scaling percentage (hardcoded to 100, no scaling in preview)
-    - ScaleY: Vertical scaling percentage (hardcoded to 100, no scaling in preview)
-    - Spacing: Letter spacing in pixels (hardcoded to 0, matches frontend letterSpacing='0px')
-    - Angle: Rotation angle in degrees (hardcoded to 0, not supported in preview)
-    - BorderStyle: 1=outline+shadow, 3=opaque box (hardcoded to 1, matches preview outline)
-    - Outline: Outline width in pixels (from style.outlineWidth)
-    - Shadow: Shadow depth in pixels (hardcoded to 0, no shadow rendered in preview)
-    - Alignment: Text alignment (from style.horizontalAlign: 1=left, 2=center, 3=right)
-    - MarginL: Left margin in pixels (hardcoded to 10)
-    - MarginR: Right margin in pixels (hardcoded to 10)
-    - MarginV: Vertical margin from bottom in pixels (calculated from style.verticalMargin percentage)
-    - Encoding: Character encoding (hardcoded to 1 = default)
+    cmd = [ffmpeg_cmd[0], "-progress", "pipe:1", "-nostats", *ffmpeg_cmd[1:]]
+    timed_out = threading.Event()
+
+    with open(stderr_path, "w", encoding="utf-8") as stderr_file:
+        process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=stderr_file,
+            text=True,
+            errors="ignore",
+        )
+
+        def _watch() -> None:
+            deadline = time.monotonic() + timeout
+            while process.poll() is None:
+                if job.cancel_event.wait(0.5) or (abort is not None and abort.is_set()):
+                    # The partial output is discarded anyway, so skip ffmpeg's
+                    # graceful shutdown (which keeps encoding buffered frames).
+                    process.kill()
+                    return
+                if time.monotonic() > deadline:
+                    timed_out.set()
+                    process.kill()
+                    return
+
+        watcher = threading.Thread(target=_watch, name=f"render-watch-{job.id}", daemon=True)
+        watcher.start()
+
+        stats: Dict[str, str] = {}
+        assert process.stdout is not None
+        for line in process.stdout:
+            key, _, value = line.strip().partition("=")
+            if key != "progress":
+                stats[key] = value
+                continue
+            try:
+                # ffmpeg reports N/A while flushing; keep the last good value then.
+                out_time = max(int(stats.get("out_time_us") or stats.get("out_time_ms") or ""), 0) / 1_000_000
+            except ValueError:
+                continue
+            on_progress(out_time, stats)
+
+        returncode = process.wait()
+        watcher.join()
+
+    if job.cancelled:
+        raise JobCancelled()
+    return returncode, timed_out.is_set()
+
+
+class _RenderProgress:
+    """Overall job progress for a render made of several ffmpeg runs.
+
+    Each step is weighted by the seconds of output it produces, so steps
+    running concurrently on a pool add up to one steadily moving fraction.
     """
-    font_family = style.get("fontFamily", "Arial") if style else "Arial"
-    font_size = style.get("fontSize", 48) if style else 48  # Match frontend default
-    primary_color = style.get("primaryColor", "#FFFFFF") if style else "#FFFFFF"
-    outline_color = style.get("outlineColor", "#000000") if style else "#000000"
-    outline_width = style.get("outlineWidth", 2.5) if style else 2.5  # Match frontend default
-    vertical_margin_percent = style.get("verticalMargin", 8) if style else 8  # Match frontend default (percentage)
-    h_align = style.get("horizontalAlign", "center") if style else "center"
-    
-    # Convert vertical margin from percentage to pixels for reference resolution
-    # Frontend: y = height * (1 - verticalMargin / 100)
-    # For reference height: margin from bottom = REFERENCE_HEIGHT * (verticalMargin / 100)
-    vertical_margin = int(REFERENCE_HEIGHT * vertical_margin_percent / 100)
-
-    def hex_to_ass(hex_color: str) -> str:
-        hex_color = hex_color.lstrip("#")
-        r, g, b = int(hex_color[0:2], 16), int(hex_color[2:4], 16), int(hex_color[4:6], 16)
-        return f"&H00{b:02X}{g:02X}{r:02X}"
-
-    primary_ass = hex_to_ass(primary_color)
-    outline_ass = hex_to_ass(outline_color)
-
-    alignment = 2 if h_align == "center" else (1 if h_align == "left" else 3)
-
-    def srt_time_to_seconds(srt_time: str) -> float:
-        """Convert SRT time format to seconds"""
-        time_part = srt_time.replace(",", ".")
-        parts = time_part.split(":")
-        if len(parts) == 3:
-            h, m, s = parts
-            return float(h) * 3600 + float(m) * 60 + float(s)
-        return 0.0
-
-    def seconds_to_ass_time(seconds: float) -> str:
-        """Convert seconds to ASS time format"""
-        h = int(seconds // 3600)
-        m = int((seconds % 3600) // 60)
-        s = seconds % 60
-        return f"{h}:{m:02d}:{s:05.2f}"
-
-    ass_content = f"""[Script Info]
-Title: Rendered Subtitles
-ScriptType: v4.00+
-WrapStyle: 0
-ScaledBorderAndShadow: yes
-PlayResX: {REFERENCE_WIDTH}
-PlayResY: {REFERENCE_HEIGHT}
-YCbCr Matrix: TV.709
-
-[V4+ Styles]
-Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
-Style: Default,{font_family},{font_size},{primary_ass},&H000000FF,{outline_ass},&H80000000,0,0,0,0,100,100,0,0,1,{outline_width},0,{alignment},10,10,{vertical_margin},1
-
-[Events]
-Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
-"""
-
-    for sub in subtitles:
-        start_time_str = sub.get("startTime", "00:00:00,000")
-        end_time_str = sub.get("endTime", "00:00:00,000")
-        
-        # Convert SRT time format to ASS format
-        # Frontend already adjusted times based on playback rates
-        start_seconds = srt_time_to_seconds(start_time_str)
-        end_seconds = srt_time_to_seconds(end_time_str)
-        
-        start = seconds_to_ass_time(start_seconds)
-        end = seconds_to_ass_time(end_seconds)
-        
-        text = sub.get("text", "").replace("\n", "\\N")
-        ass_content += f"Dialogue: 0,{start},{end},Default,,0,0,0,,{text}\n"
-
-    output_path.write_text(ass_content, encoding="utf-8-sig")
+
+    def __init__(self, job: Job) -> None:
+        self._job = job
+        self._lock = threading.Lock()
+        self._weights: Dict[str, float] = {}
+        self._done: Dict[str, float] = {}
+
+    def add_step(self, name: str, weight: Optional[float]) -> None:
+        with self._lock:
+            self._weights[name] = weight or 0.0
+            self._done[name] = 0.0
+
+    def report(self, name: str, seconds: float, stats: Optional[Dict[str, str]] = None) -> None:
+        with self._lock:
+            self._done[name] = min(max(seconds, 0.0), self._weights[name])
+            total = sum(self._weights.values())
+            progress = 0.99 * sum(self._done.values()) / total if total else None
+        details: Dict[str, Any] = {"out_time_seconds": round(seconds, 2)}
+        if stats:
+            details.update({"fps": stats.get("fps"), "speed": stats.get("speed")})
+        if progress is None:
+            self._job.update(details=details)
+        else:
+            self._job.update(progress=progress, details=details)
+
+    def complete(self, name: str) -> None:
+        self.report(name, self._weights[name])
+
+
+# Lines of the failing (or last) ffmpeg run's stderr kept in render history.
+STDERR_TAIL_LINES = 20
+
+
+class _RenderRecord:
+    """What one render did and how long it took, for the ``render_jobs``
+    history table.  Steps may report from several threads at once."""
+
+    def __init__(self, job: Job, project_id: str, payload: VideoRenderRequest) -> None:
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self.fields: Dict[str, Any] = {
+            "id": job.id,
+            "project_id": project_id,
+            "profile": payload.profile,
+            "render_mode": payload.render_mode,
+            "created_at": dt.datetime.utcnow().isoformat(),
+        }
+        self._filter_graphs: Dict[str, str] = {}
+        self._encoded_frames = 0
+        self._encode_seconds = 0.0
+        self._failed = False
+
+    def add_step(
+        self,
+        step: str,
+        ffmpeg_cmd: List[str],
+        returncode: Optional[int],
+        stats: Dict[str, str],
+        elapsed: float,
+        stderr: str,
+    ) -> None:
+        graph = None
+        for flag in ("-filter_complex", "-vf"):
+            if flag in ffmpeg_cmd:
+                graph = ffmpeg_cmd[ffmpeg_cmd.index(flag) + 1]
+        try:
+            frames = int(stats.get("frame") or 0)
+        except ValueError:
+            frames = 0
+        with self._lock:
+            if graph:
+                self._filter_graphs[step] = graph
+            if frames and "libx264" in ffmpeg_cmd:
+                self._encoded_frames += frames
+                self._encode_seconds += elapsed
+            # Keep the first failure: siblings killed after it only report noise.
+            if not self._failed:
+                self._failed = returncode != 0
+                self.fields["exit_code"] = returncode
+                self.fields["stderr_tail"] = "\n".join(stderr.strip().splitlines()[-STDERR_TAIL_LINES:])
+
+    def clear_failure(self) -> None:
+        """Forget a failed step that the render recovered from."""
+        with self._lock:
+            self._failed = False
+            self.fields.pop("exit_code", None)
+            self.fields.pop("stderr_tail", None)
+
+    def save(self, status: str) -> None:
+        with self._lock:
+            record = {
+                **self.fields,
+                "status": status,
+                "filter_graph": self._filter_graphs or None,
+                "encoded_frames": self._encoded_frames or None,
+                "encode_fps": round(self._encoded_frames / self._encode_seconds, 2) if self._encode_seconds else None,
+                "wall_time_seconds": round(time.monotonic() - self._started, 3),
+                "finished_at": dt.datetime.utcnow().isoformat(),
+            }
+        try:
+            db.save_render_record(record)
+        except Exception:  # pragma: no cover - history must not fail the render
+            logger.exception("Failed to save render history for job %s", record["id"])
+
+
+render_jobs = JobManager("render", db, RENDER_MAX_CONCURRENCY)
 
 
 @router.post("/projects/{project_id}/render")
-async def render_video(project_id: str, payload: VideoRenderRequest = Body(...)) -> Dict[str, Any]:
+async def render_video(
+    project_id: str,
+    payload: VideoRenderRequest = Body(...),
+    wait: bool = Query(True, description="Wait for the render to finish and return its result"),
+) -> Dict[str, Any]:
     project = db.get_project(project_id)
     if project is None:
         raise HTTPException(status_code=404, detail=f"Project not found: {project_id}")
 
-    video_data_tuple = db.get_file(payload.video_file_id)
-    if video_data_tuple is None:
+    if db.get_file_metadata(payload.video_file_id) is None:
         raise HTTPException(status_code=404, detail=f"Video file not found: {payload.video_file_id}")
 
-    video_data, _content_type, filename = video_data_tuple
+    if payload.preview_end is not None and payload.preview_end <= (payload.preview_start or 0.0):
+        raise HTTPException(status_code=400, detail="preview_end must be after preview_start")
+
+    counts = {
+        "video_segments_count": len(payload.video_segments),
+        "audio_tracks_count": len(payload.audio_files),
+        "subtitles_count": len(payload.subtitles),
+    }
 
     ffmpeg_path = shutil.which("ffmpeg")
     if not ffmpeg_path:
         return {
             "status": "error",
             "message": "ffmpeg không được cài đặt trên server. Vui lòng cài đặt ffmpeg để render video.",
-            "video_segments_count": len(payload.video_segments),
-            "audio_tracks_count": len(payload.audio_files),
-            "subtitles_count": len(payload.subtitles),
+            **counts,
         }
 
+    job = render_jobs.submit(
+        lambda job: _render_job(job, project_id, payload, ffmpeg_path),
+        project_id=project_id,
+        details=counts,
+    )
+
+    if wait:
+        snapshot = await render_jobs.wait(job.id)
+        if snapshot and snapshot.get("result"):
+            return snapshot["result"]
+        return {
+            "status": "error",
+            "message": (snapshot or {}).get("error") or f"Render {(snapshot or {}).get('status', 'failed')}",
+            "job_id": job.id,
+            **counts,
+        }
+
+    return {"status": "queued", "job_id": job.id, "message": "Render đã được đưa vào hàng đợi", **counts}
+
+
+@router.get("/render-jobs")
+def list_render_jobs(project_id: Optional[str] = None, limit: int = Query(50, ge=1, le=500)) -> List[Dict[str, Any]]:
+    return render_jobs.list_jobs(project_id=project_id, limit=limit)
+
+
+@router.get("/render-jobs/{job_id}")
+def get_render_job(job_id: str) -> Dict[str, Any]:
+    snapshot = render_jobs.get(job_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail=f"Render job not found: {job_id}")
+    return snapshot
+
+
+@router.post("/render-jobs/{job_id}/cancel")
+def cancel_render_job(job_id: str) -> Dict[str, Any]:
+    if render_jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Render job not found: {job_id}")
+    cancelled = render_jobs.cancel(job_id)
+    return {"status": "cancelling" if cancelled else "not-running", "job_id": job_id}
+
+
+@router.get("/render-jobs/{job_id}/events")
+def stream_render_job(job_id: str) -> StreamingResponse:
+    if render_jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Render job not found: {job_id}")
+    return StreamingResponse(
+        render_jobs.events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/renders")
+def list_renders(
+    project_id: Optional[str] = None,
+    status: Optional[str] = None,
+    render_mode: Optional[str] = None,
+    profile: Optional[str] = None,
+    since: Optional[str] = Query(None, description="ISO timestamp; only renders started at or after it"),
+    until: Optional[str] = Query(None, description="ISO timestamp; only renders started before it"),
+    min_wall_time: Optional[float] = Query(None, ge=0, description="Only renders that took at least this many seconds"),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+) -> Dict[str, Any]:
+    items, total = db.list_render_records(
+        limit=limit,
+        offset=offset,
+        project_id=project_id,
+        status=status,
+        render_mode=render_mode,
+        profile=profile,
+        since=since,
+        until=until,
+        min_wall_time=min_wall_time,
+    )
+    return {"items": items, "total": total, "limit": limit, "offset": offset}
+
+
+@router.get("/renders/stats")
+def render_stats(
+    group_by: Literal["profile", "render_mode", "project_id", "status", "day"] = "profile",
+    project_id: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    return db.render_record_stats(group_by, project_id=project_id, since=since, until=until)
+
+
+@router.get("/renders/{render_id}")
+def get_render(render_id: str) -> Dict[str, Any]:
+    record = db.get_render_record(render_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Render not found: {render_id}")
+    return record
+
+
+def _resolve_input_path(file_id: str, temp_path: Path, stem: str) -> Optional[Path]:
+    """Path ffmpeg can read *file_id* from.
+
+    Files in the blob store are passed to ffmpeg as-is; only legacy rows whose
+    bytes still live in the SQLite BLOB are written out to the temp dir.
+    """
+    stored_path = db.get_file_path(file_id)
+    if stored_path is not None:
+        return stored_path[0]
+
+    stored = db.get_file(file_id)
+    if stored is None:
+        return None
+    data, _content_type, filename = stored
+    legacy_copy = temp_path / f"{stem}{Path(filename).suffix}"
+    legacy_copy.write_bytes(data)
+    return legacy_copy
+
+
+class _RenderStepFailed(Exception):
+    """An ffmpeg invocation of a render exited non-zero or timed out."""
+
+    def __init__(self, ffmpeg_cmd: List[str], timed_out: bool, stderr: str) -> None:
+        super().__init__(" ".join(ffmpeg_cmd))
+        self.ffmpeg_cmd = ffmpeg_cmd
+        self.timed_out = timed_out
+        self.stderr = stderr
+
+
+# Steps of a parallel render finish in any order; each appends its command and
+# stderr to the render log in one piece.
+_log_lock = threading.Lock()
+
+
+def _run_render_step(
+    ffmpeg_cmd: List[str],
+    job: Job,
+    log_file_path: Path,
+    deadline: float,
+    progress: _RenderProgress,
+    step: str,
+    abort: Optional[threading.Event] = None,
+    record: Optional[_RenderRecord] = None,
+) -> None:
+    fd, stderr_name = tempfile.mkstemp(prefix="ffmpeg-", suffix=".log", dir=log_file_path.parent)
+    os.close(fd)
+    stderr_path = Path(stderr_name)
+    returncode: Optional[int] = None
+    timed_out = False
+    last_stats: Dict[str, str] = {}
+
+    def on_progress(seconds: float, stats: Dict[str, str]) -> None:
+        last_stats.update(stats)
+        progress.report(step, seconds, stats)
+
+    started = time.monotonic()
+    try:
+        returncode, timed_out = _run_ffmpeg_with_progress(
+            ffmpeg_cmd,
+            job,
+            stderr_path,
+            on_progress,
+            timeout=max(deadline - time.monotonic(), 0.0),
+            abort=abort,
+        )
+    finally:
+        stderr = stderr_path.read_text(encoding="utf-8", errors="ignore")
+        stderr_path.unlink(missing_ok=True)
+        if record is not None:
+            record.add_step(step, ffmpeg_cmd, returncode, last_stats, time.monotonic() - started, stderr)
+        with _log_lock, open(log_file_path, "a", encoding="utf-8") as log_file:
+            log_file.write("COMMAND:\n")
+            log_file.write(" ".join(ffmpeg_cmd) + "\n\n")
+            log_file.write("STDERR:\n")
+            log_file.write(stderr)
+            log_file.write("\n" + "=" * 80 + "\n")
+            if timed_out:
+                log_file.write("TIMEOUT: Process exceeded 10 minutes\n")
+            log_file.write(f"Return Code: {returncode}\n")
+            log_file.write("=" * 80 + "\n\n")
+
+    if timed_out or returncode != 0:
+        raise _RenderStepFailed(ffmpeg_cmd, timed_out, stderr)
+    progress.complete(step)
+
+
+def _premix_tts_tracks(job: Job, ffmpeg_path: str, audio_paths: List[Dict[str, Any]], output_path: Path) -> Path:
+    """Decode every TTS clip once and sum them into one WAV at *output_path*.
+
+    A few hundred clips as separate ``-i`` inputs run ffmpeg out of file
+    descriptors and make ``amix`` walk every input per sample; the pre-mixed
+    track is a single input however many clips there are.
+    """
+    job.update(message="Đang trộn âm thanh TTS...")
+    try:
+        premix_clips(ffmpeg_path, audio_paths, output_path, check=job.raise_if_cancelled)
+    except PremixError as failure:
+        output_path.unlink(missing_ok=True)
+        raise _RenderStepFailed(failure.ffmpeg_cmd, False, failure.stderr) from failure
+    except BaseException:
+        output_path.unlink(missing_ok=True)
+        raise
+    return output_path
+
+
+def _mix_tts_tracks(
+    base_audio_stream: str,
+    tts_input_index: int,
+    master_volume_db: float,
+) -> Tuple[List[str], str]:
+    """Filters that mix the pre-mixed TTS input over *base_audio_stream*.
+    Returns ``(filters, output_label)``."""
+    mix_label = "aout_mix" if master_volume_db else "aout"
+    mix_filters = [f"{base_audio_stream}[{tts_input_index}:a]amix=inputs=2:duration=longest:normalize=0[{mix_label}]"]
+
+    if master_volume_db:
+        linear_gain = math.pow(10.0, master_volume_db / 20.0)
+        mix_filters.append(f"[{mix_label}]volume={linear_gain:.6f}[aout]")
+        return mix_filters, "[aout]"
+    return mix_filters, f"[{mix_label}]"
+
+
+def _render_settings(payload: VideoRenderRequest) -> Dict[str, Any]:
+    """The request's profile from RENDER_PROFILES with its overrides applied."""
+    settings = dict(RENDER_PROFILES[payload.profile])
+    if payload.fast_decode is not None:
+        settings["fast_decode"] = payload.fast_decode
+    return settings
+
+
+def _video_codec_args(settings: Dict[str, Any]) -> List[str]:
+    args = ["-c:v", "libx264", "-preset", settings["preset"], "-crf", str(settings["crf"])]
+    if settings["fast_decode"]:
+        args.extend(["-tune", "fastdecode"])
+    return args
+
+
+def _audio_codec_args(settings: Dict[str, Any]) -> List[str]:
+    return ["-c:a", "aac", "-b:a", settings["audio_bitrate"]]
+
+
+def _source_info(file_id: str, path: Path) -> Optional[Dict[str, Any]]:
+    """Size, frame rate, codec, rotation and duration of the first video
+    stream of the source, or None if it cannot be probed."""
+    info = media_info.get(file_id, path)
+    if not info or not info["video"]:
+        return None
+    return {**info["video"], "duration": info["duration"], "start_time": info["start_time"]}
+
+
+def _fit_filters(settings: Dict[str, Any], source: Optional[Dict[str, Any]], retimed: bool) -> List[str]:
+    """Filters that bring the source to the profile's size and frame rate.
+
+    Scale/pad are skipped when the (unrotated) source already has the target
+    size, and ``fps`` when it is constant-rate OUTPUT_FPS and not retimed.
+    """
+    width, height = settings["width"], settings["height"]
+    filters = []
+    if not (source and not source["rotation"] and (source["width"], source["height"]) == (width, height)):
+        filters.append(f"scale={width}:{height}:force_original_aspect_ratio=decrease")
+        filters.append(f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2")
+    target_rate = f"{OUTPUT_FPS}/1"
+    if retimed or not (source and source["r_frame_rate"] == target_rate and source["avg_frame_rate"] == target_rate):
+        filters.append(f"fps={OUTPUT_FPS}")
+    return filters
+
+
+def _cover_box_params(payload: VideoRenderRequest, settings: Dict[str, Any]) -> Optional[Dict[str, int]]:
+    if not (payload.hardsub_cover_box and payload.hardsub_cover_box.get("enabled")):
+        return None
+    box = payload.hardsub_cover_box
+    width, height = settings["width"], settings["height"]
+    return {
+        "x": int(box.get("x", 0) * width / 100),
+        "y": int(box.get("y", 0) * height / 100),
+        "w": int(box.get("width", 0) * width / 100),
+        "h": int(box.get("height", 0) * height / 100),
+        "blur": max(1, round(20 * height / REFERENCE_HEIGHT)),
+    }
+
+
+def _subtitle_filter(subtitle_file: Path) -> str:
+    subtitle_path_str = str(subtitle_file).replace("\\", "/").replace(":", r"\:")
+    return f"ass='{subtitle_path_str}'"
+
+
+def _video_post_filters(
+    video_stream: str,
+    blur_region_params: Optional[Dict[str, int]],
+    overlay_input_idx: Optional[int],
+    subtitle_file: Optional[Path],
+    settings: Dict[str, Any],
+    fit_filters: List[str],
+) -> str:
+    """Fit to the profile's frame size, then cover box blur, frame overlay
+    and subtitles."""
+    video_stream = f"{video_stream}{','.join(fit_filters) or 'null'}"
+
+    if blur_region_params:
+        params = blur_region_params
+        video_stream = (
+            f"{video_stream}[main];[main]split[v1][v2];[v2]crop={params['w']}:{params['h']}:{params['x']}:{params['y']}"
+            f",boxblur=luma_radius={params['blur']}:luma_power=3[blurred];[v1][blurred]overlay="
+            f"{params['x']}:{params['y']}"
+        )
+
+    if overlay_input_idx is not None:
+        video_stream = (
+            f"{video_stream}[vtmp];[{overlay_input_idx}:v]scale={settings['width']}:{settings['height']}[frame];"
+            "[vtmp][frame]overlay=0:0"
+        )
+
+    if subtitle_file:
+        video_stream = f"{video_stream},{_subtitle_filter(subtitle_file)}"
+
+    return video_stream
+
+
+def _build_single_pass_command(
+    ffmpeg_path: str,
+    payload: VideoRenderRequest,
+    input_video: Path,
+    subtitle_file: Optional[Path],
+    tts_mix: Optional[Path],
+    frame_overlay_path: Optional[Path],
+    output_path: Path,
+    source_info: Optional[Dict[str, Any]] = None,
+    has_source_audio: bool = True,
+) -> List[str]:
+    """One ffmpeg command that trims, filters, mixes and encodes everything.
+    *tts_mix* is the output of ``_premix_tts_tracks`` (None without clips)."""
+    settings = _render_settings(payload)
+    blur_region_params = _cover_box_params(payload, settings)
+    ffmpeg_cmd = [ffmpeg_path, "-y"]
+    filter_parts: List[str] = []
+
+    if payload.video_segments:
+        timeline = Timeline.from_request(payload.video_segments, OUTPUT_FPS)
+        graph = plan_segment_graph(timeline, str(input_video), audio=has_source_audio)
+        for input_args in graph.inputs:
+            ffmpeg_cmd.extend(input_args)
+        filter_parts.extend(graph.filters)
+        video_stream = graph.video_label
+        source_audio = graph.audio_label
+        first_extra_input = len(graph.inputs)
+        retimed = graph.strategy == "select" or any(segment.rate != 1.0 for segment in timeline.segments)
+        duration = timeline.duration
+    else:
+        ffmpeg_cmd.extend(["-i", str(input_video)])
+        video_stream = "[0:v]"
+        source_audio = "[0:a]" if has_source_audio else None
+        first_extra_input = 1
+        retimed = False
+        duration = source_info["duration"] if source_info else None
+
+    if tts_mix:
+        ffmpeg_cmd.extend(["-i", str(tts_mix)])
+
+    if frame_overlay_path:
+        ffmpeg_cmd.extend(["-i", str(frame_overlay_path)])
+
+    fit_filters = _fit_filters(settings, source_info, retimed)
+
+    if not (filter_parts or tts_mix or frame_overlay_path or blur_region_params or payload.master_volume_db):
+        video_filters: List[str] = list(fit_filters)
+        if subtitle_file:
+            video_filters.append(_subtitle_filter(subtitle_file))
+        if video_filters:
+            ffmpeg_cmd.extend(["-vf", ",".join(video_filters)])
+    else:
+        overlay_input_idx = first_extra_input + (1 if tts_mix else 0) if frame_overlay_path else None
+        video_stream = _video_post_filters(
+            video_stream, blur_region_params, overlay_input_idx, subtitle_file, settings, fit_filters
+        )
+        filter_parts.append(f"{video_stream}[vout]")
+
+        audio_output_label = source_audio
+        if tts_mix:
+            if source_audio is None:
+                silence = f",atrim=duration={duration}" if duration else ""
+                filter_parts.append(f"anullsrc=r=48000:cl=stereo{silence}[silence]")
+                source_audio = "[silence]"
+            mix_filters, audio_output_label = _mix_tts_tracks(
+                source_audio, first_extra_input, payload.master_volume_db
+            )
+            filter_parts.append(";".join(mix_filters))
+        elif payload.master_volume_db and source_audio:
+            linear_gain = math.pow(10.0, payload.master_volume_db / 20.0)
+            filter_parts.append(f"{source_audio}volume={linear_gain:.6f}[aout]")
+            audio_output_label = "[aout]"
+
+        ffmpeg_cmd.extend(["-filter_complex", ";".join(filter_parts)])
+        ffmpeg_cmd.extend(["-map", "[vout]"])
+        if audio_output_label:
+            ffmpeg_cmd.extend(["-map", audio_output_label])
+
+    ffmpeg_cmd.extend(_video_codec_args(settings))
+    ffmpeg_cmd.extend(_audio_codec_args(settings))
+    ffmpeg_cmd.append(str(output_path))
+    return ffmpeg_cmd
+
+
+# --- Segmented rendering -------------------------------------------------------
+#
+# Each timeline segment (or, for parallel renders, each fixed-length chunk of
+# it) is encoded on its own and cached under a key built from
+# everything that affects its pixels (source hash, trim range, speed, cover box,
+# frame overlay, the subtitle cues that fall inside it and their style).  The
+# audio track is mixed once for the whole timeline and cached the same way.
+# The final file is a stream-copy concat of the pieces, so re-rendering after
+# an edit only re-encodes the segments the edit touched, and chunks of one
+# render can be encoded in parallel.
+
+# Parallel renders cut segments into chunks of this many output frames.  A
+# fixed length (rather than total / workers) keeps chunk boundaries, and so
+# cache keys, stable when the timeline grows or shrinks elsewhere.
+PARALLEL_CHUNK_FRAMES = 10 * OUTPUT_FPS
+
+# Audio mixing and the final concat are cheap next to video encoding; they are
+# weighted as this fraction of the timeline length for progress reporting.
+AUDIO_PROGRESS_WEIGHT = 0.1
+MUX_PROGRESS_WEIGHT = 0.05
+
+render_cache = RenderCache(RENDER_CACHE_ROOT, RENDER_CACHE_MAX_BYTES)
+
+
+def _content_hash(file_id: str, path: Path) -> str:
+    metadata = db.get_file_metadata(file_id) or {}
+    return metadata.get("content_hash") or hash_file(path)[0]
+
+
+def _source_has_audio(ffmpeg_path: str, file_id: str, path: Path) -> bool:
+    info = media_info.get(file_id, path)
+    if info is not None:
+        return info["has_audio"]
+    result = subprocess.run(
+        [ffmpeg_path, "-hide_banner", "-i", str(path)],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors="ignore",
+        check=False,
+    )
+    return "Audio:" in result.stderr
+
+
+def _segment_frame_counts(payload: VideoRenderRequest) -> List[int]:
+    """Frames each segment occupies in the output.
+
+    Segments are cut to whole frames and the audio is padded/trimmed to the
+    same length, so the pieces can never drift apart when concatenated.
+    """
+    return [segment.frames for segment in Timeline.from_request(payload.video_segments, OUTPUT_FPS).segments]
+
+
+def _render_units(payload: VideoRenderRequest, chunk_frames: Optional[int]) -> List[Dict[str, Any]]:
+    """Pieces of the timeline that are encoded (and cached) independently.
+
+    Without *chunk_frames* every segment is one unit; otherwise segments are
+    cut into runs of at most *chunk_frames* output frames.  Every unit is its
+    own closed encode starting on a keyframe, so the units can be joined
+    losslessly in any order they finish.
+    """
+    units = []
+    for segment, frames in zip(payload.video_segments, _segment_frame_counts(payload)):
+        start = float(segment.get("sourceStartTime", 0) or 0)
+        end = float(segment.get("sourceEndTime", 0) or 0)
+        rate = float(segment.get("playbackRate", 1.0) or 1.0)
+        step = chunk_frames or frames
+        for offset in range(0, frames, step):
+            count = min(step, frames - offset)
+            piece_start = start + offset / OUTPUT_FPS * rate
+            piece_end = end if offset + count >= frames else start + (offset + count) / OUTPUT_FPS * rate
+            units.append({"start": round(piece_start, 6), "end": round(piece_end, 6), "rate": rate, "frames": count})
+    return units
+
+
+def _render_segmented(
+    job: Job,
+    payload: VideoRenderRequest,
+    ffmpeg_path: str,
+    temp_path: Path,
+    input_video: Path,
+    audio_paths: List[Dict[str, Any]],
+    frame_overlay_path: Optional[Path],
+    output_path: Path,
+    log_file_path: Path,
+    deadline: float,
+    workers: int = 1,
+    chunk_frames: Optional[int] = None,
+    source_info: Optional[Dict[str, Any]] = None,
+    record: Optional[_RenderRecord] = None,
+) -> Dict[str, Any]:
+    """Render unit by unit on *workers* threads, then concat the pieces."""
+    settings = _render_settings(payload)
+    # Every piece must share these for them to be joined with ``-c copy``.
+    video_codec_args = [*_video_codec_args(settings), "-pix_fmt", "yuv420p"]
+    source_hash = _content_hash(payload.video_file_id, input_video)
+    blur_region_params = _cover_box_params(payload, settings)
+    overlay_hash = hash_file(frame_overlay_path)[0] if frame_overlay_path else None
+    # Concurrent x264 encoders share the cores instead of each claiming all.
+    threads_args = ["-threads", str(max(1, (os.cpu_count() or 1) // workers))] if workers > 1 else []
+
+    units = _render_units(payload, chunk_frames)
+    total_duration = sum(unit["frames"] for unit in units) / OUTPUT_FPS
+    progress = _RenderProgress(job)
+    for i, unit in enumerate(units):
+        progress.add_step(f"video-{i}", unit["frames"] / OUTPUT_FPS)
+    progress.add_step("audio", total_duration * AUDIO_PROGRESS_WEIGHT)
+    progress.add_step("mux", total_duration * MUX_PROGRESS_WEIGHT)
+
+    unit_files: List[Optional[Path]] = [None] * len(units)
+    pending = []
+    cue_index = CueIndex(payload.subtitles or [])
+    window_start = 0.0
+    for i, unit in enumerate(units):
+        duration = unit["frames"] / OUTPUT_FPS
+        cues = cue_index.window(window_start, window_start + duration)
+        window_start += duration
+
+        key = RenderCache.make_key(
+            {
+                "kind": "video-segment",
+                "source": source_hash,
+                "start": unit["start"],
+                "end": unit["end"],
+                "rate": unit["rate"],
+                "frames": unit["frames"],
+                "cover_box": blur_region_params,
+                "overlay": overlay_hash,
+                "subtitles": ass_cache_parts(cues, payload.subtitle_style, payload.subtitle_styles) if cues else None,
+                "size": [settings["width"], settings["height"]],
+                "codec": video_codec_args,
+            }
+        )
+        cached = render_cache.lookup(key, ".mp4")
+        if cached is not None:
+            unit_files[i] = cached
+            progress.complete(f"video-{i}")
+        else:
+            pending.append((i, unit, key, cues))
+    cached_segments = len(units) - len(pending)
+    job.update(details={"segments_total": len(units), "segments_cached": cached_segments, "render_workers": workers})
+
+    abort = threading.Event()
+
+    def render_unit(i: int, unit: Dict[str, Any], key: str, cues: List[Dict[str, Any]]) -> Path:
+        job.raise_if_cancelled()
+        subtitle_file = _subtitle_file_for(cues, payload) if cues else None
+
+        segment_cmd = [
+            ffmpeg_path, "-y", "-ss", str(unit["start"]), "-t", str(max(unit["end"] - unit["start"], 0.0)),
+            "-i", str(input_video),
+        ]
+        if frame_overlay_path:
+            segment_cmd.extend(["-i", str(frame_overlay_path)])
+        video_stream = _video_post_filters(
+            f"[0:v]setpts=(PTS-STARTPTS)/{unit['rate']},",
+            blur_region_params,
+            1 if frame_overlay_path else None,
+            subtitle_file,
+            settings,
+            _fit_filters(settings, source_info, unit["rate"] != 1.0),
+        )
+        # Clone the last frame if the source runs short so every unit has
+        # exactly ``frames`` frames.
+        video_stream = f"{video_stream},tpad=stop_mode=clone:stop_duration=1[vout]"
+
+        temp_segment = render_cache.temp_path(".mp4")
+        segment_cmd.extend(["-filter_complex", video_stream, "-map", "[vout]", "-frames:v", str(unit["frames"]), "-an"])
+        segment_cmd.extend(video_codec_args)
+        segment_cmd.extend(threads_args)
+        segment_cmd.extend(["-f", "mp4", str(temp_segment)])
+        try:
+            _run_render_step(segment_cmd, job, log_file_path, deadline, progress, f"video-{i}", abort, record)
+        except BaseException:
+            temp_segment.unlink(missing_ok=True)
+            raise
+        return render_cache.store(key, ".mp4", temp_segment)
+
+    job.update(message=f"Đang render {len(pending)}/{len(units)} đoạn...")
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"render-{job.id[:8]}") as pool:
+        audio_future = pool.submit(
+            _render_segmented_audio,
+            job, payload, ffmpeg_path, input_video, source_hash, audio_paths, log_file_path, deadline, progress, abort,
+            record,
+        )
+        futures = {pool.submit(render_unit, *item): item[0] for item in pending}
+        try:
+            for future in as_completed(futures):
+                unit_files[futures[future]] = future.result()
+            audio_file = audio_future.result()
+        except BaseException:
+            # Stop sibling encodes right away; their output is useless now.
+            abort.set()
+            for future in futures:
+                future.cancel()
+            raise
+
+    concat_list = temp_path / "segments.txt"
+    concat_list.write_text(
+        "".join("file '{}'\n".format(str(path).replace("'", "'\\''")) for path in unit_files),
+        encoding="utf-8",
+    )
+    mux_cmd = [ffmpeg_path, "-y", "-f", "concat", "-safe", "0", "-i", str(concat_list)]
+    if audio_file is not None:
+        mux_cmd.extend(["-i", str(audio_file), "-map", "0:v", "-map", "1:a"])
+    mux_cmd.extend(["-c", "copy", "-movflags", "+faststart", str(output_path)])
+
+    job.update(message="Đang ghép video...")
+    _run_render_step(mux_cmd, job, log_file_path, deadline, progress, "mux", record=record)
+    return {"segments_total": len(units), "segments_cached": cached_segments}
+
+
+def _render_segmented_audio(
+    job: Job,
+    payload: VideoRenderRequest,
+    ffmpeg_path: str,
+    input_video: Path,
+    source_hash: str,
+    audio_paths: List[Dict[str, Any]],
+    log_file_path: Path,
+    deadline: float,
+    progress: _RenderProgress,
+    abort: Optional[threading.Event] = None,
+    record: Optional[_RenderRecord] = None,
+) -> Optional[Path]:
+    """Mix the timeline's audio into one cached AAC file (None if silent)."""
+    job.raise_if_cancelled()
+    audio_codec_args = _audio_codec_args(_render_settings(payload))
+    has_source_audio = _source_has_audio(ffmpeg_path, payload.video_file_id, input_video)
+    if not has_source_audio and not audio_paths:
+        progress.complete("audio")
+        return None
+
+    frame_counts = _segment_frame_counts(payload)
+    clips = [
+        {
+            "hash": _content_hash(info["id"], info["path"]),
+            "start_time": info.get("start_time", 0),
+            "volume_db": info.get("volume_db", 0),
+            "trim_start": info.get("trim_start", 0),
+        }
+        for info in audio_paths
+    ]
+    segments = [
+        [segment.get("sourceStartTime", 0), segment.get("sourceEndTime", 0), segment.get("playbackRate", 1.0), frames]
+        for segment, frames in zip(payload.video_segments, frame_counts)
+    ]
+    key = RenderCache.make_key(
+        {
+            "kind": "audio-premix",
+            "source": source_hash if has_source_audio else None,
+            "segments": segments,
+            "clips": clips,
+            "master_volume_db": payload.master_volume_db,
+            "codec": audio_codec_args,
+        }
+    )
+    cached = render_cache.lookup(key, ".m4a")
+    if cached is not None:
+        progress.complete("audio")
+        return cached
+
+    timeline = Timeline.from_request(payload.video_segments, OUTPUT_FPS)
+    batches = seek_batches(timeline)
+    filter_parts: List[str] = []
+    audio_cmd = [ffmpeg_path, "-y"]
+    source_cut = None
+    if has_source_audio and len(batches) > 1:
+        source_cut = _cut_source_audio_batches(
+            job, ffmpeg_path, input_video, batches, log_file_path, deadline, progress, abort, record
+        )
+        audio_cmd.extend(["-i", str(source_cut)])
+        base_audio_stream = "[0:a]"
+        first_clip_input = 1
+    elif has_source_audio:
+        graph = plan_segment_graph(timeline, str(input_video), video=False, pad_audio=True)
+        for input_args in graph.inputs:
+            audio_cmd.extend(input_args)
+        filter_parts.extend(graph.filters)
+        base_audio_stream = graph.audio_label
+        first_clip_input = len(graph.inputs)
+    else:
+        filter_parts.append(f"anullsrc=r=48000:cl=stereo,atrim=duration={timeline.duration}[orig_audio]")
+        base_audio_stream = "[orig_audio]"
+        first_clip_input = 0
+
+    tts_mix = None
+    if audio_paths:
+        tts_mix = _premix_tts_tracks(job, ffmpeg_path, audio_paths, render_cache.temp_path(".wav"))
+        audio_cmd.extend(["-i", str(tts_mix)])
+        mix_filters, audio_output_label = _mix_tts_tracks(
+            base_audio_stream, first_clip_input, payload.master_volume_db
+        )
+        filter_parts.append(";".join(mix_filters))
+    elif payload.master_volume_db:
+        linear_gain = math.pow(10.0, payload.master_volume_db / 20.0)
+        filter_parts.append(f"{base_audio_stream}volume={linear_gain:.6f}[aout]")
+        audio_output_label = "[aout]"
+    else:
+        audio_output_label = base_audio_stream
+
+    temp_audio = render_cache.temp_path(".m4a")
+    if filter_parts:
+        audio_cmd.extend(["-filter_complex", ";".join(filter_parts), "-map", audio_output_label, "-vn"])
+    else:
+        # Batch-cut source audio with nothing mixed over it.
+        audio_cmd.extend(["-map", "0:a", "-vn"])
+    audio_cmd.extend(audio_codec_args)
+    audio_cmd.extend(["-f", "mp4", str(temp_audio)])
+
+    try:
+        _run_render_step(audio_cmd, job, log_file_path, deadline, progress, "audio", abort, record)
+    except BaseException:
+        temp_audio.unlink(missing_ok=True)
+        raise
+    finally:
+        for scratch in (tts_mix, source_cut):
+            if scratch is not None:
+                scratch.unlink(missing_ok=True)
+    return render_cache.store(key, ".m4a", temp_audio)
+
+
+def _cut_source_audio_batches(
+    job: Job,
+    ffmpeg_path: str,
+    input_video: Path,
+    batches: List[Timeline],
+    log_file_path: Path,
+    deadline: float,
+    progress: _RenderProgress,
+    abort: Optional[threading.Event] = None,
+    record: Optional[_RenderRecord] = None,
+) -> Path:
+    """Cut the source audio of a long reordered timeline into one WAV.
+
+    Each of *batches* is cut by its own ffmpeg run with at most
+    ``MAX_SEEK_INPUTS`` inputs, padded to its exact frame length, and the
+    parts are joined sample for sample with the concat demuxer.
+    """
+    parts: List[Path] = []
+    output_path = render_cache.temp_path(".wav")
+    concat_list = render_cache.temp_path(".txt")
+    try:
+        for i, batch in enumerate(batches):
+            job.raise_if_cancelled()
+            graph = plan_segment_graph(batch, str(input_video), video=False, pad_audio=True)
+            part = render_cache.temp_path(".wav")
+            parts.append(part)
+            cut_cmd = [ffmpeg_path, "-y"]
+            for input_args in graph.inputs:
+                cut_cmd.extend(input_args)
+            cut_cmd.extend(["-filter_complex", ";".join(graph.filters), "-map", graph.audio_label])
+            cut_cmd.extend(["-ar", str(SAMPLE_RATE), "-ac", "2", "-c:a", "pcm_s16le", "-f", "wav", str(part)])
+            # The final mix carries the audio progress; the cuts are not weighted.
+            progress.add_step(f"audio-cut-{i}", None)
+            _run_render_step(cut_cmd, job, log_file_path, deadline, progress, f"audio-cut-{i}", abort, record)
+
+        concat_list.write_text(
+            "".join("file '{}'\n".format(str(path).replace("'", "'\\''")) for path in parts),
+            encoding="utf-8",
+        )
+        join_cmd = [ffmpeg_path, "-y", "-f", "concat", "-safe", "0", "-i", str(concat_list), "-c", "copy", str(output_path)]
+        progress.add_step("audio-join", None)
+        _run_render_step(join_cmd, job, log_file_path, deadline, progress, "audio-join", abort, record)
+    except BaseException:
+        output_path.unlink(missing_ok=True)
+        raise
+    finally:
+        concat_list.unlink(missing_ok=True)
+        for part in parts:
+            part.unlink(missing_ok=True)
+    return output_path
+
+
+# --- Stream-copy rendering ----------------------------------------------------
+#
+# A timeline that only cuts the source (every segment at rate 1.0, no
+# subtitles, cover box or frame overlay) from a source that already has the
+# output's codec, size and frame rate does not need its pixels touched.  When
+# every cut also lands on a closed-GOP keyframe, each segment is copied
+# whole-GOP for whole-GOP and the pieces share the source's parameter sets, so
+# they concat cleanly; anything else is encoded from the start rather than
+# re-encoding edges that cannot be joined to the copied GOPs.  A copy that
+# still fails, or does not decode cleanly, falls back to the requested render
+# mode.  Audio is mixed exactly like a segmented render, so TTS clips and
+# volume still apply.
+
+# Stream copying is cheap; its steps are weighted as this fraction of their
+# length for progress reporting.
+COPY_PROGRESS_WEIGHT = 0.02
+# Decoding the result to check the seams, as a fraction of its length.
+VERIFY_PROGRESS_WEIGHT = 0.05
+
+
+def _can_stream_copy(
+    payload: VideoRenderRequest,
+    frame_overlay_path: Optional[Path],
+    source_info: Optional[Dict[str, Any]],
+) -> bool:
+    """Whether the timeline is cut-only and the source can be copied as-is."""
+    if not payload.stream_copy or not payload.video_segments:
+        return False
+    settings = _render_settings(payload)
+    if payload.subtitles or frame_overlay_path or _cover_box_params(payload, settings):
+        return False
+    if any(float(segment.get("playbackRate", 1.0) or 1.0) != 1.0 for segment in payload.video_segments):
+        return False
+    return bool(
+        source_info
+        and source_info["codec_name"] == "h264"
+        and source_info["pix_fmt"] == "yuv420p"
+        and not _fit_filters(settings, source_info, retimed=False)
+    )
+
+
+def _source_keyframes(file_id: str, path: Path, until: float, start_time: float) -> List[float]:
+    """Presentation times of the video keyframes of the source up to *until*,
+    relative to the start of the file (as ``-ss`` and ``trim`` count)."""
+    keyframes = media_info.keyframes(file_id, path) or []
+    limit = start_time + until + 1
+    return [round(keyframe - start_time, 6) for keyframe in keyframes if keyframe <= limit]
+
+
+def _stream_copy_plan(
+    payload: VideoRenderRequest, input_video: Path, source_info: Dict[str, Any]
+) -> Optional[List[TimelineSegment]]:
+    """Pieces to copy for a cut-only render (see ``plan_stream_copy``), or
+    None when some cut does not land on a clean keyframe."""
+    timeline = Timeline.from_request(payload.video_segments, OUTPUT_FPS)
+    keyframes = _source_keyframes(
+        payload.video_file_id,
+        input_video,
+        max(segment.source_end for segment in timeline.segments),
+        source_info["start_time"],
+    )
+    return plan_stream_copy(timeline, keyframes, source_info["duration"])
+
+
+class _StreamCopyUnsafe(Exception):
+    """Stream copying this render failed or produced a file that does not
+    decode cleanly; it is rendered with a full encode instead."""
+
+
+def _render_stream_copy(
+    job: Job,
+    payload: VideoRenderRequest,
+    ffmpeg_path: str,
+    temp_path: Path,
+    input_video: Path,
+    audio_paths: List[Dict[str, Any]],
+    output_path: Path,
+    log_file_path: Path,
+    deadline: float,
+    pieces: List[TimelineSegment],
+    record: Optional[_RenderRecord] = None,
+) -> Dict[str, Any]:
+    """Copy the keyframe-aligned *pieces* out of the source, concat them and
+    mux in the mixed audio.
+
+    Raises :class:`_StreamCopyUnsafe` when a cut fails or the output does not
+    decode cleanly.
+    """
+    total_duration = sum(piece.frames for piece in pieces) / OUTPUT_FPS
+    progress = _RenderProgress(job)
+    for i, piece in enumerate(pieces):
+        progress.add_step(f"piece-{i}", piece.frames / OUTPUT_FPS * COPY_PROGRESS_WEIGHT)
+    progress.add_step("audio", total_duration * AUDIO_PROGRESS_WEIGHT)
+    progress.add_step("mux", total_duration * MUX_PROGRESS_WEIGHT)
+    progress.add_step("verify", total_duration * VERIFY_PROGRESS_WEIGHT)
+
+    def run_step(cmd: List[str], step: str) -> None:
+        try:
+            _run_render_step(cmd, job, log_file_path, deadline, progress, step, record=record)
+        except _RenderStepFailed as failure:
+            if failure.timed_out:
+                raise
+            raise _StreamCopyUnsafe(f"{step} failed") from failure
+
+    source_hash = _content_hash(payload.video_file_id, input_video)
+    job.update(message="Đang cắt video...")
+    piece_files = []
+    for i, piece in enumerate(pieces):
+        job.raise_if_cancelled()
+        piece_path = temp_path / f"piece_{i}.mp4"
+        # A copy starts at the keyframe at or before -ss; aim half a frame
+        # past the keyframe so rounding cannot land on the previous one.
+        seek = piece.source_start + 0.5 / OUTPUT_FPS
+        piece_cmd = [ffmpeg_path, "-y", "-ss", f"{seek:.6f}", "-i", str(input_video)]
+        piece_cmd.extend(["-frames:v", str(piece.frames), "-map", "0:v:0", "-c", "copy"])
+        piece_cmd.extend(["-avoid_negative_ts", "make_zero", "-f", "mp4", str(piece_path)])
+        run_step(piece_cmd, f"piece-{i}")
+        piece_files.append(piece_path)
+
+    audio_file = _render_segmented_audio(
+        job, payload, ffmpeg_path, input_video, source_hash, audio_paths, log_file_path, deadline, progress,
+        record=record,
+    )
+
+    concat_list = temp_path / "pieces.txt"
+    concat_list.write_text(
+        "".join("file '{}'\n".format(str(path).replace("'", "'\\''")) for path in piece_files),
+        encoding="utf-8",
+    )
+    mux_cmd = [ffmpeg_path, "-y", "-f", "concat", "-safe", "0", "-i", str(concat_list)]
+    if audio_file is not None:
+        mux_cmd.extend(["-i", str(audio_file), "-map", "0:v", "-map", "1:a"])
+    mux_cmd.extend(["-c", "copy", "-movflags", "+faststart", str(output_path)])
+
+    job.update(message="Đang ghép video...")
+    run_step(mux_cmd, "mux")
+
+    # Decode the whole video once; any error at a seam means the copy is bad.
+    job.update(message="Đang kiểm tra video...")
+    verify_cmd = [
+        ffmpeg_path, "-v", "error", "-xerror", "-err_detect", "explode", "-i", str(output_path),
+        "-map", "0:v:0", "-f", "null", "-",
+    ]
+    run_step(verify_cmd, "verify")
+
+    return {
+        "segments_total": len(payload.video_segments),
+        "frames_copied": sum(piece.frames for piece in pieces),
+    }
+
+
+def _apply_preview_window(
+    payload: VideoRenderRequest, source_duration: Optional[float]
+) -> Optional[VideoRenderRequest]:
+    """Copy of *payload* cut down to ``[preview_start, preview_end)`` of the
+    timeline, or None if the window does not overlap it.
+
+    Segments are clipped (in source time), subtitles and TTS clips are shifted
+    to window time; clips that started before the window are trimmed.
+    """
+    window_start = payload.preview_start or 0.0
+    window_end = payload.preview_end if payload.preview_end is not None else math.inf
+
+    segments = payload.video_segments or [
+        {"sourceStartTime": 0.0, "sourceEndTime": source_duration or window_end, "playbackRate": 1.0}
+    ]
+    windowed_segments = []
+    offset = 0.0
+    for segment in segments:
+        start = float(segment.get("sourceStartTime", 0) or 0)
+        end = float(segment.get("sourceEndTime", 0) or 0)
+        rate = float(segment.get("playbackRate", 1.0) or 1.0)
+        duration = max(end - start, 0.0) / rate
+        lo, hi = max(window_start, offset), min(window_end, offset + duration)
+        if hi > lo:
+            windowed_segments.append(
+                {**segment, "sourceStartTime": start + (lo - offset) * rate, "sourceEndTime": start + (hi - offset) * rate}
+            )
+        offset += duration
+    if not windowed_segments or math.isinf(windowed_segments[-1]["sourceEndTime"]):
+        return None
+
+    audio_files = []
+    for audio_file in payload.audio_files:
+        start_time = float(audio_file.get("startTime", 0) or 0)
+        if start_time >= window_end:
+            continue
+        audio_files.append(
+            {
+                **audio_file,
+                "startTime": max(start_time - window_start, 0.0),
+                "trimStart": float(audio_file.get("trimStart", 0) or 0) + max(window_start - start_time, 0.0),
+            }
+        )
+
+    update = {
+        "video_segments": windowed_segments,
+        "subtitles": CueIndex(payload.subtitles or []).window(window_start, window_end),
+        "audio_files": audio_files,
+    }
+    try:
+        # Pydantic v2
+        return payload.model_copy(update=update)
+    except AttributeError:
+        # Pydantic v1
+        return payload.copy(update=update)
+
+
+def _render_job(job: Job, project_id: str, payload: VideoRenderRequest, ffmpeg_path: str) -> Dict[str, Any]:
+    record = _RenderRecord(job, project_id, payload)
+    status = "failed"
+    try:
+        result = _run_render(job, project_id, payload, ffmpeg_path, record)
+        if result.get("status") == "success":
+            status = "succeeded"
+        return result
+    except JobCancelled:
+        status = "cancelled"
+        raise
+    finally:
+        record.save(status)
+
+
+def _run_render(
+    job: Job, project_id: str, payload: VideoRenderRequest, ffmpeg_path: str, record: _RenderRecord
+) -> Dict[str, Any]:
     with tempfile.TemporaryDirectory() as temp_dir:
         temp_path = Path(temp_dir)
 
-        input_video = temp_path / f"input{Path(filename).suffix}"
-        input_video.write_bytes(video_data)
+        input_video = _resolve_input_path(payload.video_file_id, temp_path, "input")
+        if input_video is None:
+            return {"status": "error", "message": f"Video file not found: {payload.video_file_id}"}
 
-        subtitle_file = None
-        if payload.subtitles and len(payload.subtitles) > 0:
-            subtitle_file = temp_path / "subtitles.ass"
-            _create_ass_subtitle_file(
-                payload.subtitles, payload.subtitle_style, subtitle_file
-            )
+        source_info = _source_info(payload.video_file_id, input_video)
+        if payload.preview_start is not None or payload.preview_end is not None:
+            windowed = _apply_preview_window(payload, source_info["duration"] if source_info else None)
+            if windowed is None:
+                return {"status": "error", "message": "Preview window is outside the timeline"}
+            payload = windowed
 
         audio_paths = []
         for i, audio_file in enumerate(payload.audio_files):
             audio_id = audio_file.get("id")
             if audio_id:
-                audio_tuple = db.get_file(audio_id)
-                if audio_tuple:
-                    audio_data, _, audio_name = audio_tuple
-                    audio_path = temp_path / f"audio_{i}_{audio_name}"
-                    audio_path.write_bytes(audio_data)
+                audio_path = _resolve_input_path(audio_id, temp_path, f"audio_{i}")
+                if audio_path is not None:
                     audio_paths.append(
                         {
+                            "id": audio_id,
                             "path": audio_path,
                             "start_time": audio_file.get("startTime", 0),
                             "track": audio_file.get("track", i),
                             "volume_db": audio_file.get("volumeDb", 0),
+                            "trim_start": audio_file.get("trimStart", 0),
                         }
                     )
 
@@ -209,315 +1384,175 @@ async def render_video(project_id: str, payload: VideoRenderRequest = Body(...))
         output_path = DATA_ROOT / project_id / "rendered" / output_filename
         output_path.parent.mkdir(parents=True, exist_ok=True)
 
-        ffmpeg_cmd = [ffmpeg_path, "-y", "-i", str(input_video)]
-
-        for audio_info in audio_paths:
-            ffmpeg_cmd.extend(["-i", str(audio_info["path"])])
-
-        if frame_overlay_path:
-            ffmpeg_cmd.extend(["-i", str(frame_overlay_path)])
-
-        filter_complex_parts: List[str] = []
-        video_filters: List[str] = []
-        has_blur_region = False
-        blur_region_params: Optional[Dict[str, int]] = None
-
-        if payload.hardsub_cover_box and payload.hardsub_cover_box.get("enabled"):
-            box = payload.hardsub_cover_box
-            x = int(box.get("x", 0) * 1920 / 100)
-            y = int(box.get("y", 0) * 1080 / 100)
-            w = int(box.get("width", 0) * 1920 / 100)
-            h = int(box.get("height", 0) * 1080 / 100)
-            has_blur_region = True
-            blur_region_params = {"x": x, "y": y, "w": w, "h": h}
-
-        video_filters.append("scale=1920:1080:force_original_aspect_ratio=decrease")
-        video_filters.append("pad=1920:1080:(ow-iw)/2:(oh-ih)/2")
-        video_filters.append("fps=30")
-
-        if subtitle_file:
-            subtitle_path_str = str(subtitle_file).replace("\\", "/").replace(":", r"\:")
-            video_filters.append(f"ass='{subtitle_path_str}'")
-
-        use_filter_complex = bool(audio_paths) or frame_overlay_path or has_blur_region
-
-        if use_filter_complex:
-            filter_parts: List[str] = []
+        render_mode = payload.render_mode if payload.video_segments else "single"
+        if render_mode == "single" and len(seek_batches(Timeline.from_request(payload.video_segments, OUTPUT_FPS))) > 1:
+            # One pass would open an input per reordered segment; encode the
+            # segments one at a time instead.
+            render_mode = "segmented"
+        # The mode an abandoned stream copy falls back to.
+        encode_mode = render_mode
+        copy_pieces = (
+            _stream_copy_plan(payload, input_video, source_info)
+            if _can_stream_copy(payload, frame_overlay_path, source_info)
+            else None
+        )
+        if copy_pieces:
+            render_mode = "stream-copy"
 
-            video_segments = (
-                payload.video_segments
-                if hasattr(payload, "video_segments") and payload.video_segments
-                else None
-            )
+        log_file_path = output_path.parent / f"render_log_{dt.datetime.utcnow().timestamp()}.txt"
 
-            if video_segments and len(video_segments) >= 1:
-                segment_filters: List[str] = []
-                for i, segment in enumerate(video_segments):
-                    start = segment.get("sourceStartTime", 0)
-                    end = segment.get("sourceEndTime", 0)
-                    rate = segment.get("playbackRate", 1.0)
+        record.fields.update(
+            {
+                "render_mode": render_mode,
+                "log_file": str(log_file_path),
+                "input_hashes": {
+                    "video": (db.get_file_metadata(payload.video_file_id) or {}).get("content_hash"),
+                    "audio": [(db.get_file_metadata(info["id"]) or {}).get("content_hash") for info in audio_paths],
+                    "overlay": hash_file(frame_overlay_path)[0] if frame_overlay_path else None,
+                },
+            }
+        )
 
-                    segment_filter = (
-                        f"[0:v]trim=start={start}:end={end},setpts=(PTS-STARTPTS)/{rate}[seg{i}v]"
+        job.update(
+            message="Đang render video...",
+            details={"log_file": str(log_file_path), "render_mode": render_mode, "profile": payload.profile},
+        )
+        with open(log_file_path, "w", encoding="utf-8") as log_file:
+            log_file.write("=" * 80 + "\n")
+            log_file.write("FFMPEG RENDER LOG\n")
+            log_file.write("=" * 80 + "\n\n")
+            log_file.write(f"Project ID: {project_id}\n")
+            log_file.write(f"Job ID: {job.id}\n")
+            log_file.write(f"Timestamp: {dt.datetime.utcnow().isoformat()}\n")
+            log_file.write(f"Render mode: {render_mode}\n")
+            log_file.write(f"Profile: {payload.profile} {_render_settings(payload)}\n")
+            if payload.preview_start is not None or payload.preview_end is not None:
+                log_file.write(f"Preview window: {payload.preview_start or 0.0} - {payload.preview_end}\n")
+            log_file.write(f"Output: {output_path}\n\n")
+
+        deadline = time.monotonic() + RENDER_TIMEOUT_SECONDS
+        try:
+            render_info = None
+            fallback: Dict[str, Any] = {}
+            if render_mode == "stream-copy":
+                try:
+                    render_info = _render_stream_copy(
+                        job,
+                        payload,
+                        ffmpeg_path,
+                        temp_path,
+                        input_video,
+                        audio_paths,
+                        output_path,
+                        log_file_path,
+                        deadline,
+                        copy_pieces,
+                        record=record,
                     )
-                    segment_filters.append(segment_filter)
-
-                filter_parts.append(";".join(segment_filters))
-
-                if len(video_segments) > 1:
-                    segment_labels = "".join([f"[seg{i}v]" for i in range(len(video_segments))])
-                    concat_filter = (
-                        f"{segment_labels}concat=n={len(video_segments)}:v=1:a=0[raw_video]"
+                except _StreamCopyUnsafe as unsafe:
+                    output_path.unlink(missing_ok=True)
+                    with open(log_file_path, "a", encoding="utf-8") as log_file:
+                        log_file.write(f"STREAM COPY ABANDONED: {unsafe}; re-encoding ({encode_mode})\n\n")
+                    render_mode = encode_mode
+                    fallback = {"stream_copy_fallback": str(unsafe)}
+                    record.clear_failure()
+                    record.fields["render_mode"] = render_mode
+                    job.update(
+                        message="Không thể cắt trực tiếp, đang render lại...",
+                        details={"render_mode": render_mode, **fallback},
                     )
-                    filter_parts.append(concat_filter)
-                    video_stream = "[raw_video]"
-                else:
-                    video_stream = "[seg0v]"
-            else:
-                video_stream = "[0:v]"
-
-            basic_filters = [
-                f for f in video_filters if not f.startswith("[") and "overlay" not in f and "ass" not in f
-            ]
-            if basic_filters:
-                video_stream = f"{video_stream}{','.join(basic_filters)}"
-
-            if has_blur_region and blur_region_params:
-                params = blur_region_params
-                video_stream = (
-                    f"{video_stream}[main];[main]split[v1][v2];[v2]crop={params['w']}:{params['h']}:{params['x']}:{params['y']}"
-                    ",boxblur=luma_radius=20:luma_power=3[blurred];[v1][blurred]overlay="
-                    f"{params['x']}:{params['y']}"
+            if render_info is None and render_mode in ("segmented", "parallel"):
+                parallel = render_mode == "parallel"
+                render_info = _render_segmented(
+                    job,
+                    payload,
+                    ffmpeg_path,
+                    temp_path,
+                    input_video,
+                    audio_paths,
+                    frame_overlay_path,
+                    output_path,
+                    log_file_path,
+                    deadline,
+                    workers=(payload.parallel_workers or RENDER_PARALLEL_WORKERS) if parallel else 1,
+                    chunk_frames=PARALLEL_CHUNK_FRAMES if parallel else None,
+                    source_info=source_info,
+                    record=record,
                 )
-
-            if frame_overlay_path:
-                overlay_input_idx = 1 + len(audio_paths)
-                video_stream = (
-                    f"{video_stream}[vtmp];[{overlay_input_idx}:v]scale=1920:1080[frame];[vtmp][frame]overlay=0:0"
+            elif render_info is None:
+                subtitle_file = _subtitle_file_for(payload.subtitles, payload) if payload.subtitles else None
+                tts_mix = (
+                    _premix_tts_tracks(job, ffmpeg_path, audio_paths, temp_path / "tts_mix.wav") if audio_paths else None
                 )
-
-            subtitle_filter = [f for f in video_filters if "ass" in f]
-            if subtitle_filter:
-                video_stream = f"{video_stream},{subtitle_filter[0]}"
-
-            filter_parts.append(f"{video_stream}[vout]")
-
-            audio_output_label: Optional[str] = None
-
-            if audio_paths:
-                base_audio_stream = "[0:a]"
-
-                if video_segments and len(video_segments) > 0:
-                    audio_segment_filters: List[str] = []
-                    for i, segment in enumerate(video_segments):
-                        start = segment.get("sourceStartTime", 0)
-                        end = segment.get("sourceEndTime", 0)
-                        rate = segment.get("playbackRate", 1.0)
-
-                        # FFmpeg atempo filter only supports 0.5-2.0 range
-                        # For extreme rates, chain multiple atempo filters
-                        if rate == 1.0:
-                            tempo_filter = ""
-                        elif 0.5 <= rate <= 2.0:
-                            tempo_filter = f",atempo={rate}"
-                        else:
-                            # Chain atempo filters for extreme rates
-                            tempo_filters = []
-                            current_rate = rate
-                            # For fast rates (>2.0), apply multiple 2.0x filters
-                            while current_rate > 2.0:
-                                tempo_filters.append("atempo=2.0")
-                                current_rate /= 2.0
-                            # For slow rates (<0.5), apply multiple 0.5x filters
-                            while current_rate < 0.5:
-                                tempo_filters.append("atempo=0.5")
-                                current_rate *= 2.0  # Each 0.5x filter doubles the effective rate
-                            # Apply remaining rate if not exactly 1.0
-                            if current_rate != 1.0:
-                                tempo_filters.append(f"atempo={current_rate}")
-                            tempo_filter = "," + ",".join(tempo_filters) if tempo_filters else ""
-
-                        audio_trim = (
-                            f"[0:a]atrim=start={start}:end={end},asetpts=PTS-STARTPTS"
-                        )
-                        audio_segment_filters.append(
-                            f"{audio_trim}{tempo_filter}[seg{i}a]"
-                        )
-
-                    if audio_segment_filters:
-                        filter_parts.append(";".join(audio_segment_filters))
-                        segment_labels = "".join([f"[seg{i}a]" for i in range(len(audio_segment_filters))])
-                        filter_parts.append(
-                            f"{segment_labels}concat=n={len(audio_segment_filters)}:v=0:a=1[orig_audio]"
-                        )
-                        base_audio_stream = "[orig_audio]"
-
-                delay_filters: List[str] = []
-                delayed_labels: List[str] = []
-                for idx, audio_info in enumerate(audio_paths):
-                    start_time = audio_info.get("start_time", 0)
-                    volume_db = audio_info.get("volume_db", 0)
-                    
-                    # Frontend already adjusted start time based on playback rates
-                    start_time_ms = int(start_time * 1000)
-                    
-                    # Apply individual volume adjustment if specified
-                    if volume_db != 0:
-                        linear_gain = math.pow(10.0, volume_db / 20.0)
-                        delay_filters.append(
-                            f"[{idx + 1}:a]volume={linear_gain:.6f},adelay={start_time_ms}|{start_time_ms}[a{idx + 1}]"
-                        )
-                    else:
-                        delay_filters.append(
-                            f"[{idx + 1}:a]adelay={start_time_ms}|{start_time_ms}[a{idx + 1}]"
-                        )
-                    delayed_labels.append(f"[a{idx + 1}]")
-
-                mix_inputs = base_audio_stream + "".join(delayed_labels)
-                mix_label = "aout"
-                if payload.master_volume_db:
-                    mix_label = "aout_mix"
-
-                delay_filters.append(
-                    f"{mix_inputs}amix=inputs={len(audio_paths) + 1}:duration=longest:normalize=0[{mix_label}]"
+                ffmpeg_cmd = _build_single_pass_command(
+                    ffmpeg_path,
+                    payload,
+                    input_video,
+                    subtitle_file,
+                    tts_mix,
+                    frame_overlay_path,
+                    output_path,
+                    source_info,
+                    _source_has_audio(ffmpeg_path, payload.video_file_id, input_video),
                 )
-
-                if payload.master_volume_db:
-                    linear_gain = math.pow(10.0, payload.master_volume_db / 20.0)
-                    delay_filters.append(f"[{mix_label}]volume={linear_gain:.6f}[aout]")
-                    audio_output_label = "[aout]"
-                else:
-                    audio_output_label = f"[{mix_label}]"
-
-                filter_parts.append(";".join(delay_filters))
-            elif payload.master_volume_db:
-                linear_gain = math.pow(10.0, payload.master_volume_db / 20.0)
-                filter_parts.append(f"[0:a]volume={linear_gain:.6f}[aout]")
-                audio_output_label = "[aout]"
-
-            filter_complex_parts.extend(filter_parts)
-
-            ffmpeg_cmd.extend(["-filter_complex", ";".join(filter_complex_parts)])
-            ffmpeg_cmd.extend(["-map", "[vout]"])
-            if audio_output_label:
-                ffmpeg_cmd.extend(["-map", audio_output_label])
-            elif audio_paths:
-                ffmpeg_cmd.extend(["-map", "[aout]"])
-            else:
-                ffmpeg_cmd.extend(["-map", "0:a?"])
-        else:
-            ffmpeg_cmd.extend(video_filters)
-
-        ffmpeg_cmd.extend(["-c:v", "libx264"])
-        ffmpeg_cmd.extend(["-preset", "medium"])
-        ffmpeg_cmd.extend(["-crf", "23"])
-        ffmpeg_cmd.extend(["-c:a", "aac", "-b:a", "192k"])
-        ffmpeg_cmd.append(str(output_path))
-
-        log_file_path = output_path.parent / f"render_log_{dt.datetime.utcnow().timestamp()}.txt"
-
-        try:
-            with open(log_file_path, "w", encoding="utf-8") as log_file:
-                log_file.write("=" * 80 + "\n")
-                log_file.write("FFMPEG RENDER LOG\n")
-                log_file.write("=" * 80 + "\n\n")
-                log_file.write(f"Project ID: {project_id}\n")
-                log_file.write(f"Timestamp: {dt.datetime.utcnow().isoformat()}\n")
-                log_file.write(f"Output: {output_path}\n\n")
-                log_file.write("COMMAND:\n")
-                log_file.write(" ".join(ffmpeg_cmd) + "\n\n")
-                log_file.write("=" * 80 + "\n")
-                log_file.write("FFMPEG OUTPUT:\n")
-                log_file.write("=" * 80 + "\n\n")
-
-            result = subprocess.run(
-                ffmpeg_cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                timeout=600,
-                check=False,
-            )
-
-            stdout = result.stdout.decode("utf-8", errors="ignore")
-            stderr = result.stderr.decode("utf-8", errors="ignore")
-
+                progress = _RenderProgress(job)
+                progress.add_step("render", _expected_output_duration(payload))
+                _run_render_step(ffmpeg_cmd, job, log_file_path, deadline, progress, "render", record=record)
+                render_info = {}
+        except JobCancelled:
+            output_path.unlink(missing_ok=True)
             with open(log_file_path, "a", encoding="utf-8") as log_file:
-                log_file.write("STDOUT:\n")
-                log_file.write(stdout + "\n\n")
-                log_file.write("STDERR:\n")
-                log_file.write(stderr + "\n\n")
+                log_file.write("\n" + "=" * 80 + "\n")
+                log_file.write("CANCELLED\n")
                 log_file.write("=" * 80 + "\n")
-                log_file.write(f"Return Code: {result.returncode}\n")
-                log_file.write("=" * 80 + "\n")
-
-            if result.returncode != 0:
+            raise
+        except _RenderStepFailed as failure:
+            output_path.unlink(missing_ok=True)
+            if failure.timed_out:
+                message = "Rendering timeout (>10 minutes). Video may be too long or complex."
+            else:
+                stderr = failure.stderr
                 stderr_lines = stderr.strip().split("\n")
-                error_summary = (
-                    "\n".join(stderr_lines[-10:]) if len(stderr_lines) > 10 else stderr
-                )
-
-                return {
-                    "status": "error",
-                    "message": f"ffmpeg rendering failed:\n{error_summary}",
-                    "ffmpeg_command": " ".join(ffmpeg_cmd),
-                    "log_file": str(log_file_path),
-                    "video_segments_count": len(payload.video_segments),
-                    "audio_tracks_count": len(payload.audio_files),
-                    "subtitles_count": len(payload.subtitles),
-                }
-
-            file_size = output_path.stat().st_size
-
-            duration_seconds = None
-            try:
-                probe_result = subprocess.run(
-                    [
-                        ffmpeg_path.replace("ffmpeg", "ffprobe"),
-                        "-v",
-                        "error",
-                        "-show_entries",
-                        "format=duration",
-                        "-of",
-                        "default=noprint_wrappers=1:nokey=1",
-                        str(output_path),
-                    ],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    check=False,
-                )
-                if probe_result.returncode == 0:
-                    duration_seconds = float(probe_result.stdout.decode().strip())
-            except Exception:
-                pass
+                error_summary = "\n".join(stderr_lines[-10:]) if len(stderr_lines) > 10 else stderr
+                message = f"ffmpeg rendering failed:\n{error_summary}"
 
             return {
-                "status": "success",
-                "message": "Video rendered successfully!",
+                "status": "error",
+                "message": message,
+                "ffmpeg_command": " ".join(failure.ffmpeg_cmd),
                 "log_file": str(log_file_path),
-                "output_filename": output_filename,
-                "output_path": str(output_path),
-                "file_size": file_size,
-                "duration_seconds": duration_seconds,
                 "video_segments_count": len(payload.video_segments),
                 "audio_tracks_count": len(payload.audio_files),
                 "subtitles_count": len(payload.subtitles),
             }
 
-        except subprocess.TimeoutExpired:
-            try:
-                with open(log_file_path, "a", encoding="utf-8") as log_file:
-                    log_file.write("\n" + "=" * 80 + "\n")
-                    log_file.write("TIMEOUT: Process exceeded 10 minutes\n")
-                    log_file.write("=" * 80 + "\n")
-            except Exception:
-                pass
+        file_size = output_path.stat().st_size
 
-            return {
-                "status": "error",
-                "message": "Rendering timeout (>10 minutes). Video may be too long or complex.",
-                "ffmpeg_command": " ".join(ffmpeg_cmd),
-                "log_file": str(log_file_path),
-                "video_segments_count": len(payload.video_segments),
-                "audio_tracks_count": len(payload.audio_files),
-                "subtitles_count": len(payload.subtitles),
+        output_info = probe_path(output_path)
+        duration_seconds = output_info["duration"] if output_info else None
+
+        record.fields.update(
+            {
+                "output_size": file_size,
+                "output_duration_seconds": duration_seconds,
+                "segments_total": render_info.get("segments_total"),
+                "segments_cached": render_info.get("segments_cached"),
             }
+        )
+
+        return {
+            "status": "success",
+            "message": "Video rendered successfully!",
+            "log_file": str(log_file_path),
+            "output_filename": output_filename,
+            "output_path": str(output_path),
+            "file_size": file_size,
+            "duration_seconds": duration_seconds,
+            "render_mode": render_mode,
+            "profile": payload.profile,
+            **render_info,
+            **fallback,
+            "video_segments_count": len(payload.video_segments),
+            "audio_tracks_count": len(payload.audio_files),
+            "subtitles_count": len(payload.subtitles),
+        }
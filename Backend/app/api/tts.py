@@ -1,16 +1,27 @@
 from __future__ import annotations
 
 import datetime as dt
-import tempfile
-from pathlib import Path
-from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 
 from app.TTS import clines as tts_engine
-from app.TTS.constants import sessionid as tts_sessionids, voices as tts_voices
+from app.TTS.constants import voices as tts_voices
+from app.ass_subtitles import srt_time_to_seconds
 from app.core import db
+from app.core.config import (
+    TTS_BATCH_WORKERS,
+    TTS_CACHE_MAX_BYTES,
+    TTS_CACHE_ROOT,
+    TTS_MAX_CONCURRENCY,
+    TTS_SESSION_RATE_LIMIT,
+)
+from app.jobs import Job, JobCancelled, JobManager
+from app.track_allocator import allocate_tracks, clip_interval
+from app.tts_cache import TTSCache
 
 
 class TTSRequest(BaseModel):
@@ -23,208 +34,229 @@ class TTSBatchRequest(BaseModel):
     subtitles: List[Dict[str, Any]]
     voice: str = "BV074_streaming"
     session_id: Optional[str] = None
+    # Subtitles synthesized at once; defaults to TTS_BATCH_WORKERS.
+    parallelism: Optional[int] = Field(None, ge=1, le=32)
 
 
 router = APIRouter()
 
+tts_jobs = JobManager("tts", db, TTS_MAX_CONCURRENCY)
+
+# One client for every request: batches share its connection pool, and each
+# sessionid's rate budget and health.
+tts_client = tts_engine.TikTokTTSClient(
+    tts_engine.configured_session_ids(),
+    limiter=tts_engine.RateLimiter(TTS_SESSION_RATE_LIMIT),
+)
+
+tts_cache = TTSCache(TTS_CACHE_ROOT, TTS_CACHE_MAX_BYTES, db)
+
+# Batch clips are synthesized in chunks of this many characters; single
+# /tts/generate requests are not chunked and are cached under chunk size 0.
+BATCH_CHUNK_SIZE = 200
+
 
 @router.get("/tts/voices")
 def list_tts_voices() -> List[Dict[str, str]]:
     return [{"name": name, "id": voice_id} for name, voice_id in tts_voices]
 
 
-@router.post("/tts/generate")
-def generate_tts(payload: TTSRequest) -> Dict[str, Any]:
-    session_id = payload.session_id or tts_sessionids[0]
-
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_file:
-        temp_path = Path(tmp_file.name)
+@router.get("/tts/sessions")
+def tts_session_health() -> List[Dict[str, Any]]:
+    return tts_client.session_health()
 
-    try:
-        result = tts_engine.tts(
-            session_id=session_id,
-            text_speaker=payload.voice,
-            req_text=payload.text,
-            filename=str(temp_path),
-            play=False,
-        )
 
-        if result.get("status_code") != 0:
-            raise HTTPException(status_code=400, detail=f"TTS generation failed: {result.get('status')}")
+@router.get("/tts/cache/stats")
+def tts_cache_stats() -> Dict[str, Any]:
+    return tts_cache.stats()
 
-        audio_data = temp_path.read_bytes()
 
+@router.post("/tts/generate")
+def generate_tts(payload: TTSRequest) -> Dict[str, Any]:
+    cached = tts_cache.get(payload.voice, payload.text, 0)
+    if cached is not None:
+        audio_data, duration_ms = cached
         return {
             "status": "success",
-            "duration": result.get("duration", 0),
+            "duration": duration_ms,
             "audio_data": audio_data.hex(),
             "size": len(audio_data),
+            "cached": True,
         }
-    finally:
-        if temp_path.exists():
-            temp_path.unlink()
 
+    result = tts_client.synthesize(payload.text, payload.voice, payload.session_id)
+    if result.get("status_code") != 0:
+        raise HTTPException(status_code=400, detail=f"TTS generation failed: {result.get('status')}")
 
-@router.post("/projects/{project_id}/tts/batch")
-async def generate_batch_tts(project_id: str, payload: TTSBatchRequest) -> Dict[str, Any]:
-    project = db.get_project(project_id)
-    if project is None:
-        raise HTTPException(status_code=404, detail=f"Project not found: {project_id}")
+    audio_data = result["audio"]
+    duration_ms = int(float(result.get("duration") or 0))
+    if audio_data:
+        tts_cache.put(payload.voice, payload.text, 0, audio_data, duration_ms)
+
+    return {
+        "status": "success",
+        "duration": duration_ms,
+        "audio_data": audio_data.hex(),
+        "size": len(audio_data),
+        "cached": False,
+    }
 
-    session_id = payload.session_id or tts_sessionids[0]
-    generated_files: List[Dict[str, Any]] = []
-    errors: List[Dict[str, Any]] = []
 
-    project_files = project.get("files") or []
-    existing_audio_files = [
-        f for f in project_files if isinstance(f, dict) and f.get("type") == "audio"
-    ]
-    next_track = max([f.get("track", 0) for f in existing_audio_files], default=-1) + 1
+class _SynthesisFailed(Exception):
+    """A subtitle's speech could not be synthesized; the message is reported
+    back to the frontend as that subtitle's error."""
 
-    def overlaps(start1: float, end1: float, start2: float, end2: float) -> bool:
-        return start1 < end2 and start2 < end1
 
-    def find_available_track(new_start: float, new_duration: float, generated_so_far: List[Dict[str, Any]]) -> int:
-        new_end = new_start + new_duration
-        track = next_track
+def _synthesize_text(text: str, voice: str, session_id: Optional[str]) -> Tuple[bytes, int, bool]:
+    """``(mp3_bytes, duration_ms, cached)`` for *text*, from the TTS cache
+    when this voice already spoke it."""
+    cached = tts_cache.get(voice, text, BATCH_CHUNK_SIZE)
+    if cached is not None:
+        return cached[0], cached[1], True
 
-        while True:
-            has_overlap = False
-            for existing in generated_so_far:
-                if existing["track"] == track:
-                    existing_end = existing["start_time"] + existing["duration"]
-                    if overlaps(new_start, new_end, existing["start_time"], existing_end):
-                        has_overlap = True
-                        break
+    result = tts_engine.synthesize_long_text(
+        session_id=session_id,
+        text_speaker=voice,
+        text=text,
+        chunk_size=BATCH_CHUNK_SIZE,
+        client=tts_client,
+    )
 
-            if not has_overlap:
-                return track
-            track += 1
+    if result.get("status_code") != 0:
+        raise _SynthesisFailed(f"TTS failed: {result.get('status')}")
 
-    for subtitle in payload.subtitles:
-        try:
-            text = subtitle.get("text", "").strip()
-            if not text:
-                continue
-
-            subtitle_id = subtitle.get("id")
-            start_time = subtitle.get("startTime", "00:00:00,000")
-
-            file_id = f"tts-{project_id}-{subtitle_id}-{dt.datetime.utcnow().timestamp()}"
-            filename = f"tts_{project_id}_subtitle_{subtitle_id}.mp3"
-
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_file:
-                temp_path = Path(tmp_file.name)
-
-            try:
-                result = tts_engine.synthesize_long_text(
-                    session_id=session_id,
-                    text_speaker=payload.voice,
-                    text=text,
-                    output_filename=str(temp_path),
-                    chunk_size=200,
-                    keep_chunks=False,
-                    play=False,
-                )
+    audio_data = result["audio"]
+    if len(audio_data) == 0:
+        raise _SynthesisFailed("TTS audio is empty")
 
-                if result.get("status_code") != 0:
-                    errors.append(
-                        {
-                            "subtitle_id": subtitle_id,
-                            "error": f"TTS failed: {result.get('status')}",
-                        }
-                    )
-                    continue
-
-                if not temp_path.exists():
-                    errors.append(
-                        {
-                            "subtitle_id": subtitle_id,
-                            "error": "TTS file was not created",
-                        }
-                    )
-                    continue
-
-                audio_data = temp_path.read_bytes()
-
-                if len(audio_data) == 0:
-                    errors.append(
-                        {
-                            "subtitle_id": subtitle_id,
-                            "error": "TTS file is empty",
-                        }
-                    )
-                    continue
-
-                is_mp3 = (
-                    audio_data[:3] == b"ID3"
-                    or (
-                        len(audio_data) >= 2
-                        and audio_data[0] == 0xFF
-                        and audio_data[1] in (0xFB, 0xF3, 0xF2)
-                    )
-                )
+    # Joined chunks start straight at an MPEG frame sync (ID3 tags are dropped).
+    is_mp3 = audio_data[:3] == b"ID3" or (
+        len(audio_data) >= 2 and audio_data[0] == 0xFF and (audio_data[1] & 0xE0) == 0xE0
+    )
 
-                if not is_mp3:
-                    errors.append(
-                        {
-                            "subtitle_id": subtitle_id,
-                            "error": (
-                                "Generated file is not a valid MP3 (magic bytes: "
-                                f"{audio_data[:4].hex() if len(audio_data) >= 4 else 'empty'})"
-                            ),
-                        }
-                    )
-                    continue
-
-                created_at = dt.datetime.utcnow().isoformat()
-                storage_path, file_size = db.save_file(
-                    file_id=file_id,
-                    project_id=project_id,
-                    filename=filename,
-                    content_type="audio/mpeg",
-                    data=audio_data,
-                    created_at=created_at,
-                )
+    if not is_mp3:
+        raise _SynthesisFailed(
+            "Generated file is not a valid MP3 (magic bytes: "
+            f"{audio_data[:4].hex() if len(audio_data) >= 4 else 'empty'})"
+        )
 
-                time_parts = start_time.replace(",", ".").split(":")
-                start_seconds = (
-                    float(time_parts[0]) * 3600
-                    + float(time_parts[1]) * 60
-                    + float(time_parts[2])
-                )
+    duration_ms = int(result.get("duration", 0))
+    tts_cache.put(voice, text, BATCH_CHUNK_SIZE, audio_data, duration_ms)
+    return audio_data, duration_ms, False
 
-                duration_seconds = result.get("duration", 0) / 1000.0
 
-                assigned_track = find_available_track(
-                    start_seconds, duration_seconds, generated_files
-                )
+def _synthesize_subtitle(
+    project_id: str, subtitle: Dict[str, Any], voice: str, session_id: Optional[str]
+) -> Dict[str, Any]:
+    """Synthesize and store one subtitle's clip.
+
+    Returns ``{"generated": {...}}`` (without a track yet), ``{"error": {...}}``
+    or ``{}`` for subtitles without text.
+    """
+    try:
+        text = subtitle.get("text", "").strip()
+        if not text:
+            return {}
+
+        subtitle_id = subtitle.get("id")
+        start_time = subtitle.get("startTime", "00:00:00,000")
+
+        file_id = f"tts-{project_id}-{subtitle_id}-{dt.datetime.utcnow().timestamp()}"
+        filename = f"tts_{project_id}_subtitle_{subtitle_id}.mp3"
+
+        try:
+            audio_data, duration_ms, cached = _synthesize_text(text, voice, session_id)
+        except _SynthesisFailed as exc:
+            return {"error": {"subtitle_id": subtitle_id, "error": str(exc)}}
+
+        created_at = dt.datetime.utcnow().isoformat()
+        storage_path, file_size = db.save_file(
+            file_id=file_id,
+            project_id=project_id,
+            filename=filename,
+            content_type="audio/mpeg",
+            data=audio_data,
+            created_at=created_at,
+        )
+
+        return {
+            "generated": {
+                "file_id": file_id,
+                "filename": filename,
+                "subtitle_id": subtitle_id,
+                "text": text,
+                "duration": duration_ms / 1000.0,
+                "start_time": srt_time_to_seconds(start_time),
+                "storage_path": str(storage_path),
+                "file_size": file_size,
+                "created_at": created_at,
+                "cached": cached,
+            }
+        }
 
-                generated_files.append(
-                    {
-                        "file_id": file_id,
-                        "filename": filename,
-                        "subtitle_id": subtitle_id,
-                        "text": text,
-                        "duration": duration_seconds,
-                        "track": assigned_track,
-                        "start_time": start_seconds,
-                        "storage_path": str(storage_path),
-                        "file_size": file_size,
-                        "created_at": created_at,
-                    }
+    except Exception as exc:
+        return {"error": {"subtitle_id": subtitle.get("id"), "error": str(exc)}}
+
+
+def _assign_tracks(generated_files: List[Dict[str, Any]], existing_audio_files: List[Dict[str, Any]]) -> None:
+    """Put each clip on the lowest audio track where it overlaps neither
+    another new clip nor an audio clip already in the project."""
+    occupied = []
+    for existing in existing_audio_files:
+        try:
+            track = int(existing.get("track") or 0)
+        except (TypeError, ValueError):
+            continue
+        start, end = clip_interval(existing.get("startTime"), existing.get("duration"))
+        occupied.append((track, start, end))
+    tracks = allocate_tracks(
+        [(generated["start_time"], generated["start_time"] + generated["duration"]) for generated in generated_files],
+        occupied,
+    )
+    for generated, track in zip(generated_files, tracks):
+        generated["track"] = track
+
+
+def _batch_tts_job(
+    job: Job, project_id: str, payload: TTSBatchRequest, existing_audio_files: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Synthesize every subtitle on a bounded pool, then assign tracks once
+    all clips (and their durations) are known."""
+    # Without an explicit sessionid the client rotates over the configured ones.
+    session_id = payload.session_id
+    total = len(payload.subtitles)
+    workers = payload.parallelism or TTS_BATCH_WORKERS
+    results: List[Dict[str, Any]] = [{} for _ in payload.subtitles]
+
+    job.update(message="Đang tạo giọng đọc...", details={"total": total, "done": 0, "workers": workers})
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts-batch") as pool:
+        futures = {
+            pool.submit(_synthesize_subtitle, project_id, subtitle, payload.voice, session_id): index
+            for index, subtitle in enumerate(payload.subtitles)
+        }
+        try:
+            for done, future in enumerate(as_completed(futures), start=1):
+                results[futures[future]] = future.result()
+                job.update(
+                    progress=0.99 * done / total,
+                    message=f"Đã tạo {done}/{total} giọng đọc",
+                    details={"done": done},
                 )
-            finally:
-                if temp_path.exists():
-                    temp_path.unlink()
-
-        except Exception as exc:
-            errors.append(
-                {
-                    "subtitle_id": subtitle.get("id"),
-                    "error": str(exc),
-                }
-            )
+                job.raise_if_cancelled()
+        except JobCancelled:
+            for future in futures:
+                future.cancel()
+            pool.shutdown(wait=True)
+            # Clips of a cancelled batch are never handed to the frontend.
+            for future in futures:
+                generated = None if future.cancelled() else future.result().get("generated")
+                if generated:
+                    db.delete_file(generated["file_id"])
+            raise
+
+    generated_files = [result["generated"] for result in results if result.get("generated")]
+    errors = [result["error"] for result in results if result.get("error")]
+    _assign_tracks(generated_files, existing_audio_files)
 
     return {
         "status": "ok",
@@ -232,4 +264,71 @@ async def generate_batch_tts(project_id: str, payload: TTSBatchRequest) -> Dict[
         "generated": generated_files,
         "errors": errors,
         "voice": payload.voice,
+        "cached_count": sum(1 for generated in generated_files if generated["cached"]),
     }
+
+
+@router.post("/projects/{project_id}/tts/batch")
+async def generate_batch_tts(
+    project_id: str,
+    payload: TTSBatchRequest,
+    wait: bool = Query(True, description="Wait for the batch to finish and return its result"),
+) -> Dict[str, Any]:
+    project = db.get_project(project_id)
+    if project is None:
+        raise HTTPException(status_code=404, detail=f"Project not found: {project_id}")
+
+    project_files = project.get("files") or []
+    existing_audio_files = [
+        f for f in project_files if isinstance(f, dict) and f.get("type") == "audio"
+    ]
+
+    job = tts_jobs.submit(
+        lambda job: _batch_tts_job(job, project_id, payload, existing_audio_files),
+        project_id=project_id,
+        details={"subtitles_count": len(payload.subtitles), "voice": payload.voice},
+    )
+
+    if wait:
+        snapshot = await tts_jobs.wait(job.id)
+        if snapshot and snapshot.get("result"):
+            return snapshot["result"]
+        return {
+            "status": "error",
+            "message": (snapshot or {}).get("error") or f"TTS batch {(snapshot or {}).get('status', 'failed')}",
+            "job_id": job.id,
+        }
+
+    return {"status": "queued", "job_id": job.id, "message": "Tạo giọng đọc đã được đưa vào hàng đợi"}
+
+
+@router.get("/tts-jobs")
+def list_tts_jobs(project_id: Optional[str] = None, limit: int = Query(50, ge=1, le=500)) -> List[Dict[str, Any]]:
+    return tts_jobs.list_jobs(project_id=project_id, limit=limit)
+
+
+@router.get("/tts-jobs/{job_id}")
+def get_tts_job(job_id: str) -> Dict[str, Any]:
+    snapshot = tts_jobs.get(job_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail=f"TTS job not found: {job_id}")
+    return snapshot
+
+
+@router.post("/tts-jobs/{job_id}/cancel")
+def cancel_tts_job(job_id: str) -> Dict[str, Any]:
+    if tts_jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"TTS job not found: {job_id}")
+    cancelled = tts_jobs.cancel(job_id)
+    return {"status": "cancelling" if cancelled else "not-running", "job_id": job_id}
+
+
+@router.get("/tts-jobs/{job_id}/events")
+def stream_tts_job(job_id: str) -> StreamingResponse:
+    if tts_jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"TTS job not found: {job_id}")
+    return StreamingResponse(
+        tts_jobs.events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -5,7 +5,7 @@ from typing import Any, Dict, List
 
 from fastapi import APIRouter, HTTPException
 
-from app.core import DATA_ROOT, db
+from app.core import DATA_ROOT, db, media_info
 
 
 router = APIRouter(prefix="/projects/{project_id}/videos")
@@ -61,17 +61,16 @@ async def import_videos_from_folder(project_id: str) -> Dict[str, Any]:
         try:
             file_id = f"video-{project_id}-{dt.datetime.utcnow().timestamp()}-{video_file.stem}"
 
-            video_data = video_file.read_bytes()
-
             created_at = dt.datetime.utcnow().isoformat()
-            storage_path, file_size = db.save_file(
+            storage_path, file_size = db.save_file_from_path(
                 file_id=file_id,
                 project_id=project_id,
                 filename=video_file.name,
                 content_type="video/mp4" if video_file.suffix.lower() == ".mp4" else "video/*",
-                data=video_data,
+                source_path=video_file,
                 created_at=created_at,
             )
+            media_info.prefetch(file_id)
 
             imported_videos.append(
                 {
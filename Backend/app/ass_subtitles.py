@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import bisect
+from typing import Any, Dict, List, Optional, Tuple
+
+# ASS format reference resolution for subtitle rendering
+# All subtitle dimensions are specified relative to this resolution; libass
+# scales them to the actual frame size.
+REFERENCE_HEIGHT = 1080
+REFERENCE_WIDTH = 1920
+
+# Frontend SubtitleStyle defaults (see Frontend/types.ts).
+DEFAULT_STYLE: Dict[str, Any] = {
+    "fontFamily": "Arial",
+    "fontSize": 48,
+    "primaryColor": "#FFFFFF",
+    "outlineColor": "#000000",
+    "outlineWidth": 2.5,
+    "verticalMargin": 8,  # percentage of the frame height from the bottom
+    "horizontalAlign": "center",
+}
+
+DEFAULT_STYLE_NAME = "Default"
+
+# Bottom-row numpad alignment used by both the Style line and ``\an``.
+ALIGNMENTS = {"left": 1, "center": 2, "right": 3}
+
+SCRIPT_HEADER = f"""[Script Info]
+Title: Rendered Subtitles
+ScriptType: v4.00+
+WrapStyle: 0
+ScaledBorderAndShadow: yes
+PlayResX: {REFERENCE_WIDTH}
+PlayResY: {REFERENCE_HEIGHT}
+YCbCr Matrix: TV.709
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+"""
+
+EVENTS_HEADER = """
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+
+def srt_time_to_seconds(srt_time: str) -> float:
+    """``HH:MM:SS,mmm`` to seconds (0.0 if malformed)."""
+    parts = srt_time.replace(",", ".").split(":")
+    if len(parts) == 3:
+        h, m, s = parts
+        return float(h) * 3600 + float(m) * 60 + float(s)
+    return 0.0
+
+
+def seconds_to_srt_time(seconds: float) -> str:
+    millis = int(round(max(seconds, 0.0) * 1000))
+    h, rest = divmod(millis, 3_600_000)
+    m, rest = divmod(rest, 60_000)
+    s, ms = divmod(rest, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+
+
+def seconds_to_ass_time(seconds: float) -> str:
+    """Seconds to ASS ``H:MM:SS.cc`` (centisecond precision)."""
+    centis = int(round(max(seconds, 0.0) * 100))
+    h, rest = divmod(centis, 360_000)
+    m, rest = divmod(rest, 6_000)
+    s, cs = divmod(rest, 100)
+    return f"{h}:{m:02d}:{s:02d}.{cs:02d}"
+
+
+def srt_to_ass_time(srt_time: str) -> str:
+    """``HH:MM:SS,mmm`` to ASS time.
+
+    Well-formed SRT times are converted by slicing, which truncates to the
+    centisecond (under a third of a frame at 30 fps); anything else goes
+    through :func:`srt_time_to_seconds`.
+    """
+    if len(srt_time) == 12 and srt_time[2] == ":" and srt_time[5] == ":" and srt_time[8] in ",.":
+        return f"{int(srt_time[:2])}{srt_time[2:8]}.{srt_time[9:11]}"
+    return seconds_to_ass_time(srt_time_to_seconds(srt_time))
+
+
+def hex_to_ass(hex_color: str) -> str:
+    """``#RRGGBB`` to ASS ``&H00BBGGRR``."""
+    hex_color = hex_color.lstrip("#")
+    r, g, b = int(hex_color[0:2], 16), int(hex_color[2:4], 16), int(hex_color[4:6], 16)
+    return f"&H00{b:02X}{g:02X}{r:02X}"
+
+
+def normalize_style(style: Optional[Dict[str, Any]], base: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Only the keys that affect the ASS output, with defaults from *base*.
+
+    Other keys (e.g. the frame overlay's ``videoFrameUrl``) are dropped so
+    they neither end up in the document nor in its cache key; keys set to
+    None take the default like missing ones.
+    """
+    base = base or DEFAULT_STYLE
+    style = _set_keys(style)
+    return {key: style.get(key, base[key]) for key in DEFAULT_STYLE}
+
+
+def _set_keys(style: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    # The frontend sends ``null`` for fields it leaves at the default.
+    return {key: value for key, value in (style or {}).items() if value is not None}
+
+
+def _style_name(name: str) -> str:
+    # Commas separate fields in Style/Dialogue lines.
+    return name.replace(",", " ").strip() or DEFAULT_STYLE_NAME
+
+
+def _style_line(name: str, style: Dict[str, Any]) -> str:
+    """
+    ASS Format Parameters (all values documented):
+    - Fontname: Font family name (from style.fontFamily)
+    - Fontsize: Font size in pixels at reference resolution (from style.fontSize)
+    - PrimaryColour: Main text color (from style.primaryColor)
+    - SecondaryColour: Secondary color for karaoke effects (hardcoded, not used in preview)
+    - OutlineColour: Outline/border color (from style.outlineColor)
+    - BackColour: Shadow color (hardcoded with alpha, no shadow in preview)
+    - Bold: -1 for bold, 0 for normal (hardcoded to 0, matches frontend normal weight)
+    - Italic: -1 for italic, 0 for normal (hardcoded to 0, not supported in preview)
+    - Underline: -1 for underline, 0 for none (hardcoded to 0, not supported in preview)
+    - StrikeOut: -1 for strikeout, 0 for none (hardcoded to 0, not supported in preview)
+    - ScaleX: Horizontal scaling percentage (hardcoded to 100, no scaling in preview)
+    - ScaleY: Vertical scaling percentage (hardcoded to 100, no scaling in preview)
+    - Spacing: Letter spacing in pixels (hardcoded to 0, matches frontend letterSpacing='0px')
+    - Angle: Rotation angle in degrees (hardcoded to 0, not supported in preview)
+    - BorderStyle: 1=outline+shadow, 3=opaque box (hardcoded to 1, matches preview outline)
+    - Outline: Outline width in pixels (from style.outlineWidth)
+    - Shadow: Shadow depth in pixels (hardcoded to 0, no shadow rendered in preview)
+    - Alignment: Text alignment (from style.horizontalAlign: 1=left, 2=center, 3=right)
+    - MarginL: Left margin in pixels (hardcoded to 10)
+    - MarginR: Right margin in pixels (hardcoded to 10)
+    - MarginV: Vertical margin from bottom in pixels (calculated from style.verticalMargin percentage)
+    - Encoding: Character encoding (hardcoded to 1 = default)
+    """
+    return (
+        f"Style: {name},{style['fontFamily']},{style['fontSize']},{hex_to_ass(style['primaryColor'])},"
+        f"&H000000FF,{hex_to_ass(style['outlineColor'])},&H80000000,0,0,0,0,100,100,0,0,1,"
+        f"{style['outlineWidth']},0,{ALIGNMENTS.get(style['horizontalAlign'], 3)},10,10,"
+        f"{_vertical_margin(style['verticalMargin'])},1\n"
+    )
+
+
+def _vertical_margin(percent: float) -> int:
+    # Frontend: y = height * (1 - verticalMargin / 100), so the margin from the
+    # bottom at reference height is REFERENCE_HEIGHT * verticalMargin / 100.
+    return int(REFERENCE_HEIGHT * percent / 100)
+
+
+def _tag_color(hex_color: str) -> str:
+    # Override tags take ``&HBBGGRR&`` (no alpha byte).
+    return hex_to_ass(hex_color).replace("&H00", "&H", 1) + "&"
+
+
+def _override_tags(overrides: Dict[str, Any]) -> str:
+    """Inline ASS tags for a cue's ``styleOverrides`` (verticalMargin is
+    applied through the Dialogue line's MarginV field instead)."""
+    tags = []
+    if "fontFamily" in overrides:
+        tags.append(f"\\fn{overrides['fontFamily']}")
+    if "fontSize" in overrides:
+        tags.append(f"\\fs{overrides['fontSize']}")
+    if "primaryColor" in overrides:
+        tags.append(f"\\c{_tag_color(overrides['primaryColor'])}")
+    if "outlineColor" in overrides:
+        tags.append(f"\\3c{_tag_color(overrides['outlineColor'])}")
+    if "outlineWidth" in overrides:
+        tags.append(f"\\bord{overrides['outlineWidth']}")
+    if overrides.get("horizontalAlign") in ALIGNMENTS:
+        tags.append(f"\\an{ALIGNMENTS[overrides['horizontalAlign']]}")
+    return "{" + "".join(tags) + "}" if tags else ""
+
+
+def build_ass_document(
+    subtitles: List[Dict[str, Any]],
+    style: Optional[Dict[str, Any]] = None,
+    named_styles: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> str:
+    """ASS document for *subtitles* (frontend ``SubtitleBlock`` dicts).
+
+    *style* becomes the ``Default`` style; each entry of *named_styles* is
+    another style that inherits unset keys from it.  A cue picks a named style
+    with ``"style"`` and can tweak it further with ``"styleOverrides"``
+    (same keys as a style; None keeps the style's value).
+    """
+    default_style = normalize_style(style)
+    style_names = {DEFAULT_STYLE_NAME: DEFAULT_STYLE_NAME}
+    parts = [SCRIPT_HEADER, _style_line(DEFAULT_STYLE_NAME, default_style)]
+    for name, named_style in (named_styles or {}).items():
+        ass_name = _style_name(name)
+        if ass_name in style_names.values():
+            continue
+        style_names[name] = ass_name
+        parts.append(_style_line(ass_name, normalize_style(named_style, default_style)))
+    parts.append(EVENTS_HEADER)
+
+    for sub in subtitles:
+        # Frontend already adjusted times based on playback rates
+        start = srt_to_ass_time(sub.get("startTime", "00:00:00,000"))
+        end = srt_to_ass_time(sub.get("endTime", "00:00:00,000"))
+        text = sub.get("text", "").replace("\n", "\\N")
+        style_name = style_names.get(sub.get("style"), DEFAULT_STYLE_NAME)
+        overrides = _set_keys(sub.get("styleOverrides"))
+        if overrides:
+            margin_v = _vertical_margin(overrides["verticalMargin"]) if "verticalMargin" in overrides else 0
+            text = _override_tags(overrides) + text
+        else:
+            margin_v = 0
+        parts.append(f"Dialogue: 0,{start},{end},{style_name},,0,0,{margin_v},,{text}\n")
+    return "".join(parts)
+
+
+def ass_cache_parts(
+    subtitles: List[Dict[str, Any]],
+    style: Optional[Dict[str, Any]] = None,
+    named_styles: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """Everything :func:`build_ass_document` output depends on, for cache keys."""
+    return {
+        "kind": "ass",
+        "cues": [
+            [sub.get("startTime"), sub.get("endTime"), sub.get("text", ""), sub.get("style"), _set_keys(sub.get("styleOverrides"))]
+            for sub in subtitles
+        ],
+        "style": normalize_style(style),
+        "styles": {name: normalize_style(value, normalize_style(style)) for name, value in (named_styles or {}).items()},
+    }
+
+
+class CueIndex:
+    """Subtitles parsed once and sorted by start time, so windows of the
+    timeline (segments, chunks, previews) can be sliced without re-parsing
+    every cue for every window."""
+
+    def __init__(self, subtitles: List[Dict[str, Any]]) -> None:
+        parsed: List[Tuple[float, float, Dict[str, Any]]] = []
+        for sub in subtitles:
+            start = srt_time_to_seconds(sub.get("startTime", "00:00:00,000"))
+            end = srt_time_to_seconds(sub.get("endTime", "00:00:00,000"))
+            parsed.append((start, end, sub))
+        parsed.sort(key=lambda item: item[0])
+        self._cues = parsed
+        self._starts = [start for start, _end, _sub in parsed]
+        # Longest cue, to bound how far back a cue overlapping a window can start.
+        self._max_length = max((end - start for start, end, _sub in parsed), default=0.0)
+
+    def window(self, window_start: float, window_end: float) -> List[Dict[str, Any]]:
+        """Cues overlapping ``[window_start, window_end)``, shifted to window time."""
+        first = bisect.bisect_left(self._starts, window_start - self._max_length)
+        last = bisect.bisect_left(self._starts, window_end)
+        cues = []
+        for start, end, sub in self._cues[first:last]:
+            if end <= window_start:
+                continue
+            cue = {
+                "startTime": seconds_to_srt_time(max(start, window_start) - window_start),
+                "endTime": seconds_to_srt_time(min(end, window_end) - window_start),
+                "text": sub.get("text", ""),
+            }
+            for key in ("style", "styleOverrides"):
+                if sub.get(key):
+                    cue[key] = sub[key]
+            cues.append(cue)
+        return cues
+
+
+__all__ = [
+    "CueIndex",
+    "DEFAULT_STYLE",
+    "REFERENCE_HEIGHT",
+    "REFERENCE_WIDTH",
+    "ass_cache_parts",
+    "build_ass_document",
+    "hex_to_ass",
+    "normalize_style",
+    "seconds_to_ass_time",
+    "seconds_to_srt_time",
+    "srt_time_to_seconds",
+    "srt_to_ass_time",
+]
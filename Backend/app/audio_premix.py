@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import os
+import struct
+import subprocess
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+SAMPLE_RATE = 48000
+CHANNELS = 2
+# float32 samples
+SAMPLE_BYTES = 4
+FRAME_BYTES = CHANNELS * SAMPLE_BYTES
+
+# The timeline is summed and written this many seconds at a time, so memory
+# stays bounded by the clips overlapping one block rather than the whole
+# timeline.
+BLOCK_SECONDS = 10
+
+DECODE_WORKERS = min(8, os.cpu_count() or 2)
+
+
+class PremixError(Exception):
+    """ffmpeg could not decode one of the clips."""
+
+    def __init__(self, ffmpeg_cmd: List[str], stderr: str) -> None:
+        super().__init__(" ".join(ffmpeg_cmd))
+        self.ffmpeg_cmd = ffmpeg_cmd
+        self.stderr = stderr
+
+
+def decode_clip(ffmpeg_path: str, path: Path, trim_start: float = 0.0) -> np.ndarray:
+    """*path* as float32 PCM of shape ``(frames, CHANNELS)`` at SAMPLE_RATE,
+    starting *trim_start* seconds into the clip."""
+    cmd = [ffmpeg_path, "-v", "error", "-nostdin"]
+    if trim_start:
+        cmd.extend(["-ss", str(trim_start)])
+    cmd.extend(["-i", str(path), "-vn", "-f", "f32le", "-ac", str(CHANNELS), "-ar", str(SAMPLE_RATE), "-"])
+    result = subprocess.run(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    if result.returncode != 0:
+        raise PremixError(cmd, result.stderr.decode(errors="ignore"))
+    usable = len(result.stdout) - len(result.stdout) % FRAME_BYTES
+    return np.frombuffer(result.stdout[:usable], dtype="<f4").reshape(-1, CHANNELS)
+
+
+def _wav_header(frames: int) -> bytes:
+    """RIFF header for IEEE float PCM, so summed clips keep their headroom
+    instead of clipping before the final mix."""
+    data_bytes = frames * FRAME_BYTES
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",
+        36 + data_bytes,
+        b"WAVE",
+        b"fmt ",
+        16,
+        3,  # WAVE_FORMAT_IEEE_FLOAT
+        CHANNELS,
+        SAMPLE_RATE,
+        SAMPLE_RATE * FRAME_BYTES,
+        FRAME_BYTES,
+        SAMPLE_BYTES * 8,
+        b"data",
+        data_bytes,
+    )
+
+
+def premix_clips(
+    ffmpeg_path: str,
+    clips: List[Dict[str, Any]],
+    output_path: Path,
+    check: Optional[Callable[[], None]] = None,
+    workers: int = DECODE_WORKERS,
+) -> float:
+    """Sum *clips* into one float WAV at *output_path*; returns its length.
+
+    Each clip is ``{"path", "start_time", "volume_db", "trim_start"}`` with
+    times in seconds on the timeline.  Clips are decoded once, a few at a
+    time ahead of the write position, and added into the block they overlap.
+    *check* is called between blocks (e.g. to raise on cancellation).
+    """
+    order = sorted(clips, key=lambda clip: float(clip.get("start_time", 0) or 0))
+    block_frames = BLOCK_SECONDS * SAMPLE_RATE
+    prefetch = max(1, workers) * 2
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="premix") as pool, open(
+        output_path, "wb"
+    ) as out:
+        out.write(_wav_header(0))
+        queued: Deque[Tuple[int, float, Future]] = deque()
+        next_clip = 0
+
+        def fill_queue() -> None:
+            nonlocal next_clip
+            while next_clip < len(order) and len(queued) < prefetch:
+                clip = order[next_clip]
+                start_frame = int(round(max(float(clip.get("start_time", 0) or 0), 0.0) * SAMPLE_RATE))
+                gain = 10.0 ** (float(clip.get("volume_db", 0) or 0) / 20.0)
+                future = pool.submit(decode_clip, ffmpeg_path, clip["path"], float(clip.get("trim_start", 0) or 0))
+                queued.append((start_frame, gain, future))
+                next_clip += 1
+
+        # (start frame, samples) of decoded clips that reach the current block.
+        active: List[Tuple[int, np.ndarray]] = []
+        end_frame = 0
+        block_start = 0
+        try:
+            fill_queue()
+            while queued or active:
+                if check is not None:
+                    check()
+                block_end = block_start + block_frames
+                while queued and queued[0][0] < block_end:
+                    start_frame, gain, future = queued.popleft()
+                    samples = future.result()
+                    if gain != 1.0:
+                        samples = samples * np.float32(gain)
+                    active.append((start_frame, samples))
+                    end_frame = max(end_frame, start_frame + len(samples))
+                    fill_queue()
+
+                block = np.zeros((block_frames, CHANNELS), dtype=np.float32)
+                still_active = []
+                for start_frame, samples in active:
+                    lo = max(start_frame, block_start)
+                    hi = min(start_frame + len(samples), block_end)
+                    if hi > lo:
+                        block[lo - block_start : hi - block_start] += samples[lo - start_frame : hi - start_frame]
+                    if start_frame + len(samples) > block_end:
+                        still_active.append((start_frame, samples))
+                active = still_active
+                out.write(block.tobytes())
+                block_start = block_end
+        except BaseException:
+            for _start_frame, _gain, future in queued:
+                future.cancel()
+            raise
+
+        # The last block is written whole; cut the file back to the last clip.
+        out.truncate(len(_wav_header(0)) + end_frame * FRAME_BYTES)
+        out.seek(0)
+        out.write(_wav_header(end_frame))
+
+    return end_frame / SAMPLE_RATE
+
+
+__all__ = ["PremixError", "SAMPLE_RATE", "decode_clip", "premix_clips"]
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import BinaryIO, Iterable, Optional, Tuple
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class BlobStore:
+    """Content-addressed object store for uploaded and generated media.
+
+    Objects live at ``{root}/{digest[:2]}/{digest}`` where ``digest`` is the
+    SHA-256 of the payload, so identical files share one object on disk.
+    Reference counting is owned by :class:`app.db.Database`; this class only
+    deals with the filesystem side.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self._root = root
+        self._tmp_root = root / "tmp"
+        self._tmp_root.mkdir(parents=True, exist_ok=True)
+        self.uploads_root = root / "uploads"
+        # Serialises "place object" with "unlink object" so a concurrent save
+        # of the same digest can never race a delete that just hit zero refs.
+        self.lock = threading.RLock()
+
+    @property
+    def root(self) -> Path:
+        return self._root
+
+    def path_for(self, digest: str) -> Path:
+        return self._root / digest[:2] / digest
+
+    def exists(self, digest: str) -> bool:
+        return self.path_for(digest).exists()
+
+    # --- Spooling ---------------------------------------------------------------
+    def spool_chunks(self, chunks: Iterable[bytes]) -> Tuple[Path, str, int]:
+        """Write *chunks* to a temporary file while hashing them.
+
+        Returns ``(temp_path, digest, size)``; the caller is expected to hand
+        the temp file to :meth:`commit` (or delete it).
+        """
+
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_name = tempfile.mkstemp(dir=self._tmp_root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in chunks:
+                    if not chunk:
+                        continue
+                    hasher.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        return Path(tmp_name), hasher.hexdigest(), size
+
+    def spool_bytes(self, data: bytes) -> Tuple[Path, str, int]:
+        return self.spool_chunks([bytes(data)])
+
+    def spool_stream(self, stream: BinaryIO) -> Tuple[Path, str, int]:
+        return self.spool_chunks(iter(lambda: stream.read(CHUNK_SIZE), b""))
+
+    def spool_path(self, source: Path, *, move: bool = False) -> Tuple[Path, str, int]:
+        """Hash *source* and stage it for :meth:`commit`.
+
+        With ``move=True`` the source is renamed into the staging area when it
+        lives on the same filesystem, avoiding a second full copy.
+        """
+
+        if move:
+            digest, size = hash_file(source)
+            fd, tmp_name = tempfile.mkstemp(dir=self._tmp_root, suffix=".part")
+            os.close(fd)
+            try:
+                os.replace(source, tmp_name)
+            except OSError:
+                # Cross-device: fall back to copy + unlink.
+                shutil.copyfile(source, tmp_name)
+                source.unlink(missing_ok=True)
+            return Path(tmp_name), digest, size
+
+        with open(source, "rb") as handle:
+            return self.spool_stream(handle)
+
+    def commit(self, temp_path: Path, digest: str) -> Path:
+        """Move a spooled temp file into place, or drop it if already stored.
+
+        Must be called with :attr:`lock` held together with the reference
+        count update.
+        """
+
+        target = self.path_for(digest)
+        if target.exists():
+            temp_path.unlink(missing_ok=True)
+            return target
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temp_path, target)
+        return target
+
+    def discard(self, temp_path: Optional[Path]) -> None:
+        if temp_path is not None:
+            temp_path.unlink(missing_ok=True)
+
+    def remove(self, digest: str) -> None:
+        """Delete an object whose reference count dropped to zero."""
+
+        try:
+            self.path_for(digest).unlink()
+        except FileNotFoundError:
+            pass
+
+
+def hash_file(path: Path) -> Tuple[str, int]:
+    """Return ``(sha256 hex digest, size)`` of *path*, read in fixed chunks."""
+
+    hasher = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+            size += len(chunk)
+    return hasher.hexdigest(), size
+
+
+__all__ = ["BlobStore", "CHUNK_SIZE", "hash_file"]
@@ -3,6 +3,6 @@
 from __future__ import annotations
 
 from .config import APP_ROOT, DATA_ROOT, DB_PATH
-from .database import db
+from .database import db, media_info
 
-__all__ = ["APP_ROOT", "DATA_ROOT", "DB_PATH", "db"]
+__all__ = ["APP_ROOT", "DATA_ROOT", "DB_PATH", "db", "media_info"]
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 from pathlib import Path
 
 
@@ -14,3 +15,49 @@ DATA_ROOT = APP_ROOT / "data"
 DB_PATH = DATA_ROOT / "app.db"
 
 DATA_ROOT.mkdir(parents=True, exist_ok=True)
+
+# Resumable uploads with no new part for this long are abandoned: their
+# sessions and part files are removed at startup.  Override with
+# UPLOAD_SESSION_TTL_HOURS.
+UPLOAD_SESSION_TTL_SECONDS = float(os.environ.get("UPLOAD_SESSION_TTL_HOURS") or 24) * 3600
+
+# Each ffmpeg render already uses several threads, so only run a fraction of
+# the cores' worth of renders at once.  Override with RENDER_MAX_CONCURRENCY.
+RENDER_MAX_CONCURRENCY = int(
+    os.environ.get("RENDER_MAX_CONCURRENCY") or max(1, (os.cpu_count() or 2) // 4)
+)
+
+# Segment renders and mixed audio are cached under data/render_cache so an
+# edit only re-encodes the parts it touched.  Override with RENDER_CACHE_MAX_GB.
+RENDER_CACHE_ROOT = DATA_ROOT / "render_cache"
+RENDER_CACHE_MAX_BYTES = int(float(os.environ.get("RENDER_CACHE_MAX_GB") or 10) * 1024**3)
+
+# ffmpeg processes a "parallel" render runs at once; by default the cores are
+# split between the renders allowed to run concurrently.
+RENDER_PARALLEL_WORKERS = int(
+    os.environ.get("RENDER_PARALLEL_WORKERS") or max(1, (os.cpu_count() or 2) // RENDER_MAX_CONCURRENCY)
+)
+
+# Batch TTS jobs run at once, subtitles each job synthesizes in parallel, and
+# requests per second sent with any one TikTok session id.  Override with
+# TTS_MAX_CONCURRENCY, TTS_BATCH_WORKERS and TTS_SESSION_RATE_LIMIT.
+TTS_MAX_CONCURRENCY = int(os.environ.get("TTS_MAX_CONCURRENCY") or 2)
+TTS_BATCH_WORKERS = int(os.environ.get("TTS_BATCH_WORKERS") or 4)
+TTS_SESSION_RATE_LIMIT = float(os.environ.get("TTS_SESSION_RATE_LIMIT") or 4)
+
+# Synthesized TTS audio is cached under data/tts_cache by voice and text, so
+# unchanged lines are not sent to TikTok again.  Override with TTS_CACHE_MAX_MB.
+TTS_CACHE_ROOT = DATA_ROOT / "tts_cache"
+TTS_CACHE_MAX_BYTES = int(float(os.environ.get("TTS_CACHE_MAX_MB") or 1024) * 1024**2)
+
+# Project ASR jobs run at once, and the shared pools every job feeds: ffmpeg
+# audio extraction (CPU bound) and Bcut uploads/polling (network bound).
+# Override with ASR_MAX_CONCURRENCY, ASR_CONVERT_WORKERS and ASR_BCUT_WORKERS.
+ASR_MAX_CONCURRENCY = int(os.environ.get("ASR_MAX_CONCURRENCY") or 2)
+ASR_CONVERT_WORKERS = int(os.environ.get("ASR_CONVERT_WORKERS") or max(1, (os.cpu_count() or 2) // 2))
+ASR_BCUT_WORKERS = int(os.environ.get("ASR_BCUT_WORKERS") or 4)
+
+# Speech-ready audio (mono 16 kHz MP3) extracted for ASR is cached under
+# data/asr_audio_cache by source content hash.  Override with ASR_AUDIO_CACHE_MAX_MB.
+ASR_AUDIO_CACHE_ROOT = DATA_ROOT / "asr_audio_cache"
+ASR_AUDIO_CACHE_MAX_BYTES = int(float(os.environ.get("ASR_AUDIO_CACHE_MAX_MB") or 2048) * 1024**2)
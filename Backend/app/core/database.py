@@ -1,7 +1,10 @@
 from __future__ import annotations
 
 from app.db import Database
-from app.core.config import DB_PATH
+from app.core.config import DB_PATH, UPLOAD_SESSION_TTL_SECONDS
+from app.media_info import MediaInfoService
 
 
 db = Database(DB_PATH)
+db.expire_upload_sessions(UPLOAD_SESSION_TTL_SECONDS)
+media_info = MediaInfoService(db)
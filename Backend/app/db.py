@@ -1,9 +1,98 @@
 from __future__ import annotations
 
+import datetime as dt
 import json
+import logging
+import shutil
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import Any, ContextManager, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.blob_store import BlobStore
+
+logger = logging.getLogger(__name__)
+
+
+# Per-connection tuning.  WAL lets readers run while the single writer
+# commits; synchronous=NORMAL is durable across application crashes in WAL
+# mode and only risks the last transactions on power loss.
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -32000",  # KiB, i.e. ~32 MB page cache per connection
+    "PRAGMA mmap_size = 268435456",  # 256 MB
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+)
+STATEMENT_CACHE_SIZE = 256
+
+
+class ConnectionPool:
+    """Long-lived SQLite connections: one per reader thread plus a single writer.
+
+    Connections stay open for the lifetime of the process so the sqlite3
+    module's per-connection statement cache keeps prepared statements warm.
+    All writes are funnelled through one connection guarded by a lock, which
+    matches SQLite's single-writer model instead of having many connections
+    fight over the database lock.
+    """
+
+    def __init__(self, db_path: Path) -> None:
+        self._db_path = db_path
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._writer_lock = threading.RLock()
+        self._writer_conn: Optional[sqlite3.Connection] = None
+
+    def open_connection(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self._db_path,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self.open_connection()
+            conn.execute("PRAGMA query_only = ON")
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        yield conn
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        with self._writer_lock:
+            if self._writer_conn is None:
+                self._writer_conn = self.open_connection()
+            conn = self._writer_conn
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+
+    def close(self) -> None:
+        with self._writer_lock:
+            if self._writer_conn is not None:
+                self._writer_conn.close()
+                self._writer_conn = None
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+        self._local = threading.local()
 
 
 class Database:
@@ -13,15 +102,28 @@ class Database:
         self._db_path = db_path
         self._db_path.parent.mkdir(parents=True, exist_ok=True)
         self._data_root = self._db_path.parent  # data/ folder
+        self._blobs = BlobStore(self._data_root / "blobs")
+        self._pool = ConnectionPool(self._db_path)
         self._init_db()
+        self.migrate_legacy_files()
 
-    def _connect(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self._db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+    def _reader(self) -> ContextManager[sqlite3.Connection]:
+        """Connection for read-only queries, reused per thread."""
+        return self._pool.reader()
+
+    def _writer(self) -> ContextManager[sqlite3.Connection]:
+        """The shared write connection; commits on success, rolls back on error."""
+        return self._pool.writer()
+
+    def close(self) -> None:
+        self._pool.close()
 
     def _init_db(self) -> None:
-        with self._connect() as conn:
+        # Schema setup runs on a throwaway connection so the foreign_keys pragma
+        # below does not leak into the pooled connections.
+        conn = self._pool.open_connection()
+        try:
+            conn.execute("PRAGMA journal_mode = WAL")
             conn.executescript(
                 """
                 PRAGMA foreign_keys = ON;
@@ -53,9 +155,80 @@ class Database:
                     created_at TEXT NOT NULL,
                     storage_path TEXT,
                     file_size INTEGER,
+                    content_hash TEXT,
                     FOREIGN KEY(project_id) REFERENCES projects(id) ON DELETE CASCADE
                 );
 
+                CREATE TABLE IF NOT EXISTS upload_sessions (
+                    id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    project_id TEXT,
+                    status TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                );
+
+                CREATE INDEX IF NOT EXISTS idx_jobs_kind_created ON jobs(kind, created_at);
+
+                CREATE TABLE IF NOT EXISTS render_jobs (
+                    id TEXT PRIMARY KEY,
+                    project_id TEXT,
+                    status TEXT NOT NULL,
+                    render_mode TEXT,
+                    profile TEXT,
+                    input_hashes TEXT,
+                    filter_graph TEXT,
+                    wall_time_seconds REAL,
+                    encode_fps REAL,
+                    encoded_frames INTEGER,
+                    output_duration_seconds REAL,
+                    output_size INTEGER,
+                    segments_total INTEGER,
+                    segments_cached INTEGER,
+                    exit_code INTEGER,
+                    stderr_tail TEXT,
+                    log_file TEXT,
+                    created_at TEXT NOT NULL,
+                    finished_at TEXT
+                );
+
+                CREATE INDEX IF NOT EXISTS idx_render_jobs_created ON render_jobs(created_at);
+                CREATE INDEX IF NOT EXISTS idx_render_jobs_project_created ON render_jobs(project_id, created_at);
+
+                CREATE TABLE IF NOT EXISTS media_info (
+                    content_hash TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    info TEXT,
+                    keyframes TEXT,
+                    probed_at TEXT NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS tts_cache (
+                    key TEXT PRIMARY KEY,
+                    voice TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    duration_ms INTEGER,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    created_at TEXT NOT NULL,
+                    last_used_at TEXT NOT NULL
+                );
+
+                CREATE INDEX IF NOT EXISTS idx_tts_cache_last_used ON tts_cache(last_used_at);
+
+                CREATE TABLE IF NOT EXISTS blobs (
+                    hash TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    ref_count INTEGER NOT NULL,
+                    created_at TEXT NOT NULL
+                );
+
                 CREATE TABLE IF NOT EXISTS channel_lists (
                     id TEXT PRIMARY KEY,
                     data TEXT NOT NULL,
@@ -86,6 +259,9 @@ class Database:
                 """
             )
             self._ensure_file_columns(conn)
+            conn.commit()
+        finally:
+            conn.close()
 
     def _ensure_file_columns(self, conn: sqlite3.Connection) -> None:
         """Ensure newer metadata columns exist for the files table."""
@@ -99,7 +275,11 @@ class Database:
 
         _add_column("storage_path", "TEXT")
         _add_column("file_size", "INTEGER")
-        
+        _add_column("content_hash", "TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_files_content_hash ON files(content_hash)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_files_project_id ON files(project_id)")
+
+
         # Ensure scanned_videos table has downloaded column
         try:
             conn.execute("ALTER TABLE scanned_videos ADD COLUMN downloaded INTEGER DEFAULT 0")
@@ -109,7 +289,7 @@ class Database:
 
     # --- Projects -----------------------------------------------------------------
     def list_projects(self) -> List[Dict[str, Any]]:
-        with self._connect() as conn:
+        with self._reader() as conn:
             rows = conn.execute("SELECT data FROM projects ORDER BY updated_at DESC").fetchall()
         return [json.loads(row["data"]) for row in rows]
 
@@ -118,20 +298,18 @@ class Database:
         if not project_id:
             raise ValueError("Project payload is missing an 'id'")
 
-        with self._connect() as conn:
+        with self._writer() as conn:
             conn.execute(
                 "REPLACE INTO projects (id, data, updated_at) VALUES (?, ?, ?)",
                 (project_id, json.dumps(project), updated_at),
             )
-            conn.commit()
 
     def delete_project(self, project_id: str) -> None:
-        with self._connect() as conn:
+        with self._writer() as conn:
             conn.execute("DELETE FROM projects WHERE id = ?", (project_id,))
-            conn.commit()
 
     def get_project(self, project_id: str) -> Optional[Dict[str, Any]]:
-        with self._connect() as conn:
+        with self._reader() as conn:
             row = conn.execute(
                 "SELECT data FROM projects WHERE id = ?",
                 (project_id,),
@@ -142,41 +320,43 @@ class Database:
 
     # --- API keys ------------------------------------------------------------------
     def list_api_keys(self) -> List[Dict[str, Any]]:
-        with self._connect() as conn:
+        with self._reader() as conn:
             rows = conn.execute("SELECT data FROM api_keys ORDER BY updated_at DESC").fetchall()
         return [json.loads(row["data"]) for row in rows]
 
     def replace_api_keys(self, keys: Iterable[Dict[str, Any]], updated_at: str) -> None:
         serialized = [(key.get("id"), json.dumps(key)) for key in keys]
 
-        with self._connect() as conn:
+        with self._writer() as conn:
             conn.execute("DELETE FROM api_keys")
             if serialized:
                 conn.executemany(
                     "INSERT INTO api_keys (id, data, updated_at) VALUES (?, ?, ?)",
                     [(key_id or "", payload, updated_at) for key_id, payload in serialized],
                 )
-            conn.commit()
 
     # --- Custom styles -------------------------------------------------------------
     def list_custom_styles(self) -> List[Dict[str, Any]]:
-        with self._connect() as conn:
+        with self._reader() as conn:
             rows = conn.execute("SELECT data FROM custom_styles ORDER BY updated_at DESC").fetchall()
         return [json.loads(row["data"]) for row in rows]
 
     def replace_custom_styles(self, styles: Iterable[Dict[str, Any]], updated_at: str) -> None:
         serialized = [(style.get("id"), json.dumps(style)) for style in styles]
 
-        with self._connect() as conn:
+        with self._writer() as conn:
             conn.execute("DELETE FROM custom_styles")
             if serialized:
                 conn.executemany(
                     "INSERT INTO custom_styles (id, data, updated_at) VALUES (?, ?, ?)",
                     [(style_id or "", payload, updated_at) for style_id, payload in serialized],
                 )
-            conn.commit()
 
     # --- Files ---------------------------------------------------------------------
+    # File payloads live in the content-addressed blob store (data/blobs/); the
+    # ``files`` table only keeps metadata plus the object's hash.  The legacy
+    # ``data`` BLOB column is NOT NULL in old databases, so new rows store an
+    # empty blob there and ``migrate_legacy_files`` drains pre-existing ones.
     def save_file(
         self,
         file_id: str,
@@ -189,54 +369,241 @@ class Database:
         if not file_id:
             raise ValueError("File ID must be provided")
 
-        # Persist file on disk: data/{project_id}/files/{filename}
-        # Use filename parameter for the actual file, sanitize it for safety
-        safe_filename = Path(filename).name
-        project_folder = project_id or "unassigned"
-        target_dir = self._data_root / project_folder / "files"
-        target_dir.mkdir(parents=True, exist_ok=True)
-        storage_path = target_dir / safe_filename
-        storage_path.write_bytes(data)
-        file_size = storage_path.stat().st_size
-
-        with self._connect() as conn:
+        temp_path, digest, size = self._blobs.spool_bytes(data)
+        return self._store_spooled_file(
+            file_id, project_id, filename, content_type, created_at, temp_path, digest, size
+        )
+
+    def save_file_from_path(
+        self,
+        file_id: str,
+        project_id: Optional[str],
+        filename: str,
+        content_type: Optional[str],
+        source_path: Path,
+        created_at: str,
+        *,
+        move: bool = False,
+    ) -> Tuple[Path, int]:
+        """Store a file that already exists on disk without loading it into memory.
+
+        With ``move=True`` the source file is consumed (renamed into the blob
+        store when possible), which is what freshly downloaded files want.
+        """
+        if not file_id:
+            raise ValueError("File ID must be provided")
+
+        temp_path, digest, size = self._blobs.spool_path(Path(source_path), move=move)
+        return self._store_spooled_file(
+            file_id, project_id, filename, content_type, created_at, temp_path, digest, size
+        )
+
+    def save_file_from_chunks(
+        self,
+        file_id: str,
+        project_id: Optional[str],
+        filename: str,
+        content_type: Optional[str],
+        chunks: Iterable[bytes],
+        created_at: str,
+    ) -> Tuple[Path, int]:
+        """Store a file from an iterable of byte chunks, hashing while spooling to disk."""
+        if not file_id:
+            raise ValueError("File ID must be provided")
+
+        temp_path, digest, size = self._blobs.spool_chunks(chunks)
+        return self._store_spooled_file(
+            file_id, project_id, filename, content_type, created_at, temp_path, digest, size
+        )
+
+    def upload_parts_dir(self, upload_id: str) -> Path:
+        return self._blobs.uploads_root / Path(upload_id).name
+
+    # --- Upload sessions ----------------------------------------------------------
+    def save_upload_session(self, session: Dict[str, Any], created_at: str) -> None:
+        upload_id = session.get("id")
+        if not upload_id:
+            raise ValueError("Upload session is missing an 'id'")
+
+        with self._writer() as conn:
             conn.execute(
-                "REPLACE INTO files (id, project_id, filename, content_type, data, created_at, storage_path, file_size)"
-                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                (
-                    file_id,
-                    project_id,
-                    filename,
-                    content_type,
-                    data,
-                    created_at,
-                    str(storage_path),
-                    file_size,
-                ),
+                "REPLACE INTO upload_sessions (id, data, created_at) VALUES (?, ?, ?)",
+                (upload_id, json.dumps(session), created_at),
             )
-            conn.commit()
+
+    def get_upload_session(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        with self._reader() as conn:
+            row = conn.execute(
+                "SELECT data FROM upload_sessions WHERE id = ?",
+                (upload_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row["data"])
+
+    def delete_upload_session(self, upload_id: str) -> None:
+        with self._writer() as conn:
+            conn.execute("DELETE FROM upload_sessions WHERE id = ?", (upload_id,))
+        shutil.rmtree(self.upload_parts_dir(upload_id), ignore_errors=True)
+
+    def _upload_activity(self, upload_id: str) -> float:
+        """Epoch time a part was last written for *upload_id* (0 if none)."""
+        parts_dir = self.upload_parts_dir(upload_id)
+        try:
+            paths = [parts_dir, *parts_dir.iterdir()]
+        except OSError:
+            return 0.0
+        latest = 0.0
+        for path in paths:
+            try:
+                latest = max(latest, path.stat().st_mtime)
+            except OSError:
+                continue
+        return latest
+
+    def expire_upload_sessions(self, max_age: float, now: Optional[float] = None) -> List[str]:
+        """Remove upload sessions, and part directories left without a
+        session, that saw no activity (creation or a written part) in the
+        last *max_age* seconds.  Returns the removed upload ids."""
+        cutoff = (time.time() if now is None else now) - max_age
+        with self._reader() as conn:
+            rows = conn.execute("SELECT id, created_at FROM upload_sessions").fetchall()
+
+        expired: List[str] = []
+        for row in rows:
+            try:
+                created = dt.datetime.fromisoformat(row["created_at"]).replace(tzinfo=dt.timezone.utc).timestamp()
+            except (TypeError, ValueError):
+                created = 0.0
+            if max(created, self._upload_activity(row["id"])) < cutoff:
+                self.delete_upload_session(row["id"])
+                expired.append(row["id"])
+
+        known = {row["id"] for row in rows}
+        uploads_root = self._blobs.uploads_root
+        orphans = [path for path in uploads_root.iterdir() if path.is_dir()] if uploads_root.is_dir() else []
+        for path in orphans:
+            if path.name not in known and self._upload_activity(path.name) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                expired.append(path.name)
+        if expired:
+            logger.info("Removed %d abandoned upload session(s)", len(expired))
+        return expired
+
+    def _store_spooled_file(
+        self,
+        file_id: str,
+        project_id: Optional[str],
+        filename: str,
+        content_type: Optional[str],
+        created_at: str,
+        temp_path: Path,
+        digest: str,
+        file_size: int,
+    ) -> Tuple[Path, int]:
+        released: List[str] = []
+        with self._blobs.lock:
+            try:
+                storage_path = self._blobs.commit(temp_path, digest)
+            except BaseException:
+                self._blobs.discard(temp_path)
+                raise
+
+            with self._writer() as conn:
+                previous = conn.execute(
+                    "SELECT content_hash FROM files WHERE id = ?",
+                    (file_id,),
+                ).fetchone()
+                self._acquire_blob(conn, digest, file_size, created_at)
+                conn.execute(
+                    "REPLACE INTO files"
+                    " (id, project_id, filename, content_type, data, created_at, storage_path, file_size, content_hash)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        file_id,
+                        project_id,
+                        filename,
+                        content_type,
+                        b"",
+                        created_at,
+                        str(storage_path),
+                        file_size,
+                        digest,
+                    ),
+                )
+                if previous is not None and previous["content_hash"]:
+                    released.extend(self._release_blobs(conn, [previous["content_hash"]]))
+
+            for released_digest in released:
+                self._blobs.remove(released_digest)
 
         return storage_path, file_size
 
+    def _acquire_blob(self, conn: sqlite3.Connection, digest: str, size: int, created_at: str) -> None:
+        conn.execute(
+            "INSERT INTO blobs (hash, size, ref_count, created_at) VALUES (?, ?, 1, ?)"
+            " ON CONFLICT(hash) DO UPDATE SET ref_count = ref_count + 1",
+            (digest, size, created_at),
+        )
+
+    def _release_blobs(self, conn: sqlite3.Connection, digests: Iterable[str]) -> List[str]:
+        """Drop one reference per digest and return the digests that became unreferenced."""
+        orphaned: List[str] = []
+        for digest in digests:
+            conn.execute("UPDATE blobs SET ref_count = ref_count - 1 WHERE hash = ?", (digest,))
+            row = conn.execute("SELECT ref_count FROM blobs WHERE hash = ?", (digest,)).fetchone()
+            if row is not None and row["ref_count"] <= 0:
+                conn.execute("DELETE FROM blobs WHERE hash = ?", (digest,))
+                conn.execute("DELETE FROM media_info WHERE content_hash = ?", (digest,))
+                orphaned.append(digest)
+        return orphaned
+
     def get_file(self, file_id: str) -> Optional[Tuple[bytes, Optional[str], str]]:
-        with self._connect() as conn:
+        """Return ``(data, content_type, filename)``, or ``None`` for unknown IDs
+        and for blob-store rows whose blob file is missing on disk."""
+        with self._reader() as conn:
             row = conn.execute(
-                "SELECT data, content_type, filename, storage_path FROM files WHERE id = ?",
+                "SELECT content_type, filename, storage_path, content_hash FROM files WHERE id = ?",
                 (file_id,),
             ).fetchone()
-        if row is None:
+            if row is None:
+                return None
+            storage_path = row["storage_path"]
+            if storage_path:
+                path = Path(storage_path)
+                if path.exists():
+                    return path.read_bytes(), row["content_type"], row["filename"]
+            if row["content_hash"]:
+                # The payload only ever lived in the blob store; the BLOB column
+                # holds an empty placeholder, not the file.
+                logger.warning("Blob file for %s is missing: %s", file_id, storage_path)
+                return None
+            # Legacy row that has not been migrated into the blob store yet.
+            legacy = conn.execute("SELECT data FROM files WHERE id = ?", (file_id,)).fetchone()
+        return legacy["data"], row["content_type"], row["filename"]
+
+    def get_file_path(self, file_id: str) -> Optional[Tuple[Path, Optional[str], str]]:
+        """Return ``(path, content_type, filename)`` when the file exists on disk.
+
+        Returns ``None`` for unknown IDs and for legacy rows whose payload only
+        lives in the BLOB column; callers fall back to :meth:`get_file` then.
+        """
+        with self._reader() as conn:
+            row = conn.execute(
+                "SELECT content_type, filename, storage_path FROM files WHERE id = ?",
+                (file_id,),
+            ).fetchone()
+        if row is None or not row["storage_path"]:
             return None
-        storage_path = row["storage_path"]
-        if storage_path:
-            path = Path(storage_path)
-            if path.exists():
-                return path.read_bytes(), row["content_type"], row["filename"]
-        return row["data"], row["content_type"], row["filename"]
+        path = Path(row["storage_path"])
+        if not path.is_file():
+            return None
+        return path, row["content_type"], row["filename"]
 
     def get_file_metadata(self, file_id: str) -> Optional[Dict[str, Any]]:
-        with self._connect() as conn:
+        with self._reader() as conn:
             row = conn.execute(
-                "SELECT id, project_id, filename, content_type, created_at, storage_path, file_size"
+                "SELECT id, project_id, filename, content_type, created_at, storage_path, file_size, content_hash"
                 " FROM files WHERE id = ?",
                 (file_id,),
             ).fetchone()
@@ -250,48 +617,374 @@ class Database:
             "created_at": row["created_at"],
             "storage_path": row["storage_path"],
             "file_size": row["file_size"],
+            "content_hash": row["content_hash"],
         }
 
     def delete_file(self, file_id: str) -> None:
-        storage_path: Optional[str] = None
-        with self._connect() as conn:
-            row = conn.execute(
-                "SELECT storage_path FROM files WHERE id = ?",
-                (file_id,),
-            ).fetchone()
-            if row is not None:
-                storage_path = row["storage_path"]
-            conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
-            conn.commit()
+        self._delete_file_rows("id = ?", (file_id,))
+
+    def delete_files_for_project(self, project_id: str) -> None:
+        self._delete_file_rows("project_id = ?", (project_id,))
 
-        if storage_path:
+    def _delete_file_rows(self, where: str, params: Tuple[Any, ...]) -> None:
+        with self._blobs.lock:
+            with self._writer() as conn:
+                rows = conn.execute(
+                    f"SELECT storage_path, content_hash FROM files WHERE {where}",
+                    params,
+                ).fetchall()
+                conn.execute(f"DELETE FROM files WHERE {where}", params)
+                orphaned = self._release_blobs(
+                    conn, [row["content_hash"] for row in rows if row["content_hash"]]
+                )
+            for digest in orphaned:
+                self._blobs.remove(digest)
+
+        # Rows written before the blob store owned their own file on disk.
+        legacy_paths = [
+            row["storage_path"] for row in rows if row["storage_path"] and not row["content_hash"]
+        ]
+        for storage_path in legacy_paths:
             path = Path(storage_path)
             try:
                 path.unlink()
             except FileNotFoundError:
                 pass
 
-    def delete_files_for_project(self, project_id: str) -> None:
-        storage_paths: List[str] = []
-        with self._connect() as conn:
+    def migrate_legacy_files(self) -> int:
+        """Move rows still carrying an inline ``data`` BLOB into the blob store.
+
+        Runs on startup and is a no-op once every row has a ``content_hash``.
+        The per-project copy that old versions also wrote to disk is removed
+        afterwards and the database is VACUUMed to give the space back.
+        Returns the number of migrated rows.
+        """
+        with self._reader() as conn:
+            pending = [
+                row["id"]
+                for row in conn.execute("SELECT id FROM files WHERE content_hash IS NULL").fetchall()
+            ]
+        if not pending:
+            return 0
+
+        migrated = 0
+        legacy_paths: List[Path] = []
+        for file_id in pending:
+            with self._reader() as conn:
+                row = conn.execute(
+                    "SELECT data, storage_path, created_at FROM files WHERE id = ?",
+                    (file_id,),
+                ).fetchone()
+            if row is None:
+                continue
+
+            # Prefer the BLOB: old versions wrote data/{project}/files/{filename},
+            # so two uploads with the same name overwrote each other on disk.
+            legacy_path = Path(row["storage_path"]) if row["storage_path"] else None
+            created_at = row["created_at"]
+            try:
+                if row["data"]:
+                    spooled = self._blobs.spool_bytes(row["data"])
+                elif legacy_path is not None and legacy_path.is_file():
+                    spooled = self._blobs.spool_path(legacy_path)
+                else:
+                    continue
+            except OSError as exc:
+                logger.warning("Could not migrate file %s into the blob store: %s", file_id, exc)
+                continue
+            del row
+
+            temp_path, digest, size = spooled
+            with self._blobs.lock:
+                storage_path = self._blobs.commit(temp_path, digest)
+                with self._writer() as conn:
+                    self._acquire_blob(conn, digest, size, created_at)
+                    conn.execute(
+                        "UPDATE files SET data = ?, storage_path = ?, file_size = ?, content_hash = ?"
+                        " WHERE id = ?",
+                        (b"", str(storage_path), size, digest, file_id),
+                    )
+            if legacy_path is not None:
+                legacy_paths.append(legacy_path)
+            migrated += 1
+
+        with self._reader() as conn:
+            for path in legacy_paths:
+                still_used = conn.execute(
+                    "SELECT 1 FROM files WHERE storage_path = ? LIMIT 1",
+                    (str(path),),
+                ).fetchone()
+                if still_used is None:
+                    path.unlink(missing_ok=True)
+
+        if migrated:
+            with self._writer() as conn:
+                conn.execute("VACUUM")
+            logger.info("Migrated %d stored files into the blob store", migrated)
+        return migrated
+
+    # --- Background jobs ----------------------------------------------------------
+    def save_job(self, job: Dict[str, Any], updated_at: str) -> None:
+        job_id = job.get("id")
+        if not job_id:
+            raise ValueError("Job is missing an 'id'")
+
+        with self._writer() as conn:
+            conn.execute(
+                "REPLACE INTO jobs (id, kind, project_id, status, data, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job_id,
+                    job.get("kind", ""),
+                    job.get("project_id"),
+                    job.get("status", ""),
+                    json.dumps(job),
+                    job.get("created_at") or updated_at,
+                    updated_at,
+                ),
+            )
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._reader() as conn:
+            row = conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row["data"])
+
+    def list_jobs(self, kind: str, project_id: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._reader() as conn:
+            if project_id:
+                rows = conn.execute(
+                    "SELECT data FROM jobs WHERE kind = ? AND project_id = ? ORDER BY created_at DESC LIMIT ?",
+                    (kind, project_id, limit),
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT data FROM jobs WHERE kind = ? ORDER BY created_at DESC LIMIT ?",
+                    (kind, limit),
+                ).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def mark_interrupted_jobs(self, kind: str, updated_at: str) -> None:
+        """Flag jobs a previous process left queued or running as interrupted."""
+        with self._writer() as conn:
             rows = conn.execute(
-                "SELECT storage_path FROM files WHERE project_id = ?",
-                (project_id,),
+                "SELECT id, data FROM jobs WHERE kind = ? AND status IN ('queued', 'running')",
+                (kind,),
             ).fetchall()
-            storage_paths = [row["storage_path"] for row in rows if row["storage_path"]]
-            conn.execute("DELETE FROM files WHERE project_id = ?", (project_id,))
-            conn.commit()
+            for row in rows:
+                job = json.loads(row["data"])
+                job["status"] = "interrupted"
+                job["finished_at"] = updated_at
+                conn.execute(
+                    "UPDATE jobs SET status = ?, data = ?, updated_at = ? WHERE id = ?",
+                    ("interrupted", json.dumps(job), updated_at, row["id"]),
+                )
 
-        for storage_path in storage_paths:
-            path = Path(storage_path)
-            try:
-                path.unlink()
-            except FileNotFoundError:
-                pass
+    # --- Render history -----------------------------------------------------------
+    RENDER_RECORD_COLUMNS = (
+        "id",
+        "project_id",
+        "status",
+        "render_mode",
+        "profile",
+        "input_hashes",
+        "filter_graph",
+        "wall_time_seconds",
+        "encode_fps",
+        "encoded_frames",
+        "output_duration_seconds",
+        "output_size",
+        "segments_total",
+        "segments_cached",
+        "exit_code",
+        "stderr_tail",
+        "log_file",
+        "created_at",
+        "finished_at",
+    )
+    RENDER_RECORD_JSON_COLUMNS = ("input_hashes", "filter_graph")
+
+    def save_render_record(self, record: Dict[str, Any]) -> None:
+        if not record.get("id"):
+            raise ValueError("Render record is missing an 'id'")
+
+        values = []
+        for column in self.RENDER_RECORD_COLUMNS:
+            value = record.get(column)
+            if column in self.RENDER_RECORD_JSON_COLUMNS and value is not None:
+                value = json.dumps(value)
+            values.append(value)
+
+        with self._writer() as conn:
+            conn.execute(
+                f"REPLACE INTO render_jobs ({', '.join(self.RENDER_RECORD_COLUMNS)})"
+                f" VALUES ({', '.join('?' for _ in self.RENDER_RECORD_COLUMNS)})",
+                values,
+            )
+
+    def _render_record_from_row(self, row: sqlite3.Row) -> Dict[str, Any]:
+        record = {column: row[column] for column in self.RENDER_RECORD_COLUMNS}
+        for column in self.RENDER_RECORD_JSON_COLUMNS:
+            if record[column] is not None:
+                record[column] = json.loads(record[column])
+        return record
+
+    def get_render_record(self, record_id: str) -> Optional[Dict[str, Any]]:
+        with self._reader() as conn:
+            row = conn.execute("SELECT * FROM render_jobs WHERE id = ?", (record_id,)).fetchone()
+        if row is None:
+            return None
+        return self._render_record_from_row(row)
+
+    def _render_record_filters(self, filters: Dict[str, Any]) -> Tuple[str, List[Any]]:
+        """WHERE clause for the render history filters that are set."""
+        clauses = []
+        params: List[Any] = []
+        for column in ("project_id", "status", "render_mode", "profile"):
+            if filters.get(column) is not None:
+                clauses.append(f"{column} = ?")
+                params.append(filters[column])
+        if filters.get("since"):
+            clauses.append("created_at >= ?")
+            params.append(filters["since"])
+        if filters.get("until"):
+            clauses.append("created_at < ?")
+            params.append(filters["until"])
+        if filters.get("min_wall_time") is not None:
+            clauses.append("wall_time_seconds >= ?")
+            params.append(filters["min_wall_time"])
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def list_render_records(
+        self, limit: int = 50, offset: int = 0, **filters: Any
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Newest-first page of render history and the total number of matches.
+
+        Filters: ``project_id``, ``status``, ``render_mode``, ``profile``,
+        ``since``/``until`` (ISO timestamps on ``created_at``) and
+        ``min_wall_time`` (seconds).
+        """
+        where, params = self._render_record_filters(filters)
+        with self._reader() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM render_jobs{where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT * FROM render_jobs{where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                [*params, limit, offset],
+            ).fetchall()
+        return [self._render_record_from_row(row) for row in rows], total
+
+    def render_record_stats(self, group_by: str = "profile", **filters: Any) -> List[Dict[str, Any]]:
+        """Aggregate render history per ``profile``, ``render_mode``,
+        ``project_id``, ``status`` or ``day``."""
+        group_columns = {
+            "profile": "profile",
+            "render_mode": "render_mode",
+            "project_id": "project_id",
+            "status": "status",
+            "day": "substr(created_at, 1, 10)",
+        }
+        if group_by not in group_columns:
+            raise ValueError(f"Cannot group render history by {group_by!r}")
+        group_expr = group_columns[group_by]
+        where, params = self._render_record_filters(filters)
+        with self._reader() as conn:
+            rows = conn.execute(
+                f"""SELECT {group_expr} AS grp,
+                           COUNT(*) AS renders,
+                           SUM(status = 'succeeded') AS succeeded,
+                           SUM(status = 'failed') AS failed,
+                           AVG(wall_time_seconds) AS avg_wall_time_seconds,
+                           MAX(wall_time_seconds) AS max_wall_time_seconds,
+                           SUM(wall_time_seconds) AS total_wall_time_seconds,
+                           AVG(encode_fps) AS avg_encode_fps,
+                           SUM(output_duration_seconds) AS total_output_seconds,
+                           SUM(output_size) AS total_output_size
+                    FROM render_jobs{where}
+                    GROUP BY grp
+                    ORDER BY grp""",
+                params,
+            ).fetchall()
+        return [{group_by: row["grp"], **{key: row[key] for key in row.keys() if key != "grp"}} for row in rows]
+
+    # --- Media info ---------------------------------------------------------------
+    def get_media_info(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Cached probe of a blob: ``{"version", "info", "keyframes", "probed_at"}``."""
+        with self._reader() as conn:
+            row = conn.execute(
+                "SELECT version, info, keyframes, probed_at FROM media_info WHERE content_hash = ?",
+                (content_hash,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "version": row["version"],
+            "info": json.loads(row["info"]) if row["info"] is not None else None,
+            "keyframes": json.loads(row["keyframes"]) if row["keyframes"] is not None else None,
+            "probed_at": row["probed_at"],
+        }
+
+    def save_media_info(self, content_hash: str, version: int, info: Optional[Dict[str, Any]], probed_at: str) -> None:
+        """Store a probe result; a new version also drops the cached keyframes."""
+        with self._writer() as conn:
+            conn.execute(
+                "INSERT INTO media_info (content_hash, version, info, probed_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(content_hash) DO UPDATE SET info = excluded.info, probed_at = excluded.probed_at,"
+                " keyframes = CASE WHEN version = excluded.version THEN keyframes END, version = excluded.version",
+                (content_hash, version, json.dumps(info) if info is not None else None, probed_at),
+            )
+
+    def save_media_keyframes(self, content_hash: str, keyframes: List[float]) -> None:
+        with self._writer() as conn:
+            conn.execute(
+                "UPDATE media_info SET keyframes = ? WHERE content_hash = ?",
+                (json.dumps(keyframes), content_hash),
+            )
+
+    # --- TTS cache ----------------------------------------------------------------
+    def get_tts_cache_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._reader() as conn:
+            row = conn.execute("SELECT * FROM tts_cache WHERE key = ?", (key,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def touch_tts_cache_entry(self, key: str, used_at: str) -> None:
+        with self._writer() as conn:
+            conn.execute("UPDATE tts_cache SET hits = hits + 1, last_used_at = ? WHERE key = ?", (used_at, key))
+
+    def save_tts_cache_entry(
+        self, key: str, voice: str, size: int, duration_ms: Optional[int], created_at: str
+    ) -> None:
+        with self._writer() as conn:
+            conn.execute(
+                "REPLACE INTO tts_cache (key, voice, size, duration_ms, hits, created_at, last_used_at)"
+                " VALUES (?, ?, ?, ?, 0, ?, ?)",
+                (key, voice, size, duration_ms, created_at, created_at),
+            )
+
+    def delete_tts_cache_entries(self, keys: Iterable[str]) -> None:
+        with self._writer() as conn:
+            conn.executemany("DELETE FROM tts_cache WHERE key = ?", [(key,) for key in keys])
+
+    def tts_cache_totals(self) -> Dict[str, int]:
+        """``{"entries", "bytes", "hits"}`` over the whole TTS cache."""
+        with self._reader() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) AS entries, COALESCE(SUM(size), 0) AS bytes, COALESCE(SUM(hits), 0) AS hits"
+                " FROM tts_cache"
+            ).fetchone()
+        return dict(row)
+
+    def list_tts_cache_lru(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Least recently used TTS cache entries first: ``{"key", "size"}``."""
+        with self._reader() as conn:
+            rows = conn.execute(
+                "SELECT key, size FROM tts_cache ORDER BY last_used_at LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
 
     # --- Channel Lists ------------------------------------------------------------
     def list_channel_lists(self) -> List[Dict[str, Any]]:
-        with self._connect() as conn:
+        with self._reader() as conn:
             rows = conn.execute("SELECT data FROM channel_lists ORDER BY created_at DESC").fetchall()
         return [json.loads(row["data"]) for row in rows]
 
@@ -300,17 +993,15 @@ class Database:
         if not channel_id:
             raise ValueError("Channel list is missing an 'id'")
 
-        with self._connect() as conn:
+        with self._writer() as conn:
             conn.execute(
                 "REPLACE INTO channel_lists (id, data, created_at) VALUES (?, ?, ?)",
                 (channel_id, json.dumps(channel), created_at),
             )
-            conn.commit()
 
     def delete_channel_list(self, channel_id: str) -> None:
-        with self._connect() as conn:
+        with self._writer() as conn:
             conn.execute("DELETE FROM channel_lists WHERE id = ?", (channel_id,))
-            conn.commit()
 
     # --- Scanned Videos -----------------------------------------------------------
     def save_scanned_video(self, video: Dict[str, Any]) -> None:
@@ -319,15 +1010,14 @@ class Database:
             raise ValueError("Scanned video is missing an 'id'")
 
         created_at = video.get("created_time", "")
-        with self._connect() as conn:
+        with self._writer() as conn:
             conn.execute(
                 "REPLACE INTO scanned_videos (id, data, created_at) VALUES (?, ?, ?)",
                 (video_id, json.dumps(video), created_at),
             )
-            conn.commit()
 
     def get_scanned_video(self, video_id: str) -> Optional[Dict[str, Any]]:
-        with self._connect() as conn:
+        with self._reader() as conn:
             row = conn.execute(
                 "SELECT data, downloaded FROM scanned_videos WHERE id = ?",
                 (video_id,),
@@ -340,16 +1030,15 @@ class Database:
     
     def mark_video_downloaded(self, video_id: str, downloaded: bool = True) -> None:
         """Mark a video as downloaded or not downloaded."""
-        with self._connect() as conn:
+        with self._writer() as conn:
             conn.execute(
                 "UPDATE scanned_videos SET downloaded = ? WHERE id = ?",
                 (1 if downloaded else 0, video_id),
             )
-            conn.commit()
     
     def get_video_download_status(self, video_id: str) -> bool:
         """Check if a video has been downloaded."""
-        with self._connect() as conn:
+        with self._reader() as conn:
             row = conn.execute(
                 "SELECT downloaded FROM scanned_videos WHERE id = ?",
                 (video_id,),
@@ -372,7 +1061,7 @@ class Database:
     ) -> None:
         video_info_json = json.dumps(video_info) if video_info else None
 
-        with self._connect() as conn:
+        with self._writer() as conn:
             conn.execute(
                 """INSERT INTO download_status 
                    (id, video_id, project_id, status, progress, message, video_info, url, type, created_at, updated_at)
@@ -391,7 +1080,6 @@ class Database:
                     created_at,
                 ),
             )
-            conn.commit()
 
     def update_download_status(
         self,
@@ -406,7 +1094,7 @@ class Database:
         video_info_json = json.dumps(video_info) if video_info else None
         updated_at = dt.datetime.utcnow().isoformat()
 
-        with self._connect() as conn:
+        with self._writer() as conn:
             if video_info_json:
                 conn.execute(
                     """UPDATE download_status 
@@ -421,10 +1109,9 @@ class Database:
                        WHERE id = ?""",
                     (status, progress, message, updated_at, download_id),
                 )
-            conn.commit()
 
     def get_download_status(self, download_id: str) -> Optional[Dict[str, Any]]:
-        with self._connect() as conn:
+        with self._reader() as conn:
             row = conn.execute(
                 "SELECT * FROM download_status WHERE id = ?",
                 (download_id,),
@@ -448,7 +1135,7 @@ class Database:
         }
 
     def list_download_history(self, project_id: Optional[str] = None) -> List[Dict[str, Any]]:
-        with self._connect() as conn:
+        with self._reader() as conn:
             if project_id:
                 rows = conn.execute(
                     "SELECT * FROM download_status WHERE project_id = ? ORDER BY created_at DESC",
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from app.db import Database
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {"succeeded", "failed", "cancelled", "interrupted"}
+
+# Finished jobs kept in memory for fast polling; older ones are served from SQLite.
+MAX_FINISHED_IN_MEMORY = 100
+
+# Progress-only updates are persisted at most this often; status changes are
+# always written immediately.
+PERSIST_INTERVAL_SECONDS = 1.0
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function when the job was cancelled."""
+
+
+class Job:
+    """A unit of background work with progress, result and cancellation."""
+
+    def __init__(self, manager: "JobManager", job_id: str, project_id: Optional[str]) -> None:
+        self._manager = manager
+        self._lock = threading.Lock()
+        self.id = job_id
+        self.kind = manager.kind
+        self.project_id = project_id
+        self.status = "queued"
+        self.progress: Optional[float] = None
+        self.message: Optional[str] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.details: Dict[str, Any] = {}
+        self.created_at = dt.datetime.utcnow().isoformat()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.cancel_event = threading.Event()
+        self.version = 0
+        self._persisted_at = 0.0
+        self.future: Optional[Future] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def update(self, **fields: Any) -> None:
+        """Update job fields; ``details`` is merged rather than replaced."""
+        with self._lock:
+            details = fields.pop("details", None)
+            if details:
+                self.details.update(details)
+            status_changed = "status" in fields and fields["status"] != self.status
+            for key, value in fields.items():
+                setattr(self, key, value)
+            self.version += 1
+            now = time.monotonic()
+            force = status_changed or self.status in TERMINAL_STATUSES
+            if not force and now - self._persisted_at < PERSIST_INTERVAL_SECONDS:
+                return
+            self._persisted_at = now
+            snapshot = self._snapshot_unlocked()
+        self._manager._persist(snapshot)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._snapshot_unlocked()
+
+    def _snapshot_unlocked(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "project_id": self.project_id,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "result": self.result,
+            "error": self.error,
+            "details": dict(self.details),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """Runs jobs of one kind on a bounded thread pool and persists their state.
+
+    Job functions receive the :class:`Job` and return a result dict.  They
+    should call :meth:`Job.update` to report progress and check
+    :attr:`Job.cancelled` (or call :meth:`Job.raise_if_cancelled`) regularly.
+    """
+
+    def __init__(self, kind: str, db: Database, max_workers: int) -> None:
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self._db = db
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"{kind}-job")
+        # Jobs left queued/running by a previous process can never finish.
+        self._db.mark_interrupted_jobs(kind, dt.datetime.utcnow().isoformat())
+
+    def submit(
+        self,
+        fn: Callable[[Job], Dict[str, Any]],
+        *,
+        project_id: Optional[str] = None,
+        details: Optional[Dict[str, Any]] = None,
+    ) -> Job:
+        job = Job(self, uuid.uuid4().hex, project_id)
+        if details:
+            job.details.update(details)
+        with self._lock:
+            self._prune_finished()
+            self._jobs[job.id] = job
+        self._persist(job.snapshot())
+        job.future = self._executor.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job: Job, fn: Callable[[Job], Dict[str, Any]]) -> None:
+        if job.cancelled:
+            job.update(status="cancelled", finished_at=dt.datetime.utcnow().isoformat())
+            return
+        job.update(status="running", started_at=dt.datetime.utcnow().isoformat())
+        try:
+            result = fn(job)
+        except JobCancelled:
+            job.update(status="cancelled", finished_at=dt.datetime.utcnow().isoformat())
+        except Exception as exc:  # pragma: no cover - surfaced through job state
+            logger.exception("%s job %s failed", self.kind, job.id)
+            job.update(status="failed", error=str(exc), finished_at=dt.datetime.utcnow().isoformat())
+        else:
+            if job.cancelled:
+                status = "cancelled"
+            elif isinstance(result, dict) and result.get("status") == "error":
+                status = "failed"
+            else:
+                status = "succeeded"
+            job.update(
+                status=status,
+                progress=1.0 if status == "succeeded" else job.progress,
+                result=result,
+                error=result.get("message") if status == "failed" and isinstance(result, dict) else None,
+                finished_at=dt.datetime.utcnow().isoformat(),
+            )
+
+    def _prune_finished(self) -> None:
+        finished = [job for job in self._jobs.values() if job.status in TERMINAL_STATUSES]
+        for job in finished[: max(0, len(finished) - MAX_FINISHED_IN_MEMORY)]:
+            self._jobs.pop(job.id, None)
+
+    def _persist(self, snapshot: Dict[str, Any]) -> None:
+        try:
+            self._db.save_job(snapshot, dt.datetime.utcnow().isoformat())
+        except Exception:  # pragma: no cover - persistence must not kill the job
+            logger.exception("Failed to persist %s job %s", self.kind, snapshot.get("id"))
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.get_job(job_id)
+        if job is not None:
+            return job.snapshot()
+        stored = self._db.get_job(job_id)
+        if stored is None or stored.get("kind") != self.kind:
+            return None
+        return stored
+
+    def list_jobs(self, project_id: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        return self._db.list_jobs(self.kind, project_id=project_id, limit=limit)
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.get_job(job_id)
+        if job is None or job.status in TERMINAL_STATUSES:
+            return False
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            job.update(status="cancelled", finished_at=dt.datetime.utcnow().isoformat())
+        return True
+
+    async def wait(self, job_id: str, poll_interval: float = 0.5) -> Optional[Dict[str, Any]]:
+        """Wait for a job to finish without blocking the event loop."""
+        while True:
+            snapshot = self.get(job_id)
+            if snapshot is None or snapshot["status"] in TERMINAL_STATUSES:
+                return snapshot
+            await asyncio.sleep(poll_interval)
+
+    async def events(self, job_id: str, poll_interval: float = 0.5) -> AsyncIterator[str]:
+        """Server-sent events stream of job snapshots until the job finishes."""
+        last_version = -1
+        while True:
+            job = self.get_job(job_id)
+            if job is None:
+                snapshot = self.get(job_id)
+                if snapshot is not None:
+                    yield f"data: {json.dumps(snapshot)}\n\n"
+                return
+            if job.version != last_version:
+                last_version = job.version
+                snapshot = job.snapshot()
+                yield f"data: {json.dumps(snapshot)}\n\n"
+                if snapshot["status"] in TERMINAL_STATUSES:
+                    return
+            await asyncio.sleep(poll_interval)
+
+
+__all__ = ["Job", "JobCancelled", "JobManager", "TERMINAL_STATUSES"]
@@ -0,0 +1,325 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import datetime as dt
+import json
+import logging
+import math
+import shutil
+import subprocess
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.db import Database
+
+logger = logging.getLogger(__name__)
+
+# Bump when the shape of a probe result changes so cached rows are re-probed.
+MEDIA_INFO_VERSION = 2
+
+# Background probes started at import time run on this many threads.
+PROBE_WORKERS = 2
+
+MEDIA_SUFFIXES = {".mp4", ".mov", ".avi", ".mkv", ".webm", ".flv", ".mp3", ".wav", ".m4a", ".aac", ".ogg", ".flac"}
+
+
+def _frame_rate(value: Optional[str]) -> Optional[float]:
+    """``"30000/1001"`` as a float (None for missing or ``0/0`` rates)."""
+    if not value:
+        return None
+    numerator, _, denominator = value.partition("/")
+    try:
+        rate = float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+    return rate or None
+
+
+def probe_path(path: Path, ffprobe_path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Container and stream details of *path*, or None if ffprobe is
+    unavailable or cannot read it.
+
+    ``video`` describes the first video stream (size, frame rates, codec,
+    rotation) and ``audio`` the first audio stream; either is None when the
+    file has no such stream.
+    """
+    ffprobe_path = ffprobe_path or shutil.which("ffprobe")
+    if not ffprobe_path:
+        return None
+    try:
+        result = subprocess.run(
+            [
+                ffprobe_path,
+                "-v",
+                "error",
+                "-show_entries",
+                "format=duration,start_time,format_name,bit_rate"
+                ":stream=index,codec_type,codec_name,width,height,r_frame_rate,avg_frame_rate,pix_fmt,profile"
+                ",sample_rate,channels:stream_tags=rotate:stream_side_data=rotation",
+                "-of",
+                "json",
+                str(path),
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=False,
+        )
+        if result.returncode != 0:
+            return None
+        data = json.loads(result.stdout.decode() or "{}")
+    except (OSError, ValueError):
+        return None
+
+    container = data.get("format") or {}
+    streams = data.get("streams") or []
+    video = None
+    audio = None
+    for stream in streams:
+        if stream.get("codec_type") == "video" and video is None:
+            # The legacy ``rotate`` tag is clockwise; display matrix side data
+            # is counter-clockwise.  Both end up as clockwise 0/90/180/270.
+            rotation = int(float((stream.get("tags") or {}).get("rotate") or 0))
+            for side_data in stream.get("side_data_list") or []:
+                rotation = rotation or -int(float(side_data.get("rotation") or 0))
+            video = {
+                "width": int(stream.get("width") or 0),
+                "height": int(stream.get("height") or 0),
+                "r_frame_rate": stream.get("r_frame_rate"),
+                "avg_frame_rate": stream.get("avg_frame_rate"),
+                "fps": _frame_rate(stream.get("avg_frame_rate")) or _frame_rate(stream.get("r_frame_rate")),
+                "codec_name": stream.get("codec_name"),
+                "pix_fmt": stream.get("pix_fmt"),
+                "profile": stream.get("profile"),
+                "rotation": rotation % 360,
+            }
+        elif stream.get("codec_type") == "audio" and audio is None:
+            audio = {
+                "codec_name": stream.get("codec_name"),
+                "sample_rate": int(stream.get("sample_rate") or 0),
+                "channels": int(stream.get("channels") or 0),
+            }
+    return {
+        "duration": float(container.get("duration") or 0) or None,
+        "start_time": float(container.get("start_time") or 0),
+        "format_name": container.get("format_name"),
+        "bit_rate": int(container.get("bit_rate") or 0) or None,
+        "has_video": video is not None,
+        "has_audio": audio is not None,
+        "video": video,
+        "audio": audio,
+        "streams": [
+            {"index": stream.get("index"), "codec_type": stream.get("codec_type"), "codec_name": stream.get("codec_name")}
+            for stream in streams
+        ],
+    }
+
+
+def probe_keyframes(path: Path, ffprobe_path: Optional[str] = None) -> Optional[List[float]]:
+    """Presentation times of the video keyframes of *path* where the stream
+    can be cut cleanly, in the file's own timestamps (not shifted by its
+    start time).  Reads packet headers only, nothing is decoded.
+
+    A keyframe qualifies only if it starts a closed GOP: every packet before
+    it in decode order is shown before it and every packet after it is shown
+    after it.  Open-GOP keyframes, whose leading B-frames refer back into
+    the previous GOP, are left out.
+    """
+    ffprobe_path = ffprobe_path or shutil.which("ffprobe")
+    if not ffprobe_path:
+        return None
+    try:
+        result = subprocess.run(
+            [
+                ffprobe_path,
+                "-v",
+                "error",
+                "-select_streams",
+                "v:0",
+                "-show_entries",
+                "packet=pts_time,flags",
+                "-of",
+                "csv=p=0",
+                str(path),
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=False,
+        )
+    except OSError:
+        return None
+    if result.returncode != 0:
+        return None
+    # (pts, keyframe) in decode order; packets without a pts poison the
+    # keyframes around them, since their display position is unknown.
+    packets: List[Tuple[float, bool]] = []
+    for line in result.stdout.decode(errors="ignore").splitlines():
+        pts_time, _, flags = line.partition(",")
+        try:
+            pts = float(pts_time)
+        except ValueError:
+            pts = math.nan
+        packets.append((pts, "K" in flags))
+    return clean_cut_points(packets)
+
+
+def clean_cut_points(packets: List[Tuple[float, bool]]) -> List[float]:
+    """Keyframe times from ``(pts, keyframe)`` packets in decode order at
+    which nothing before is shown after, and nothing after is shown before.
+    A packet without a pts (NaN) rules out the keyframes on either side."""
+    later_min = [math.inf] * (len(packets) + 1)
+    for index in range(len(packets) - 1, -1, -1):
+        pts = packets[index][0]
+        later_min[index] = later_min[index + 1] if math.isnan(pts) else min(pts, later_min[index + 1])
+
+    unknown = [index for index, (pts, _keyframe) in enumerate(packets) if math.isnan(pts)]
+    keyframes = [index for index, (pts, keyframe) in enumerate(packets) if keyframe and not math.isnan(pts)]
+    ruled_out = set()
+    for index in unknown:
+        position = bisect.bisect_left(keyframes, index)
+        ruled_out.update(keyframes[max(position - 1, 0) : position + 1])
+
+    cut_points = []
+    earlier_max = -math.inf
+    for index, (pts, keyframe) in enumerate(packets):
+        if math.isnan(pts):
+            continue
+        if keyframe and index not in ruled_out and earlier_max < pts < later_min[index + 1]:
+            cut_points.append(round(pts, 6))
+        earlier_max = max(earlier_max, pts)
+    return sorted(cut_points)
+
+
+class MediaInfoService:
+    """Probes stored files once and caches the result in SQLite.
+
+    Results are keyed by the file's content hash, so every file ID that shares
+    a blob shares its probe, and a blob is never probed twice even when several
+    requests ask for it at the same time.  The keyframe index is probed
+    separately, on first use, since it means reading every packet.
+    """
+
+    def __init__(self, database: Database, workers: int = PROBE_WORKERS) -> None:
+        self._db = database
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="media-probe")
+        self._lock = threading.Lock()
+        self._inflight: Dict[Tuple[str, str], Future] = {}
+
+    def _single_flight(self, key: Tuple[str, str], probe: Callable[[], Any]) -> Any:
+        """Run *probe* unless another thread is already running it for *key*,
+        in which case wait for that result instead."""
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+        if not owner:
+            return future.result()
+        try:
+            result = probe()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _locate(self, file_id: str, path: Optional[Path]) -> Tuple[Optional[str], Optional[Path]]:
+        metadata = self._db.get_file_metadata(file_id) or {}
+        if path is None:
+            stored = self._db.get_file_path(file_id)
+            path = stored[0] if stored is not None else None
+        return metadata.get("content_hash"), path
+
+    def get(self, file_id: str, path: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+        """Probe result for a stored file (see :func:`probe_path`).
+
+        *path* is where the caller can already read the file; by default the
+        blob store path is used.  Files without a content hash (legacy rows not
+        migrated yet) are probed every time.  A blob ffprobe cannot read is
+        remembered as None until the blob is deleted or MEDIA_INFO_VERSION
+        changes.
+        """
+        content_hash, path = self._locate(file_id, path)
+        if content_hash is None:
+            return probe_path(path) if path is not None else None
+
+        cached = self._db.get_media_info(content_hash)
+        if cached is not None and cached["version"] == MEDIA_INFO_VERSION:
+            return cached["info"]
+        if path is None:
+            return None
+
+        def _probe() -> Optional[Dict[str, Any]]:
+            ffprobe_path = shutil.which("ffprobe")
+            if not ffprobe_path or not path.is_file():
+                # Says nothing about the file itself; try again next time.
+                return None
+            info = probe_path(path, ffprobe_path)
+            # A failed probe is stored too (info None), so a corrupt or
+            # non-media blob is not handed to ffprobe again on every call.
+            # The row is deleted with the blob, like any other.
+            self._db.save_media_info(content_hash, MEDIA_INFO_VERSION, info, dt.datetime.utcnow().isoformat())
+            return info
+
+        return self._single_flight((content_hash, "info"), _probe)
+
+    def keyframes(self, file_id: str, path: Optional[Path] = None) -> Optional[List[float]]:
+        """Keyframe times of a stored file's first video stream (see
+        :func:`probe_keyframes`), or None if it cannot be probed."""
+        content_hash, path = self._locate(file_id, path)
+        if content_hash is None:
+            return probe_keyframes(path) if path is not None else None
+
+        cached = self._db.get_media_info(content_hash)
+        if cached is not None and cached["version"] == MEDIA_INFO_VERSION:
+            if cached["info"] is None:
+                return None  # ffprobe already failed on this blob
+            if cached["keyframes"] is not None:
+                return cached["keyframes"]
+        if path is None:
+            return None
+        if cached is None or cached["version"] != MEDIA_INFO_VERSION:
+            # Keyframes are stored on the info row, which must exist first.
+            if self.get(file_id, path) is None:
+                return None
+
+        def _probe() -> Optional[List[float]]:
+            keyframes = probe_keyframes(path)
+            if keyframes is not None:
+                self._db.save_media_keyframes(content_hash, keyframes)
+            return keyframes
+
+        return self._single_flight((content_hash, "keyframes"), _probe)
+
+    async def get_async(self, file_id: str, path: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+        """:meth:`get` on the probe pool, for async endpoints."""
+        return await asyncio.wrap_future(self._executor.submit(self.get, file_id, path))
+
+    def prefetch(self, file_id: str) -> None:
+        """Probe a newly imported file in the background so later renders,
+        OCR and ASR find the result cached.  Non-media files are skipped."""
+        metadata = self._db.get_file_metadata(file_id) or {}
+        content_type = metadata.get("content_type") or ""
+        suffix = Path(metadata.get("filename") or "").suffix.lower()
+        if not (content_type.startswith(("video/", "audio/")) or suffix in MEDIA_SUFFIXES):
+            return
+
+        def _run() -> None:
+            try:
+                self.get(file_id)
+            except Exception:  # pragma: no cover - logged, retried on next use
+                logger.exception("Media probe of %s failed", file_id)
+
+        self._executor.submit(_run)
+
+
+__all__ = ["MEDIA_INFO_VERSION", "MediaInfoService", "clean_cut_points", "probe_keyframes", "probe_path"]
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Entries used within this window are never evicted, so a render that is
+# still assembling its pieces cannot lose them to a concurrent render.
+EVICTION_GRACE_SECONDS = 3600
+
+CACHE_FORMAT_VERSION = 1
+
+
+class RenderCache:
+    """On-disk cache of rendered intermediates (segment videos, mixed audio).
+
+    Entries are named by a key derived from everything that affects their
+    bytes, so a hit can be reused as-is.  The cache is bounded by total size
+    and evicts least recently used entries first.
+    """
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self._root = root
+        self._tmp_root = root / "tmp"
+        self._tmp_root.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(parts: Dict[str, Any]) -> str:
+        payload = json.dumps({"format": CACHE_FORMAT_VERSION, **parts}, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str, suffix: str) -> Path:
+        return self._root / key[:2] / f"{key}{suffix}"
+
+    def lookup(self, key: str, suffix: str) -> Optional[Path]:
+        path = self.path_for(key, suffix)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def temp_path(self, suffix: str) -> Path:
+        fd, name = tempfile.mkstemp(dir=self._tmp_root, suffix=suffix)
+        os.close(fd)
+        return Path(name)
+
+    def store(self, key: str, suffix: str, temp_file: Path) -> Path:
+        target = self.path_for(key, suffix)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temp_file, target)
+        self.evict()
+        return target
+
+    def evict(self) -> None:
+        with self._lock:
+            entries = []
+            total = 0
+            for path in self._root.glob("??/*"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+            if total <= self._max_bytes:
+                return
+            cutoff = time.time() - EVICTION_GRACE_SECONDS
+            for mtime, size, path in sorted(entries):
+                if total <= self._max_bytes or mtime > cutoff:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+
+
+__all__ = ["RenderCache"]
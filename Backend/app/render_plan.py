@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import bisect
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+# Source times closer than this are treated as the same point when merging
+# segments or checking that they are in order.
+TIME_EPSILON = 1e-6
+
+# Most inputs a "seek" graph opens.  ffmpeg keeps the demuxer and decoder of
+# every input alive for the whole run, so longer reordered timelines are cut
+# in batches of at most this many segments (see ``seek_batches``).
+MAX_SEEK_INPUTS = 16
+
+
+@dataclass(frozen=True)
+class TimelineSegment:
+    """One cut of the source: ``[source_start, source_end)`` played at *rate*,
+    occupying *frames* output frames."""
+
+    source_start: float
+    source_end: float
+    rate: float
+    frames: int
+
+    @property
+    def source_duration(self) -> float:
+        return max(self.source_end - self.source_start, 0.0)
+
+
+@dataclass(frozen=True)
+class Timeline:
+    """The video segments of a render, in output order."""
+
+    segments: Sequence[TimelineSegment]
+    fps: int
+
+    @classmethod
+    def from_request(cls, video_segments: List[Dict[str, Any]], fps: int) -> "Timeline":
+        """Timeline for frontend ``VideoSegment`` dicts.
+
+        Each segment is cut to whole output frames so the audio can be padded
+        or trimmed to exactly the same length.
+        """
+        segments = []
+        for segment in video_segments:
+            start = float(segment.get("sourceStartTime", 0) or 0)
+            end = float(segment.get("sourceEndTime", 0) or 0)
+            rate = float(segment.get("playbackRate", 1.0) or 1.0)
+            frames = max(1, round(max(end - start, 0.0) / rate * fps))
+            segments.append(TimelineSegment(start, end, rate, frames))
+        return cls(tuple(segments), fps)
+
+    @property
+    def frames(self) -> int:
+        return sum(segment.frames for segment in self.segments)
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.fps
+
+    def output_starts(self) -> List[float]:
+        """Output time at which each segment begins."""
+        starts = []
+        frames = 0
+        for segment in self.segments:
+            starts.append(frames / self.fps)
+            frames += segment.frames
+        return starts
+
+    def merged(self) -> "Timeline":
+        """Adjacent segments that continue each other in the source at the
+        same rate become one segment (the usual result of splitting a clip
+        and deleting nothing in between)."""
+        merged: List[TimelineSegment] = []
+        for segment in self.segments:
+            previous = merged[-1] if merged else None
+            if (
+                previous is not None
+                and previous.rate == segment.rate
+                and abs(previous.source_end - segment.source_start) <= TIME_EPSILON
+            ):
+                merged[-1] = TimelineSegment(
+                    previous.source_start, segment.source_end, segment.rate, previous.frames + segment.frames
+                )
+            else:
+                merged.append(segment)
+        return Timeline(tuple(merged), self.fps)
+
+    def is_monotonic(self) -> bool:
+        """Whether segments run forward through the source without overlap."""
+        return all(
+            later.source_start >= earlier.source_end - TIME_EPSILON
+            for earlier, later in zip(self.segments, self.segments[1:])
+        )
+
+    def uniform_rate(self) -> Optional[float]:
+        rates = {segment.rate for segment in self.segments}
+        return rates.pop() if len(rates) == 1 else None
+
+
+@dataclass
+class SegmentGraph:
+    """How to feed a timeline's source to ffmpeg.
+
+    ``inputs`` are the argument lists of the source inputs, which the caller
+    must add first (as inputs ``0 .. len(inputs) - 1``).  ``filters`` produce
+    ``video_label`` and/or ``audio_label`` with continuous timestamps.
+    """
+
+    strategy: str
+    inputs: List[List[str]]
+    filters: List[str] = field(default_factory=list)
+    video_label: Optional[str] = None
+    audio_label: Optional[str] = None
+
+
+def _fmt(value: float) -> str:
+    return f"{value:.6f}".rstrip("0").rstrip(".") or "0"
+
+
+def atempo_chain(rate: float) -> str:
+    """``atempo`` filters (with leading comma) that change speed by *rate*."""
+    # FFmpeg atempo filter only supports 0.5-2.0 range
+    # For extreme rates, chain multiple atempo filters
+    if rate == 1.0:
+        return ""
+    if 0.5 <= rate <= 2.0:
+        return f",atempo={rate}"
+
+    tempo_filters = []
+    current_rate = rate
+    # For fast rates (>2.0), apply multiple 2.0x filters
+    while current_rate > 2.0:
+        tempo_filters.append("atempo=2.0")
+        current_rate /= 2.0
+    # For slow rates (<0.5), apply multiple 0.5x filters
+    while current_rate < 0.5:
+        tempo_filters.append("atempo=0.5")
+        current_rate *= 2.0  # Each 0.5x filter doubles the effective rate
+    # Apply remaining rate if not exactly 1.0
+    if current_rate != 1.0:
+        tempo_filters.append(f"atempo={current_rate}")
+    return "," + ",".join(tempo_filters) if tempo_filters else ""
+
+
+def _select_expr(timeline: Timeline, var: str) -> str:
+    return "+".join(
+        f"gte({var},{_fmt(segment.source_start)})*lt({var},{_fmt(segment.source_end)})"
+        for segment in timeline.segments
+    )
+
+
+def _compact_expr(timeline: Timeline, scale: float) -> str:
+    """Expression mapping a kept source time ``T`` to its timeline position
+    times *scale*.  Segment offsets come from whole frame counts, so segments
+    land exactly where the audio mix and subtitles expect them."""
+    terms = []
+    for segment, output_start in zip(timeline.segments, timeline.output_starts()):
+        offset = output_start * scale - segment.source_start
+        terms.append(
+            f"gte(T,{_fmt(segment.source_start)})*lt(T,{_fmt(segment.source_end)})*(T{'+' if offset >= 0 else '-'}"
+            f"{_fmt(abs(offset))})"
+        )
+    return "+".join(terms)
+
+
+def plan_segment_graph(
+    timeline: Timeline,
+    source: str,
+    *,
+    video: bool = True,
+    audio: bool = True,
+    pad_audio: bool = False,
+) -> SegmentGraph:
+    """Filters that cut *timeline* out of *source* without one decode branch
+    per segment.
+
+    Segments are merged first.  When the result runs forward through the
+    source at a single rate, the source is decoded once and the kept frames
+    are picked with ``select``/``aselect`` and re-timed in one pass
+    ("select").  Otherwise every segment becomes its own input that is
+    seeked with ``-ss``/``-t``, so each decodes only its own range ("seek");
+    that needs at most ``MAX_SEEK_INPUTS`` segments, and a longer timeline
+    raises ValueError and has to be planned per ``seek_batches`` part.
+    With *pad_audio* each segment's audio is padded or trimmed to its exact
+    frame length.
+    """
+    timeline = timeline.merged()
+    rate = _select_rate(timeline)
+    if rate is not None:
+        return _plan_select(timeline, source, rate, video, audio, pad_audio)
+    if len(timeline.segments) > MAX_SEEK_INPUTS:
+        raise ValueError(
+            f"{len(timeline.segments)} reordered segments exceed {MAX_SEEK_INPUTS} seek inputs; "
+            "plan each part of seek_batches() instead"
+        )
+    return _plan_seek(timeline, source, video, audio, pad_audio)
+
+
+def seek_batches(timeline: Timeline) -> List[Timeline]:
+    """*timeline*, merged, as consecutive parts that ``plan_segment_graph``
+    can each cut; a single part unless it needs more than
+    ``MAX_SEEK_INPUTS`` seek inputs.  The parts' frames add up to the
+    timeline's, so their outputs can simply be concatenated."""
+    timeline = timeline.merged()
+    segments = timeline.segments
+    if _select_rate(timeline) is not None or len(segments) <= MAX_SEEK_INPUTS:
+        return [timeline]
+    return [
+        Timeline(tuple(segments[i : i + MAX_SEEK_INPUTS]), timeline.fps)
+        for i in range(0, len(segments), MAX_SEEK_INPUTS)
+    ]
+
+
+def _select_rate(timeline: Timeline) -> Optional[float]:
+    """The rate of a merged *timeline* that one ``select`` pass can cut, or
+    None if it needs seeking."""
+    rate = timeline.uniform_rate()
+    return rate if rate is not None and timeline.is_monotonic() else None
+
+
+def _plan_select(
+    timeline: Timeline, source: str, rate: float, video: bool, audio: bool, pad_audio: bool
+) -> SegmentGraph:
+    graph = SegmentGraph("select", [["-i", source]])
+    if video:
+        graph.filters.append(
+            f"[0:v]select='{_select_expr(timeline, 't')}',setpts='({_compact_expr(timeline, rate)})/{rate}/TB'[cutv]"
+        )
+        graph.video_label = "[cutv]"
+    if audio:
+        # Audio is compacted in source time and sped up afterwards; aresample
+        # fills the sub-frame gaps left where cuts fall inside an audio frame.
+        audio_filter = (
+            f"[0:a]aselect='{_select_expr(timeline, 't')}',asetpts='({_compact_expr(timeline, rate)})/TB',"
+            f"aresample=async=1:first_pts=0{atempo_chain(rate)}"
+        )
+        if pad_audio:
+            audio_filter += f",apad,atrim=duration={_fmt(timeline.duration)}"
+        graph.filters.append(f"{audio_filter}[cuta]")
+        graph.audio_label = "[cuta]"
+    return graph
+
+
+def _plan_seek(timeline: Timeline, source: str, video: bool, audio: bool, pad_audio: bool) -> SegmentGraph:
+    graph = SegmentGraph("seek", [])
+    for segment in timeline.segments:
+        graph.inputs.append(
+            ["-ss", _fmt(segment.source_start), "-t", _fmt(segment.source_duration), "-i", source]
+        )
+    count = len(timeline.segments)
+    if video:
+        for i, segment in enumerate(timeline.segments):
+            graph.filters.append(f"[{i}:v]setpts=(PTS-STARTPTS)/{segment.rate}[seg{i}v]")
+        if count > 1:
+            labels = "".join(f"[seg{i}v]" for i in range(count))
+            graph.filters.append(f"{labels}concat=n={count}:v=1:a=0[cutv]")
+            graph.video_label = "[cutv]"
+        else:
+            graph.video_label = "[seg0v]"
+    if audio:
+        for i, segment in enumerate(timeline.segments):
+            audio_filter = f"[{i}:a]asetpts=PTS-STARTPTS{atempo_chain(segment.rate)}"
+            if pad_audio:
+                audio_filter += f",apad,atrim=duration={_fmt(segment.frames / timeline.fps)}"
+            graph.filters.append(f"{audio_filter}[seg{i}a]")
+        if count > 1:
+            labels = "".join(f"[seg{i}a]" for i in range(count))
+            graph.filters.append(f"{labels}concat=n={count}:v=0:a=1[cuta]")
+            graph.audio_label = "[cuta]"
+        else:
+            graph.audio_label = "[seg0a]"
+    return graph
+
+
+def plan_stream_copy(
+    timeline: Timeline, keyframes: Sequence[float], source_end: Optional[float] = None
+) -> Optional[List[TimelineSegment]]:
+    """Pieces that copy *timeline* out of the source without re-encoding a
+    frame, or None if that is impossible.
+
+    Copying is only safe when every cut lands on one of the sorted, closed-GOP
+    *keyframes* (within half an output frame): each piece must start on a
+    keyframe and end on the next kept one, or at *source_end*.  Segments are
+    merged first and must all play at rate 1.0.  Each piece is a merged
+    segment; it is copied from ``source_start`` for ``frames`` frames.
+    """
+    tolerance = 0.5 / timeline.fps
+
+    def on_keyframe(time: float) -> bool:
+        index = bisect.bisect_left(keyframes, time - tolerance)
+        return index < len(keyframes) and keyframes[index] <= time + tolerance
+
+    pieces = []
+    for segment in timeline.merged().segments:
+        end = segment.source_start + segment.frames / timeline.fps
+        if segment.rate != 1.0 or not on_keyframe(segment.source_start):
+            return None
+        if not on_keyframe(end) and not (source_end is not None and end >= source_end - tolerance):
+            return None
+        pieces.append(segment)
+    return pieces or None
+
+
+__all__ = [
+    "MAX_SEEK_INPUTS",
+    "SegmentGraph",
+    "Timeline",
+    "TimelineSegment",
+    "atempo_chain",
+    "plan_segment_graph",
+    "plan_stream_copy",
+    "seek_batches",
+]
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import bisect
+import heapq
+import math
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+class _FixedIntervals:
+    """Time ranges already taken on one track, merged and sorted so an
+    overlap test is a single bisect."""
+
+    def __init__(self, intervals: Iterable[Tuple[float, float]]) -> None:
+        merged: List[List[float]] = []
+        for start, end in sorted(intervals):
+            if merged and start < merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self._starts = [start for start, _end in merged]
+        self._ends = [end for _start, end in merged]
+
+    def overlaps(self, start: float, end: float) -> bool:
+        # Last interval starting before *end*; merged intervals are disjoint,
+        # so it is the only one that can reach past *start*.
+        index = bisect.bisect_left(self._starts, end) - 1
+        return index >= 0 and self._ends[index] > start
+
+
+def allocate_tracks(
+    clips: Sequence[Tuple[float, float]],
+    occupied: Iterable[Tuple[int, float, float]] = (),
+    min_track: int = 0,
+) -> List[int]:
+    """Track for each ``(start, end)`` clip so that no two clips on a track
+    overlap, neither with each other nor with the *occupied* ``(track,
+    start, end)`` clips already on the timeline.
+
+    Clips are swept in start order and each takes the lowest track that is
+    free for its whole range (first fit), which needs the minimum number of
+    tracks when nothing is pre-occupied.  Tracks released by finished clips
+    sit in a min-heap, so a placement costs O(log n) plus one bisect per
+    track skipped because of an occupied clip.  Touching clips (one ends
+    exactly where the next starts) share a track.
+    """
+    fixed_by_track: Dict[int, List[Tuple[float, float]]] = {}
+    for track, start, end in occupied:
+        fixed_by_track.setdefault(track, []).append((start, end))
+    fixed = {track: _FixedIntervals(intervals) for track, intervals in fixed_by_track.items()}
+
+    def blocked(track: int, start: float, end: float) -> bool:
+        intervals = fixed.get(track)
+        # A zero-length clip still needs its start point to be free.
+        return intervals is not None and intervals.overlaps(start, max(end, start + 1e-9))
+
+    assigned = [min_track] * len(clips)
+    busy: List[Tuple[float, int]] = []  # (end, track) of placed clips still playing
+    free: List[int] = []  # tracks below next_track with nothing playing
+    next_track = min_track
+
+    for index in sorted(range(len(clips)), key=lambda i: clips[i][0]):
+        start, end = clips[index]
+        while busy and busy[0][0] <= start:
+            heapq.heappush(free, heapq.heappop(busy)[1])
+
+        skipped = []
+        while free and blocked(free[0], start, end):
+            skipped.append(heapq.heappop(free))
+        if free:
+            track = heapq.heappop(free)
+        else:
+            while blocked(next_track, start, end):
+                skipped.append(next_track)
+                next_track += 1
+            track = next_track
+            next_track += 1
+        for other in skipped:
+            heapq.heappush(free, other)
+
+        heapq.heappush(busy, (end, track))
+        assigned[index] = track
+    return assigned
+
+
+def _seconds(value: Any) -> Optional[float]:
+    """*value* as a finite, non-negative number of seconds, or None."""
+    if isinstance(value, bool):
+        return None
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(seconds) or seconds < 0:
+        return None
+    return seconds
+
+
+def clip_interval(start: Any, duration: Any) -> Tuple[float, float]:
+    """``(start, end)`` of a project clip from its stored ``startTime`` and
+    ``duration``.  A missing or malformed start counts as 0, and a clip of
+    unknown length (missing, non-numeric, negative or zero duration)
+    occupies the rest of its track, so bad metadata never lets a new clip
+    overlap it."""
+    start_seconds = _seconds(start) or 0.0
+    length = _seconds(duration)
+    if not length:
+        return start_seconds, math.inf
+    return start_seconds, start_seconds + length
+
+
+__all__ = ["allocate_tracks", "clip_interval"]
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from app.db import Database
+
+CACHE_FORMAT_VERSION = 1
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Text as the TTS engine hears it: NFC, trimmed, whitespace collapsed."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+class TTSCache:
+    """Synthesized speech keyed by voice, normalized text and chunk size.
+
+    The MP3s live at ``{root}/{key[:2]}/{key}.mp3``; the ``tts_cache`` table
+    indexes them with their size, duration and last use so the cache can be
+    held under *max_bytes* by evicting least recently used entries.
+    """
+
+    def __init__(self, root: Path, max_bytes: int, database: Database) -> None:
+        self._root = root
+        self._tmp_root = root / "tmp"
+        self._tmp_root.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = max_bytes
+        self._db = database
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def make_key(voice: str, text: str, chunk_size: int) -> str:
+        payload = json.dumps(
+            {"format": CACHE_FORMAT_VERSION, "voice": voice, "text": normalize_text(text), "chunk_size": chunk_size},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> Path:
+        return self._root / key[:2] / f"{key}.mp3"
+
+    def get(self, voice: str, text: str, chunk_size: int) -> Optional[Tuple[bytes, int]]:
+        """``(mp3_bytes, duration_ms)`` of a cached synthesis, or None."""
+        key = self.make_key(voice, text, chunk_size)
+        entry = self._db.get_tts_cache_entry(key)
+        data = None
+        if entry is not None:
+            try:
+                data = self.path_for(key).read_bytes()
+            except FileNotFoundError:
+                # Object removed behind our back; forget the stale row.
+                self._db.delete_tts_cache_entries([key])
+        with self._lock:
+            if data is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+        self._db.touch_tts_cache_entry(key, dt.datetime.utcnow().isoformat())
+        return data, entry["duration_ms"] or 0
+
+    def put(self, voice: str, text: str, chunk_size: int, data: bytes, duration_ms: Optional[int]) -> None:
+        key = self.make_key(voice, text, chunk_size)
+        target = self.path_for(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, name = tempfile.mkstemp(dir=self._tmp_root, suffix=".mp3")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+            os.replace(name, target)
+        except BaseException:
+            Path(name).unlink(missing_ok=True)
+            raise
+        self._db.save_tts_cache_entry(key, voice, len(data), duration_ms, dt.datetime.utcnow().isoformat())
+        self.evict()
+
+    def evict(self) -> None:
+        """Drop least recently used entries until the cache fits *max_bytes*."""
+        with self._lock:
+            total = self._db.tts_cache_totals()["bytes"]
+            while total > self._max_bytes:
+                oldest = self._db.list_tts_cache_lru()
+                if not oldest:
+                    break
+                removed = []
+                for entry in oldest:
+                    if total <= self._max_bytes:
+                        break
+                    self.path_for(entry["key"]).unlink(missing_ok=True)
+                    removed.append(entry["key"])
+                    total -= entry["size"]
+                self._db.delete_tts_cache_entries(removed)
+
+    def stats(self) -> Dict[str, Any]:
+        """Size of the cache plus hit/miss counts since the server started
+        (``hits`` on the entries themselves are kept across restarts)."""
+        totals = self._db.tts_cache_totals()
+        with self._lock:
+            hits, misses = self._hits, self._misses
+        lookups = hits + misses
+        return {
+            "entries": totals["entries"],
+            "bytes": totals["bytes"],
+            "max_bytes": self._max_bytes,
+            "lifetime_hits": totals["hits"],
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else None,
+        }
+
+
+__all__ = ["TTSCache", "normalize_text"]
@@ -0,0 +1,67 @@
+"""Synthetic media and process measurements shared by the ffmpeg benchmarks."""
+
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+def require_ffmpeg() -> str:
+    ffmpeg_path = shutil.which("ffmpeg")
+    if not ffmpeg_path:
+        sys.exit("ffmpeg is not on PATH; this benchmark needs it")
+    return ffmpeg_path
+
+
+def make_source(
+    path: Path, seconds: float, size: str = "1280x720", bitrate: str = "2600k", tag: str = ""
+) -> Path:
+    """A 30 fps H.264/AAC test clip with a keyframe every 2 s (about 200 MB
+    for 10 minutes at the default bitrate); reused if it already exists.  A
+    different *tag* gives different bytes, and so a render-cache miss."""
+    if path.is_file():
+        return path
+    subprocess.run(
+        [
+            require_ffmpeg(), "-y", "-v", "error",
+            "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=30",
+            "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=48000",
+            "-t", str(seconds), "-c:v", "libx264", "-preset", "veryfast", "-b:v", bitrate, "-g", "60",
+            "-pix_fmt", "yuv420p", "-c:a", "aac", "-shortest", "-metadata", f"comment={tag}", str(path),
+        ],
+        check=True,
+    )
+    return path
+
+
+def run_measured(cmd, stop_when=None):
+    """Run *cmd*; return ``(seconds, peak RSS in MB, returncode)`` of that one
+    child.  With *stop_when*, ``-progress pipe:1`` lines are fed to it and the
+    process is killed as soon as it returns True."""
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE if stop_when else subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    if stop_when:
+        for line in proc.stdout:
+            if stop_when(line.strip()):
+                proc.kill()
+                break
+        proc.stdout.close()
+    # wait4 reports the rusage of exactly this child, not the max over all.
+    _pid, status, usage = os.wait4(proc.pid, 0)
+    seconds = time.perf_counter() - started
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return seconds, usage.ru_maxrss / 1024, proc.returncode
+
+
+def first_progress(line: str) -> bool:
+    """``-progress`` stop condition: ffmpeg has produced output."""
+    key, _, value = line.partition("=")
+    return key == "out_time_us" and value.isdigit() and int(value) > 0
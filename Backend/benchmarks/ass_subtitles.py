@@ -0,0 +1,120 @@
+"""Time ASS compilation and per-window cue slicing against the code they
+replaced, plus a render-cache hit for an unchanged subtitle list.
+
+Run from Backend/:  python benchmarks/ass_subtitles.py [cue count]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.ass_subtitles import (  # noqa: E402
+    CueIndex,
+    ass_cache_parts,
+    build_ass_document,
+    seconds_to_srt_time,
+    srt_time_to_seconds,
+)
+from app.render_cache import RenderCache  # noqa: E402
+
+STYLE = {"fontFamily": "Arial", "fontSize": 48, "primaryColor": "#FFFFFF", "outlineColor": "#000000"}
+WINDOW_SECONDS = 10.0
+
+
+def old_ass_document(subtitles):
+    """The previous _create_ass_subtitle_file body: float-parse every time,
+    reformat it and append to one string."""
+
+    def seconds_to_ass_time(seconds):
+        h = int(seconds // 3600)
+        m = int((seconds % 3600) // 60)
+        s = seconds % 60
+        return f"{h}:{m:02d}:{s:05.2f}"
+
+    ass_content = "[Script Info]\n...\n[Events]\n"
+    for sub in subtitles:
+        start = seconds_to_ass_time(srt_time_to_seconds(sub.get("startTime", "00:00:00,000")))
+        end = seconds_to_ass_time(srt_time_to_seconds(sub.get("endTime", "00:00:00,000")))
+        text = sub.get("text", "").replace("\n", "\\N")
+        ass_content += f"Dialogue: 0,{start},{end},Default,,0,0,0,,{text}\n"
+    return ass_content
+
+
+def old_window(subtitles, window_start, window_end):
+    """The previous _subtitles_in_window: re-parse every cue per window."""
+    cues = []
+    for sub in subtitles:
+        start = srt_time_to_seconds(sub.get("startTime", "00:00:00,000"))
+        end = srt_time_to_seconds(sub.get("endTime", "00:00:00,000"))
+        if end <= window_start or start >= window_end:
+            continue
+        cues.append(
+            {
+                "startTime": seconds_to_srt_time(max(start, window_start) - window_start),
+                "endTime": seconds_to_srt_time(min(end, window_end) - window_start),
+                "text": sub.get("text", ""),
+            }
+        )
+    return cues
+
+
+def report(label, seconds):
+    print(f"{label:<32}{seconds * 1000:9.1f} ms")
+
+
+def best_of(runs, func):
+    best = float("inf")
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    subtitles = [
+        {
+            "startTime": seconds_to_srt_time(i * 3.0),
+            "endTime": seconds_to_srt_time(i * 3.0 + 2.5),
+            "text": f"Subtitle line {i}\nsecond row",
+        }
+        for i in range(count)
+    ]
+    windows = [(i * WINDOW_SECONDS, (i + 1) * WINDOW_SECONDS) for i in range(int(count * 3.0 / WINDOW_SECONDS))]
+
+    print(f"{count} cues, {len(windows)} windows of {WINDOW_SECONDS:.0f}s, best of 5")
+    report("write .ass, old", best_of(5, lambda: old_ass_document(subtitles)))
+    report("write .ass, new", best_of(5, lambda: build_ass_document(subtitles, STYLE)))
+
+    with tempfile.TemporaryDirectory() as root:
+        cache = RenderCache(Path(root), 1024**3)
+        key = RenderCache.make_key(ass_cache_parts(subtitles, STYLE))
+        temp_file = cache.temp_path(".ass")
+        temp_file.write_text(build_ass_document(subtitles, STYLE), encoding="utf-8-sig")
+        cache.store(key, ".ass", temp_file)
+
+        def cache_hit():
+            assert cache.lookup(RenderCache.make_key(ass_cache_parts(subtitles, STYLE)), ".ass") is not None
+
+        report("cache hit (key + lookup)", best_of(5, cache_hit))
+
+    def old_windows():
+        for window_start, window_end in windows:
+            old_window(subtitles, window_start, window_end)
+
+    def indexed_windows():
+        index = CueIndex(subtitles)
+        for window_start, window_end in windows:
+            index.window(window_start, window_end)
+
+    # The old windowing is quadratic; one run is plenty.
+    report("windows, re-parse per window", best_of(1, old_windows))
+    report("windows, CueIndex", best_of(5, indexed_windows))
+
+
+if __name__ == "__main__":
+    main()
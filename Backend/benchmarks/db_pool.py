@@ -0,0 +1,110 @@
+"""Throughput of the pooled WAL Database against a connection per call.
+
+Threads hammer a mix of upsert_project, update_download_status, get_project
+and get_download_status for a fixed time.  The baseline is the same Database
+with a fresh sqlite3 connection for every call in rollback-journal mode, as
+it worked before the pool.
+
+Run from Backend/:  python benchmarks/db_pool.py [threads] [seconds]
+"""
+
+import datetime as dt
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db import Database  # noqa: E402
+
+PROJECTS = 100
+DOWNLOADS = 100
+
+
+class PerCallDatabase(Database):
+    """A new connection per call, default pragmas, rollback journal."""
+
+    def __init__(self, db_path: Path) -> None:
+        super().__init__(db_path)
+        self.close()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode = DELETE")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self._db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _reader(self):
+        return self._connect()
+
+    def _writer(self):
+        return self._connect()
+
+
+def seed(db):
+    now = dt.datetime.utcnow().isoformat()
+    for i in range(PROJECTS):
+        db.upsert_project({"id": f"project-{i}", "name": f"Project {i}", "clips": list(range(50))}, now)
+    for i in range(DOWNLOADS):
+        db.save_download_status(f"download-{i}", f"video-{i}", "project-0", "queued", "https://example.com", "video", now)
+
+
+def run(db, threads, seconds):
+    counts = [[0, 0] for _ in range(threads)]
+    stop = time.monotonic() + seconds
+
+    def worker(index):
+        rng = random.Random(index)
+        ops = writes = 0
+        while time.monotonic() < stop:
+            roll = rng.random()
+            if roll < 0.1:
+                now = dt.datetime.utcnow().isoformat()
+                db.upsert_project({"id": f"project-{rng.randrange(PROJECTS)}", "name": "renamed", "clips": []}, now)
+                writes += 1
+            elif roll < 0.2:
+                db.update_download_status(f"download-{rng.randrange(DOWNLOADS)}", "downloading", rng.randrange(100))
+                writes += 1
+            elif roll < 0.6:
+                db.get_project(f"project-{rng.randrange(PROJECTS)}")
+            else:
+                db.get_download_status(f"download-{rng.randrange(DOWNLOADS)}")
+            ops += 1
+        counts[index] = [ops, writes]
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    ops = sum(count[0] for count in counts)
+    writes = sum(count[1] for count in counts)
+    return ops / seconds, writes / seconds
+
+
+def main() -> None:
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    print(f"{threads} threads for {seconds:.0f}s, 20% writes")
+    for label, factory in (("per-call connections", PerCallDatabase), ("connection pool (WAL)", Database)):
+        with tempfile.TemporaryDirectory() as root:
+            db = factory(Path(root) / "app.db")
+            seed(db)
+            ops, writes = run(db, threads, seconds)
+            db.close()
+        print(f"{label:<24}{ops:10,.0f} ops/s ({writes:,.0f} writes/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Time from starting a render to ffmpeg's first progress report, feeding the
+source straight from the blob store against the old read-and-copy path.
+
+The old path loaded the file with Database.get_file and wrote it into a temp
+dir before ffmpeg started; the new one hands ffmpeg the blob path from
+Database.get_file_path.  Each run is a fresh Python process, so its peak RSS
+is that path's alone.
+
+Run from Backend/:  python benchmarks/render_inputs.py [source seconds] [runs]
+"""
+
+import datetime as dt
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from _media import first_progress, make_source, require_ffmpeg, run_measured  # noqa: E402
+from app.db import Database  # noqa: E402
+
+FILE_ID = "source"
+
+
+def child(mode: str, db_path: str) -> None:
+    ffmpeg_path = require_ffmpeg()
+    db = Database(Path(db_path))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        started = time.perf_counter()
+        if mode == "temp-copy":
+            data, _content_type, _filename = db.get_file(FILE_ID)
+            input_path = Path(temp_dir) / "input.mp4"
+            input_path.write_bytes(data)
+        else:
+            input_path, _content_type, _filename = db.get_file_path(FILE_ID)
+        cmd = [
+            ffmpeg_path, "-y", "-nostats", "-progress", "pipe:1", "-i", str(input_path),
+            "-c:v", "libx264", "-preset", "veryfast", "-c:a", "aac", "-f", "null", "-",
+        ]
+        run_measured(cmd, stop_when=first_progress)
+        seconds = time.perf_counter() - started
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{seconds} {peak_mb}")
+
+
+def main() -> None:
+    source_seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 600
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    with tempfile.TemporaryDirectory() as root:
+        source = make_source(Path(root) / "source.mp4", source_seconds)
+        db_path = Path(root) / "data" / "app.db"
+        db = Database(db_path)
+        db.save_file_from_path(FILE_ID, None, "source.mp4", "video/mp4", source, dt.datetime.utcnow().isoformat())
+        db.close()
+        size_mb = source.stat().st_size / 1024**2
+        print(f"{size_mb:.0f} MB source ({source_seconds:.0f} s), median of {runs} runs")
+
+        for mode in ("temp-copy", "blob-path"):
+            results = []
+            for _ in range(runs):
+                output = subprocess.run(
+                    [sys.executable, __file__, "--child", mode, str(db_path)],
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                ).stdout.split()
+                results.append((float(output[0]), float(output[1])))
+            seconds = statistics.median(result[0] for result in results)
+            peak_mb = max(result[1] for result in results)
+            print(f"{mode:<10} first progress after {seconds:6.2f} s, Python peak RSS {peak_mb:6.0f} MB")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        child(sys.argv[2], sys.argv[3])
+    else:
+        main()
@@ -0,0 +1,96 @@
+"""Wall time of a full render in "single" and "parallel" mode.
+
+The timeline is a 2-minute cut (12 ten-second segments) of a 10-minute 720p
+source with 40 subtitles, one TTS clip and a cover box, rendered through the
+API with wait=true.  Every run uploads a freshly tagged source, so no run is
+served from the segment cache of another.  The project and its renders are
+deleted afterwards.
+
+Run from Backend/:  python benchmarks/render_modes.py [max parallel workers] [profile]
+"""
+
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from _media import make_source, require_ffmpeg  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.ass_subtitles import seconds_to_srt_time  # noqa: E402
+from app.core import DATA_ROOT  # noqa: E402
+from main import app  # noqa: E402
+
+PROJECT_ID = "benchmark-render-modes"
+SOURCE_SECONDS = 600
+SEGMENTS = [(start, start + 10.0) for start in range(0, 600, 50)][:12]
+
+
+def upload(client, path, file_id, content_type):
+    with open(path, "rb") as handle:
+        response = client.post(
+            "/files",
+            data={"file_id": file_id, "project_id": PROJECT_ID},
+            files={"file": (path.name, handle, content_type)},
+        )
+    response.raise_for_status()
+
+
+def payload(video_file_id, mode, workers, profile):
+    return {
+        "video_file_id": video_file_id,
+        "video_segments": [
+            {"sourceStartTime": start, "sourceEndTime": end, "playbackRate": 1.0} for start, end in SEGMENTS
+        ],
+        "subtitles": [
+            {"startTime": seconds_to_srt_time(i * 3.0), "endTime": seconds_to_srt_time(i * 3.0 + 2.5), "text": f"Line {i}"}
+            for i in range(40)
+        ],
+        "audio_files": [{"id": "benchmark-tts", "startTime": 5.0, "track": 0}],
+        "hardsub_cover_box": {"enabled": True, "x": 10, "y": 80, "width": 80, "height": 12},
+        "render_mode": mode,
+        "parallel_workers": workers,
+        "profile": profile,
+        "stream_copy": False,
+        "output_filename": f"{mode}-{workers or 0}.mp4",
+    }
+
+
+def main() -> None:
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    profile = sys.argv[2] if len(sys.argv) > 2 else "final"
+    ffmpeg_path = require_ffmpeg()
+    runs = [("single", None)] + [("parallel", workers) for workers in range(1, max_workers + 1)]
+
+    with tempfile.TemporaryDirectory() as root, TestClient(app) as client:
+        client.put(f"/projects/{PROJECT_ID}", json={"id": PROJECT_ID, "name": "Render mode benchmark"}).raise_for_status()
+        tts = Path(root) / "tts.wav"
+        subprocess.run(
+            [ffmpeg_path, "-y", "-v", "error", "-f", "lavfi", "-i", "sine=frequency=660:duration=20", str(tts)],
+            check=True,
+        )
+        upload(client, tts, "benchmark-tts", "audio/wav")
+        try:
+            print(f"2-minute timeline from a {SOURCE_SECONDS // 60}-minute source, profile {profile}")
+            for index, (mode, workers) in enumerate(runs):
+                source = make_source(Path(root) / f"source-{index}.mp4", SOURCE_SECONDS, tag=f"run-{index}")
+                video_file_id = f"benchmark-source-{index}"
+                upload(client, source, video_file_id, "video/mp4")
+                started = time.perf_counter()
+                result = client.post(
+                    f"/projects/{PROJECT_ID}/render", params={"wait": "true"}, json=payload(video_file_id, mode, workers, profile)
+                ).json()
+                seconds = time.perf_counter() - started
+                label = mode if workers is None else f"{mode}, {workers} worker{'s' if workers > 1 else ''}"
+                print(f"{label:<22}{seconds:8.1f} s  {result.get('status')}")
+        finally:
+            client.delete(f"/projects/{PROJECT_ID}")
+            shutil.rmtree(DATA_ROOT / PROJECT_ID, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
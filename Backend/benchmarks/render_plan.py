@@ -0,0 +1,117 @@
+"""Peak ffmpeg RSS and wall time of the segment graphs for a long timeline.
+
+Cuts a 200-segment timeline out of a test source and decodes it to the null
+muxer (no encode, so only the graph's own cost shows) with:
+
+- trim branches: the graph render_plan replaced, one split/trim branch per
+  segment off a single decoded input;
+- seek, uncapped: one -ss/-t input per segment and an N-way concat;
+- seek batches: seek_batches() parts of at most MAX_SEEK_INPUTS inputs, one
+  ffmpeg run each (peak is the largest run, time the sum);
+- select: the forward timeline as one select pass, for reference.
+
+The reordered timeline plays the segments back to front, which is what
+forces the seek strategy; trim branches then buffer decoded frames for every
+later branch, so keep the source short or small.
+
+Run from Backend/:  python benchmarks/render_plan.py [segments] [source seconds] [size]
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from _media import make_source, require_ffmpeg, run_measured  # noqa: E402
+
+from app.render_plan import (  # noqa: E402
+    MAX_SEEK_INPUTS,
+    Timeline,
+    _fmt,
+    _plan_seek,
+    plan_segment_graph,
+    seek_batches,
+)
+
+FPS = 30
+
+
+def timeline(count, source_seconds, reverse):
+    step = source_seconds / count
+    order = reversed(range(count)) if reverse else range(count)
+    return Timeline.from_request(
+        [{"sourceStartTime": i * step, "sourceEndTime": i * step + step / 2, "playbackRate": 1.0} for i in order],
+        FPS,
+    )
+
+
+def trim_branches(cut, source):
+    """The pre-render_plan graph: every segment trims its own copy of [0:v]/[0:a]."""
+    count = len(cut.segments)
+    filters = [
+        f"[0:v]split={count}" + "".join(f"[v{i}]" for i in range(count)),
+        f"[0:a]asplit={count}" + "".join(f"[a{i}]" for i in range(count)),
+    ]
+    for i, segment in enumerate(cut.segments):
+        start, end = _fmt(segment.source_start), _fmt(segment.source_end)
+        filters.append(f"[v{i}]trim=start={start}:end={end},setpts=PTS-STARTPTS[cv{i}]")
+        filters.append(f"[a{i}]atrim=start={start}:end={end},asetpts=PTS-STARTPTS[ca{i}]")
+    labels = "".join(f"[cv{i}][ca{i}]" for i in range(count))
+    filters.append(f"{labels}concat=n={count}:v=1:a=1[cutv][cuta]")
+    return [["-i", source]], filters, "[cutv]", "[cuta]"
+
+
+def graph_command(ffmpeg_path, inputs, filters, video_label, audio_label):
+    cmd = [ffmpeg_path, "-y", "-v", "error"]
+    for input_args in inputs:
+        cmd.extend(input_args)
+    cmd.extend(["-filter_complex", ";".join(filters), "-map", video_label, "-map", audio_label, "-f", "null", "-"])
+    return cmd
+
+
+def measure(label, commands):
+    peak = total = 0.0
+    for cmd in commands:
+        seconds, rss_mb, returncode = run_measured(cmd)
+        if returncode != 0:
+            print(f"{label:<20} ffmpeg failed ({returncode})")
+            return
+        peak = max(peak, rss_mb)
+        total += seconds
+    runs = f"{len(commands)} runs" if len(commands) > 1 else "1 run"
+    print(f"{label:<20}{peak:8.0f} MB peak RSS {total:8.1f} s  ({runs})")
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    source_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 120
+    size = sys.argv[3] if len(sys.argv) > 3 else "640x360"
+    ffmpeg_path = require_ffmpeg()
+
+    with tempfile.TemporaryDirectory() as root:
+        source = str(make_source(Path(root) / "source.mp4", source_seconds, size=size, bitrate="800k"))
+        reordered = timeline(count, source_seconds, reverse=True)
+        forward = timeline(count, source_seconds, reverse=False)
+        print(f"{count} segments from a {source_seconds:.0f} s {size} source, MAX_SEEK_INPUTS={MAX_SEEK_INPUTS}")
+
+        measure("trim branches", [graph_command(ffmpeg_path, *trim_branches(reordered, source))])
+
+        seek = _plan_seek(reordered.merged(), source, True, True, False)
+        measure("seek, uncapped", [graph_command(ffmpeg_path, seek.inputs, seek.filters, seek.video_label, seek.audio_label)])
+
+        batches = [plan_segment_graph(batch, source) for batch in seek_batches(reordered)]
+        measure(
+            "seek batches",
+            [graph_command(ffmpeg_path, g.inputs, g.filters, g.video_label, g.audio_label) for g in batches],
+        )
+
+        select = plan_segment_graph(forward, source)
+        measure(
+            "select (forward)",
+            [graph_command(ffmpeg_path, select.inputs, select.filters, select.video_label, select.audio_label)],
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import json
+import sqlite3
+import time
+import zlib
+
+from app.ASR.ASRCache import ASRCache
+
+MAX_BYTES = 1024 * 1024
+
+
+def test_round_trip(tmp_path):
+    cache = ASRCache(str(tmp_path / "asr.sqlite3"), MAX_BYTES)
+    cache.put("BcutASR-" + "0" * 64, {"utterances": [{"transcript": "xin chào"}]})
+
+    assert cache.get("BcutASR-" + "0" * 64) == {"utterances": [{"transcript": "xin chào"}]}
+    assert cache.get("BcutASR-missing") is None
+
+
+def test_legacy_json_is_deleted_not_imported(tmp_path):
+    legacy = tmp_path / "asr_cache.json"
+    legacy.write_text(json.dumps({"BcutASR-1a2b3c4d": {"utterances": []}}), encoding="utf-8")
+
+    cache = ASRCache(str(tmp_path / "asr.sqlite3"), MAX_BYTES, legacy_json=str(legacy))
+
+    assert not legacy.exists()
+    assert cache.stats()["entries"] == 0
+
+
+def test_rows_under_the_old_key_scheme_are_dropped_once(tmp_path):
+    path = tmp_path / "asr.sqlite3"
+    ASRCache(str(path), MAX_BYTES)
+    # A store last opened before the key scheme changed.
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("PRAGMA user_version = 0")
+        conn.execute(
+            "INSERT INTO asr_cache (key, data, size, created_at, last_used_at) VALUES (?, ?, ?, ?, ?)",
+            ("BcutASR-1a2b3c4d", zlib.compress(b"{}"), 10, time.time(), time.time()),
+        )
+    conn.close()
+
+    cache = ASRCache(str(path), MAX_BYTES)
+    assert cache.stats()["entries"] == 0
+
+    cache.put("BcutASR-" + "0" * 64, {"utterances": []})
+    assert ASRCache(str(path), MAX_BYTES).stats()["entries"] == 1
@@ -0,0 +1,33 @@
+from app.ass_subtitles import ass_cache_parts, build_ass_document
+
+CUE = {"startTime": "00:00:01,000", "endTime": "00:00:02,500", "text": "Hello"}
+
+
+def _dialogue(document):
+    return [line for line in document.splitlines() if line.startswith("Dialogue:")]
+
+
+def test_null_overrides_use_the_style():
+    plain = build_ass_document([CUE])
+    nulls = build_ass_document(
+        [dict(CUE, styleOverrides={"verticalMargin": None, "fontSize": None, "primaryColor": None})]
+    )
+
+    assert nulls == plain
+    assert _dialogue(nulls) == ["Dialogue: 0,0:00:01.00,0:00:02.50,Default,,0,0,0,,Hello"]
+
+
+def test_null_overrides_share_the_cache_key():
+    assert ass_cache_parts([dict(CUE, styleOverrides={"verticalMargin": None})]) == ass_cache_parts(
+        [dict(CUE, styleOverrides={})]
+    )
+
+
+def test_overrides_next_to_nulls_still_apply():
+    document = build_ass_document([dict(CUE, styleOverrides={"verticalMargin": 10, "fontSize": None, "outlineWidth": 2})])
+
+    assert _dialogue(document) == ["Dialogue: 0,0:00:01.00,0:00:02.50,Default,,0,0,108,,{\\bord2}Hello"]
+
+
+def test_null_style_fields_take_the_defaults():
+    assert build_ass_document([CUE], style={"fontSize": None, "verticalMargin": None}) == build_ass_document([CUE])
@@ -0,0 +1,44 @@
+import datetime as dt
+import sqlite3
+
+import pytest
+
+from app.db import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(tmp_path / "app.db")
+    yield database
+    database.close()
+
+
+def _now():
+    return dt.datetime.utcnow().isoformat()
+
+
+def test_get_file_reads_the_blob(db):
+    db.save_file("clip", None, "clip.mp3", "audio/mpeg", b"ID3 audio", _now())
+
+    assert db.get_file("clip") == (b"ID3 audio", "audio/mpeg", "clip.mp3")
+
+
+def test_missing_blob_is_not_an_empty_file(db):
+    path, _size = db.save_file("clip", None, "clip.mp3", "audio/mpeg", b"ID3 audio", _now())
+    path.unlink()
+
+    assert db.get_file("clip") is None
+    assert db.get_file_path("clip") is None
+
+
+def test_unmigrated_legacy_row_serves_its_blob_column(db, tmp_path):
+    db.close()
+    conn = sqlite3.connect(tmp_path / "app.db")
+    with conn:
+        conn.execute(
+            "INSERT INTO files (id, filename, content_type, data, created_at) VALUES (?, ?, ?, ?, ?)",
+            ("legacy", "old.wav", "audio/wav", b"RIFF legacy", _now()),
+        )
+    conn.close()
+
+    assert db.get_file("legacy") == (b"RIFF legacy", "audio/wav", "old.wav")
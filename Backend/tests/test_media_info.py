@@ -0,0 +1,77 @@
+import datetime as dt
+
+import pytest
+
+from app import media_info
+from app.db import Database
+from app.media_info import MediaInfoService
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(tmp_path / "app.db")
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def probes(monkeypatch):
+    """Every probe_path call fails; the list records the paths it was given."""
+    calls = []
+
+    def failing_probe(path, ffprobe_path=None):
+        calls.append(path)
+        return None
+
+    monkeypatch.setattr(media_info.shutil, "which", lambda name: f"/usr/bin/{name}")
+    monkeypatch.setattr(media_info, "probe_path", failing_probe)
+    monkeypatch.setattr(media_info, "probe_keyframes", failing_probe)
+    return calls
+
+
+def _save(db, file_id, data=b"not a video"):
+    db.save_file(file_id, None, f"{file_id}.mp4", "video/mp4", data, dt.datetime.utcnow().isoformat())
+
+
+def test_failed_probe_is_cached(db, probes):
+    _save(db, "clip")
+    service = MediaInfoService(db)
+
+    assert service.get("clip") is None
+    assert service.get("clip") is None
+    assert service.keyframes("clip") is None
+    assert len(probes) == 1
+
+
+def test_failed_probe_is_shared_by_content_hash(db, probes):
+    _save(db, "first")
+    _save(db, "second")
+    service = MediaInfoService(db)
+
+    service.get("first")
+    service.get("second")
+
+    assert len(probes) == 1
+
+
+def test_negative_entry_goes_with_the_blob(db, probes):
+    _save(db, "clip")
+    service = MediaInfoService(db)
+    service.get("clip")
+
+    db.delete_file("clip")
+    _save(db, "clip")
+    service.get("clip")
+
+    assert len(probes) == 2
+
+
+def test_missing_ffprobe_is_not_cached(db, probes, monkeypatch):
+    _save(db, "clip")
+    service = MediaInfoService(db)
+    monkeypatch.setattr(media_info.shutil, "which", lambda name: None)
+    service.get("clip")
+    monkeypatch.setattr(media_info.shutil, "which", lambda name: f"/usr/bin/{name}")
+    service.get("clip")
+
+    assert len(probes) == 1
@@ -0,0 +1,131 @@
+import pytest
+
+from app.render_plan import MAX_SEEK_INPUTS, Timeline, plan_segment_graph, plan_stream_copy, seek_batches
+
+FPS = 30
+SOURCE = "source.mp4"
+
+
+def _timeline(*segments):
+    return Timeline.from_request(
+        [{"sourceStartTime": start, "sourceEndTime": end, "playbackRate": rate} for start, end, rate in segments],
+        FPS,
+    )
+
+
+def _reordered(count):
+    # Every segment plays a later part of the source than the one after it.
+    return _timeline(*[(float(count - i), count - i + 0.5, 1.0) for i in range(count)])
+
+
+def test_adjacent_segments_merge_into_one_select_cut():
+    graph = plan_segment_graph(_timeline((0, 2, 1.0), (2, 5, 1.0)), SOURCE)
+
+    assert graph.strategy == "select"
+    assert graph.inputs == [["-i", SOURCE]]
+    assert graph.filters == [
+        "[0:v]select='gte(t,0)*lt(t,5)',setpts='(gte(T,0)*lt(T,5)*(T+0))/1.0/TB'[cutv]",
+        "[0:a]aselect='gte(t,0)*lt(t,5)',asetpts='(gte(T,0)*lt(T,5)*(T+0))/TB',aresample=async=1:first_pts=0[cuta]",
+    ]
+    assert (graph.video_label, graph.audio_label) == ("[cutv]", "[cuta]")
+
+
+def test_forward_cuts_select_from_one_input():
+    graph = plan_segment_graph(_timeline((0, 1, 2.0), (3, 5, 2.0)), SOURCE, pad_audio=True)
+
+    assert graph.strategy == "select"
+    assert graph.inputs == [["-i", SOURCE]]
+    keep = "gte(t,0)*lt(t,1)+gte(t,3)*lt(t,5)"
+    # The second cut starts at output frame 15 (0.5 s), i.e. source time 1.0 at 2x.
+    compact = "gte(T,0)*lt(T,1)*(T+0)+gte(T,3)*lt(T,5)*(T-2)"
+    assert graph.filters == [
+        f"[0:v]select='{keep}',setpts='({compact})/2.0/TB'[cutv]",
+        f"[0:a]aselect='{keep}',asetpts='({compact})/TB',aresample=async=1:first_pts=0,atempo=2.0,"
+        "apad,atrim=duration=1.5[cuta]",
+    ]
+
+
+def test_reordered_cuts_seek_one_input_per_segment():
+    graph = plan_segment_graph(_timeline((4, 6, 1.0), (0, 1, 0.5)), SOURCE, pad_audio=True)
+
+    assert graph.strategy == "seek"
+    assert graph.inputs == [
+        ["-ss", "4", "-t", "2", "-i", SOURCE],
+        ["-ss", "0", "-t", "1", "-i", SOURCE],
+    ]
+    assert graph.filters == [
+        "[0:v]setpts=(PTS-STARTPTS)/1.0[seg0v]",
+        "[1:v]setpts=(PTS-STARTPTS)/0.5[seg1v]",
+        "[seg0v][seg1v]concat=n=2:v=1:a=0[cutv]",
+        "[0:a]asetpts=PTS-STARTPTS,apad,atrim=duration=2[seg0a]",
+        "[1:a]asetpts=PTS-STARTPTS,atempo=0.5,apad,atrim=duration=2[seg1a]",
+        "[seg0a][seg1a]concat=n=2:v=0:a=1[cuta]",
+    ]
+    assert (graph.video_label, graph.audio_label) == ("[cutv]", "[cuta]")
+
+
+def test_audio_only_graph_has_no_video_filters():
+    graph = plan_segment_graph(_timeline((4, 6, 1.0), (0, 1, 1.0)), SOURCE, video=False)
+
+    assert graph.video_label is None
+    assert all("v]" not in line for line in graph.filters)
+    assert graph.audio_label == "[cuta]"
+
+
+def test_two_hundred_forward_cuts_decode_the_source_once():
+    timeline = _timeline(*[(i * 2.0, i * 2.0 + 1.0, 1.0) for i in range(200)])
+
+    graph = plan_segment_graph(timeline, SOURCE)
+
+    assert graph.strategy == "select"
+    assert len(graph.inputs) == 1
+    assert seek_batches(timeline) == [timeline.merged()]
+
+
+def test_two_hundred_reordered_cuts_are_planned_in_bounded_batches():
+    timeline = _reordered(200)
+
+    with pytest.raises(ValueError):
+        plan_segment_graph(timeline, SOURCE)
+
+    batches = seek_batches(timeline)
+    assert len(batches) == -(-200 // MAX_SEEK_INPUTS)
+    assert [segment for batch in batches for segment in batch.segments] == list(timeline.segments)
+    assert sum(batch.frames for batch in batches) == timeline.frames
+    for batch in batches:
+        graph = plan_segment_graph(batch, SOURCE, video=False, pad_audio=True)
+        assert len(graph.inputs) <= MAX_SEEK_INPUTS
+
+
+def test_short_reordered_timeline_is_one_batch():
+    timeline = _reordered(MAX_SEEK_INPUTS)
+
+    assert seek_batches(timeline) == [timeline]
+    assert len(plan_segment_graph(timeline, SOURCE).inputs) == MAX_SEEK_INPUTS
+
+
+KEYFRAMES = [0.0, 2.0, 4.0, 6.0, 8.0]
+
+
+def test_keyframe_aligned_cuts_are_copied_whole():
+    timeline = _timeline((0, 2, 1.0), (2, 4, 1.0), (6, 8, 1.0), (8, 9.5, 1.0))
+
+    pieces = plan_stream_copy(timeline, KEYFRAMES, source_end=9.5)
+
+    # Adjacent segments merge; the last piece may run to the end of the source.
+    assert [(piece.source_start, piece.frames) for piece in pieces] == [(0, 120), (6, 105)]
+
+
+def test_cut_off_a_keyframe_is_not_copied():
+    # Starts between keyframes.
+    assert plan_stream_copy(_timeline((1, 4, 1.0)), KEYFRAMES, source_end=9.5) is None
+    # Ends between keyframes, before the end of the source.
+    assert plan_stream_copy(_timeline((0, 3, 1.0)), KEYFRAMES, source_end=9.5) is None
+    # Aligned, but retimed.
+    assert plan_stream_copy(_timeline((0, 2, 2.0)), KEYFRAMES, source_end=9.5) is None
+
+
+def test_cuts_within_half_a_frame_of_a_keyframe_count_as_aligned():
+    timeline = _timeline((2.01, 4.01, 1.0))
+
+    assert [(piece.source_start, piece.frames) for piece in plan_stream_copy(timeline, KEYFRAMES)] == [(2.01, 60)]
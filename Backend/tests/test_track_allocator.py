@@ -0,0 +1,93 @@
+import math
+import random
+
+import pytest
+
+from app.track_allocator import allocate_tracks, clip_interval
+
+
+def _random_clips(count, seed):
+    rng = random.Random(seed)
+    clips = []
+    time = 0.0
+    for _ in range(count):
+        time += rng.uniform(0, 2.5)
+        clips.append((time, time + rng.uniform(0.5, 6)))
+    rng.shuffle(clips)
+    return clips
+
+
+def _max_overlap(clips):
+    # Ends sort before starts at the same instant: touching clips share a track.
+    events = sorted([(end, -1) for _start, end in clips] + [(start, 1) for start, _end in clips])
+    depth = peak = 0
+    for _time, delta in events:
+        depth += delta
+        peak = max(peak, depth)
+    return peak
+
+
+def _assert_no_overlaps(clips, tracks, occupied=()):
+    by_track = {}
+    for (start, end), track in zip(clips, tracks):
+        by_track.setdefault(track, []).append((start, end))
+    for track, start, end in occupied:
+        by_track.setdefault(track, []).append((start, end))
+    for intervals in by_track.values():
+        intervals.sort()
+        for (_start, previous_end), (next_start, _end) in zip(intervals, intervals[1:]):
+            assert previous_end <= next_start
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_no_overlaps_and_minimal_track_count(seed):
+    clips = _random_clips(500, seed)
+    tracks = allocate_tracks(clips)
+    _assert_no_overlaps(clips, tracks)
+    assert max(tracks) + 1 == _max_overlap(clips)
+
+
+def test_touching_clips_share_a_track():
+    assert allocate_tracks([(0, 1), (1, 2), (2, 3)]) == [0, 0, 0]
+
+
+def test_min_track_offsets_allocation():
+    assert allocate_tracks([(0, 2), (1, 3)], min_track=4) == [4, 5]
+
+
+def test_existing_project_clips_are_respected():
+    occupied = [(0, 0, math.inf), (1, 5, 10)]
+    clips = [(0, 3), (4, 6), (9, 12), (3, 3)]
+    tracks = allocate_tracks(clips, occupied)
+    assert tracks == [1, 2, 2, 1]
+    _assert_no_overlaps(clips, tracks, occupied)
+
+
+def test_new_clips_fill_gaps_between_existing_clips():
+    occupied = [(0, 0, 2), (0, 8, 10)]
+    assert allocate_tracks([(2, 8), (3, 4)], occupied) == [0, 1]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_random_existing_clips_are_respected(seed):
+    rng = random.Random(seed)
+    # Existing clips may overlap each other (the editor allows it); only new
+    # clips must stay clear of them.
+    occupied = [(rng.randrange(4), start, end) for start, end in _random_clips(60, seed + 100)]
+    clips = _random_clips(300, seed)
+    tracks = allocate_tracks(clips, occupied)
+    _assert_no_overlaps(clips, tracks)
+    for (start, end), track in zip(clips, tracks):
+        for other_track, other_start, other_end in occupied:
+            assert track != other_track or end <= other_start or other_end <= start
+
+
+def test_clip_interval_coerces_stored_values():
+    assert clip_interval("1.5", "2") == (1.5, 3.5)
+    assert clip_interval(None, 3) == (0.0, 3.0)
+    assert clip_interval(-4, 3) == (0.0, 3.0)
+
+
+@pytest.mark.parametrize("duration", [None, "", "abc", -1, 0, float("nan"), float("inf"), [1], True])
+def test_clip_interval_unknown_length_blocks_rest_of_track(duration):
+    assert clip_interval(2, duration) == (2.0, math.inf)
@@ -0,0 +1,76 @@
+import datetime as dt
+import os
+import time
+
+import pytest
+
+from app.db import Database
+
+DAY = 24 * 3600
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(tmp_path / "app.db")
+    yield database
+    database.close()
+
+
+def _start_upload(db, upload_id, created_at, parts=1):
+    db.save_upload_session({"id": upload_id, "file_id": f"file-{upload_id}", "size": parts, "part_size": 1}, created_at)
+    parts_dir = db.upload_parts_dir(upload_id)
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    for part_number in range(parts):
+        (parts_dir / f"{part_number:06d}.part").write_bytes(b"x")
+    return parts_dir
+
+
+def _age(parts_dir, seconds):
+    stamp = time.time() - seconds
+    for path in [*parts_dir.iterdir(), parts_dir]:
+        os.utime(path, (stamp, stamp))
+
+
+def _iso_ago(seconds):
+    return (dt.datetime.utcnow() - dt.timedelta(seconds=seconds)).isoformat()
+
+
+def test_abort_removes_session_and_parts(db):
+    parts_dir = _start_upload(db, "aborted", _iso_ago(0), parts=3)
+
+    db.delete_upload_session("aborted")
+
+    assert db.get_upload_session("aborted") is None
+    assert not parts_dir.exists()
+
+
+def test_sessions_idle_past_ttl_expire(db):
+    stale_dir = _start_upload(db, "stale", _iso_ago(3 * DAY))
+    _age(stale_dir, 3 * DAY)
+    fresh_dir = _start_upload(db, "fresh", _iso_ago(60))
+
+    assert db.expire_upload_sessions(DAY) == ["stale"]
+
+    assert db.get_upload_session("stale") is None
+    assert not stale_dir.exists()
+    assert db.get_upload_session("fresh") is not None
+    assert fresh_dir.is_dir()
+
+
+def test_recent_part_keeps_an_old_session_alive(db):
+    parts_dir = _start_upload(db, "slow", _iso_ago(3 * DAY))
+    _age(parts_dir, 3 * DAY)
+    (parts_dir / "000001.part").write_bytes(b"x")
+
+    assert db.expire_upload_sessions(DAY) == []
+    assert db.get_upload_session("slow") is not None
+
+
+def test_part_directories_without_a_session_expire(db):
+    orphan = db.upload_parts_dir("orphan")
+    orphan.mkdir(parents=True)
+    (orphan / "000000.part").write_bytes(b"x")
+    _age(orphan, 3 * DAY)
+
+    assert db.expire_upload_sessions(DAY) == ["orphan"]
+    assert not orphan.exists()
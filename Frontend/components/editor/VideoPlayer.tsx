@@ -545,6 +545,7 @@ const VideoPlayer: React.FC<VideoPlayerProps> = ({
                 <video 
                     ref={videoRef}
                     src={videoUrl ?? undefined}
+                    crossOrigin="anonymous"
                     onLoadedMetadata={() => {
                         onLoadedMetadata();
                         updatePlayerSize();
@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useRef, useMemo, useCallback } from 'react';
 import { Project, VideoFile, SrtFile, SubtitleBlock, VideoSegment, BoundingBox, SubtitleStyle, AudioFile } from '../../types';
-import { getVideoUrl, getFileUrl } from '../../services/projectService';
+import { getFileUrl, getFileStreamUrl } from '../../services/projectService';
+import { submitRender, watchRenderJob } from '../../services/renderService';
 import { srtTimeToSeconds, secondsToSrtTime } from '../../services/srtParser';
 import { BackArrowIcon, ChevronLeftIcon, ChevronRightIcon, RenderIcon } from '../ui/Icons';
 import VideoPlayer from '../editor/VideoPlayer';
@@ -102,6 +103,7 @@ const ProfessionalVideoEditor: React.FC<ProfessionalVideoEditorProps> = ({ proje
   // Use project's TTS voice if set, otherwise use default
   const selectedTtsVoice = project.ttsVoice || DEFAULT_TTS_VOICE;
   const [isRendering, setIsRendering] = useState(false);
+  const [renderProgress, setRenderProgress] = useState<number | null>(null);
 
   const maxSubtitleEndTime = useMemo(() => {
     if (subtitles.length === 0) return 0;
@@ -155,20 +157,11 @@ const ProfessionalVideoEditor: React.FC<ProfessionalVideoEditorProps> = ({ proje
   }, [isResizing, handleMouseMove, handleMouseUp]);
   
   useEffect(() => {
-    let objectUrl: string | null = null;
-    const loadVideo = async () => {
-      setIsLoading(true);
-      try {
-        objectUrl = await getVideoUrl(videoFile.id);
-        setVideoUrl(objectUrl);
-      } catch (error) {
-        console.error("Lỗi khi tải video cho trình chỉnh sửa:", error);
-      } finally {
-        setIsLoading(false);
-      }
-    };
-    loadVideo();
-    return () => { if (objectUrl) URL.revokeObjectURL(objectUrl); };
+    // Stream straight from the backend so the player can seek with Range requests
+    // instead of waiting for the whole file to download into a blob.
+    setIsLoading(true);
+    setVideoUrl(getFileStreamUrl(videoFile.id));
+    setIsLoading(false);
   }, [videoFile.id]);
   
   const handleUpdateSubtitle = (id: number, newSub: Partial<SubtitleBlock>) => {
@@ -1128,10 +1121,8 @@ const handleMarqueeSelect = (segmentIds: string[], subtitleIds: number[], audioI
 
     const handleRenderVideo = async () => {
         setIsRendering(true);
+        setRenderProgress(null);
         try {
-            const rawBase = import.meta.env.VITE_API_BASE_URL ?? '';
-            const API_BASE_URL = rawBase ? rawBase.replace(/\/$/, '') : '';
-            
             // Prepare complete render data with ALL editing information
             const renderPayload = {
                 video_file_id: videoFile.id,
@@ -1144,20 +1135,15 @@ const handleMarqueeSelect = (segmentIds: string[], subtitleIds: number[], audioI
                 video_frame_url: project.subtitleStyle?.videoFrameUrl,
             };
             
-            const response = await fetch(`${API_BASE_URL}/projects/${project.id}/render`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify(renderPayload),
-            });
-
-            if (!response.ok) {
-                const errorText = await response.text();
-                throw new Error(`Render request failed: ${errorText || response.statusText}`);
+            let result = await submitRender(project.id, renderPayload);
+            if (result.job_id) {
+                // Renders run as background jobs; follow progress until done.
+                const job = await watchRenderJob(result.job_id, update => setRenderProgress(update.progress));
+                result = job.result ?? {
+                    status: 'error',
+                    message: job.error || (job.status === 'cancelled' ? 'Render đã bị hủy' : 'Render không thành công'),
+                };
             }
-
-            const result = await response.json();
             
             if (result.status === 'success') {
                 alert(`✅ Render video thành công!\n\n` +
@@ -1182,6 +1168,7 @@ const handleMarqueeSelect = (segmentIds: string[], subtitleIds: number[], audioI
             }
         } finally {
             setIsRendering(false);
+            setRenderProgress(null);
         }
     };
 
@@ -1225,7 +1212,7 @@ const handleMarqueeSelect = (segmentIds: string[], subtitleIds: number[], audioI
                 title="Render video với tất cả chỉnh sửa"
             >
                 <RenderIcon className="w-5 h-5" />
-                <span>{isRendering ? 'Đang render...' : 'Render Video'}</span>
+                <span>{isRendering ? (renderProgress != null ? `Đang render... ${Math.round(renderProgress * 100)}%` : 'Đang render...') : 'Render Video'}</span>
             </button>
             <button
                 onClick={() => navigateToVideo('previous')}
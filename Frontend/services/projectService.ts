@@ -71,7 +71,97 @@ export interface GenerateMissingSrtsResponse {
     errors: AsrGenerationItem[];
 }
 
+interface UploadSession {
+    upload_id: string;
+    file_id: string;
+    size: number;
+    part_size: number;
+    part_count: number;
+    received_parts: number[];
+}
+
+// Files above this size go through the resumable multi-part protocol so a
+// dropped connection only costs the part that was in flight.
+const RESUMABLE_UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+const UPLOAD_PART_RETRIES = 4;
+
+const uploadSessionKey = (id: string, file: File) => `upload-session:${id}:${file.size}:${file.lastModified}`;
+
+const loadUploadSession = async (id: string, file: File): Promise<UploadSession | null> => {
+    const uploadId = localStorage.getItem(uploadSessionKey(id, file));
+    if (!uploadId) {
+        return null;
+    }
+    const response = await fetch(`${API_BASE_URL}/files/uploads/${uploadId}`);
+    if (!response.ok) {
+        localStorage.removeItem(uploadSessionKey(id, file));
+        return null;
+    }
+    return (await response.json()) as UploadSession;
+};
+
+const uploadPart = async (session: UploadSession, part: number, file: File): Promise<void> => {
+    const start = part * session.part_size;
+    const body = file.slice(start, Math.min(file.size, start + session.part_size));
+    for (let attempt = 1; ; attempt++) {
+        try {
+            const response = await fetch(`${API_BASE_URL}/files/uploads/${session.upload_id}/parts/${part}`, {
+                method: 'PUT',
+                body,
+            });
+            if (!response.ok) {
+                throw new Error((await response.text()) || `Part ${part} failed with status ${response.status}`);
+            }
+            return;
+        } catch (error) {
+            if (attempt >= UPLOAD_PART_RETRIES) {
+                throw error;
+            }
+            await new Promise(resolve => setTimeout(resolve, 500 * 2 ** attempt));
+        }
+    }
+};
+
+const saveVideoResumable = async (projectId: string, id: string, file: File): Promise<FileUploadResult> => {
+    let session = await loadUploadSession(id, file);
+    if (!session) {
+        session = await jsonFetch<UploadSession>('/files/uploads', {
+            method: 'POST',
+            body: JSON.stringify({
+                file_id: id,
+                project_id: projectId,
+                filename: file.name,
+                content_type: file.type || null,
+                size: file.size,
+            }),
+        });
+        localStorage.setItem(uploadSessionKey(id, file), session.upload_id);
+    }
+
+    const received = new Set(session.received_parts);
+    for (let part = 0; part < session.part_count; part++) {
+        if (!received.has(part)) {
+            await uploadPart(session, part, file);
+        }
+    }
+
+    const payload = await jsonFetch<{ path?: string; size?: number; created_at?: string }>(
+        `/files/uploads/${session.upload_id}/complete`,
+        { method: 'POST' },
+    );
+    localStorage.removeItem(uploadSessionKey(id, file));
+    return {
+        path: payload?.path ?? undefined,
+        size: payload?.size ?? undefined,
+        created_at: payload?.created_at ?? undefined,
+    };
+};
+
 export const saveVideo = async (projectId: string, id: string, file: File): Promise<FileUploadResult> => {
+    if (file.size > RESUMABLE_UPLOAD_THRESHOLD) {
+        return saveVideoResumable(projectId, id, file);
+    }
+
     const formData = new FormData();
     formData.append('file_id', id);
     formData.append('project_id', projectId);
@@ -116,6 +206,11 @@ export const getVideoUrl = async (id: string): Promise<string | null> => {
 // Alias for getVideoUrl - works for any file type (video, audio, etc.)
 export const getFileUrl = getVideoUrl;
 
+// Direct URL to the streaming endpoint. Media elements fetch it with HTTP Range
+// requests, so playback starts immediately and seeking does not need the whole
+// file in memory first.
+export const getFileStreamUrl = (id: string): string => `${API_BASE_URL}/files/${encodeURIComponent(id)}`;
+
 export const deleteVideo = async (id: string): Promise<void> => {
     const response = await fetch(`${API_BASE_URL}/files/${id}`, { method: 'DELETE' });
     if (!response.ok && response.status !== 404) {
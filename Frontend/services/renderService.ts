@@ -0,0 +1,89 @@
+const rawBase = import.meta.env.VITE_API_BASE_URL ?? '';
+const API_BASE_URL = rawBase ? rawBase.replace(/\/$/, '') : '';
+
+export type RenderJobStatus = 'queued' | 'running' | 'succeeded' | 'failed' | 'cancelled' | 'interrupted';
+
+export interface RenderResult {
+    status: string;
+    message?: string;
+    output_filename?: string;
+    output_path?: string;
+    file_size?: number;
+    duration_seconds?: number | null;
+    log_file?: string;
+    video_segments_count?: number;
+    audio_tracks_count?: number;
+    subtitles_count?: number;
+}
+
+export interface RenderJob {
+    id: string;
+    project_id: string;
+    status: RenderJobStatus;
+    progress: number | null;
+    message?: string | null;
+    error?: string | null;
+    result?: RenderResult | null;
+    details?: Record<string, unknown>;
+}
+
+const TERMINAL_STATUSES: RenderJobStatus[] = ['succeeded', 'failed', 'cancelled', 'interrupted'];
+
+export const submitRender = async (projectId: string, payload: Record<string, unknown>): Promise<RenderResult & { job_id?: string }> => {
+    const response = await fetch(`${API_BASE_URL}/projects/${projectId}/render?wait=false`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(payload),
+    });
+
+    if (!response.ok) {
+        const errorText = await response.text();
+        throw new Error(`Render request failed: ${errorText || response.statusText}`);
+    }
+
+    return await response.json();
+};
+
+// Follows a render job over server-sent events until it finishes.
+export const watchRenderJob = (jobId: string, onProgress?: (job: RenderJob) => void): Promise<RenderJob> =>
+    new Promise((resolve, reject) => {
+        const source = new EventSource(`${API_BASE_URL}/render-jobs/${jobId}/events`);
+        let settled = false;
+
+        source.onmessage = event => {
+            const job = JSON.parse(event.data) as RenderJob;
+            onProgress?.(job);
+            if (TERMINAL_STATUSES.includes(job.status)) {
+                settled = true;
+                source.close();
+                resolve(job);
+            }
+        };
+
+        source.onerror = () => {
+            if (settled) {
+                return;
+            }
+            source.close();
+            // The stream ends when the job finishes; fetch the final state once.
+            fetch(`${API_BASE_URL}/render-jobs/${jobId}`)
+                .then(async response => {
+                    if (!response.ok) {
+                        throw new Error(await response.text());
+                    }
+                    const job = (await response.json()) as RenderJob;
+                    if (TERMINAL_STATUSES.includes(job.status)) {
+                        resolve(job);
+                    } else {
+                        resolve(await watchRenderJob(jobId, onProgress));
+                    }
+                })
+                .catch(reject);
+        };
+    });
+
+export const cancelRenderJob = async (jobId: string): Promise<void> => {
+    await fetch(`${API_BASE_URL}/render-jobs/${jobId}/cancel`, { method: 'POST' });
+};